@@ -38,16 +38,41 @@ def create_app():
     from routes import register_routes
     register_routes(app)
     
+    # Integration services connect lazily; optionally start connecting now
+    if Config.WARM_UP_INTEGRATIONS:
+        from google_services import sheets_service, calendar_service
+        from microsoft_services import graph_service
+        for service in (sheets_service, calendar_service, graph_service):
+            service.warm_up()
+    
     # Create database tables
     with app.app_context():
         import models  # Import models to register them
         db.create_all()
+        
+        # Apply columns and indexes added since the tables were created
+        from migrations import upgrade_schema
+        upgrade_schema(db)
+        
+        # Register counter maintenance and correct any drift since the last run
+        from dashboard_stats import reconcile_counters
+        reconcile_counters()
+        
+        # Every cached table needs a version row for commits to bump
+        from fragment_cache import seed_table_versions
+        seed_table_versions()
     
     return app
 
 # Create the app instance
 app = create_app()
 
-# Initialize scheduler for message scanning
+# Initialize scheduler for message scanning; every worker starts one, and the
+# worker holding the scheduler lease runs the jobs, so scan and reminder events
+# and the ingest metrics live in that worker only
 from scheduler import init_scheduler
 init_scheduler(app)
+
+# Start the worker pool that delivers integration side effects
+from outbox import init_outbox_worker
+init_outbox_worker(app)
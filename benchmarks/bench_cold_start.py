@@ -0,0 +1,67 @@
+"""Cold-start benchmark with integrations configured but unreachable
+
+Configures Microsoft Graph credentials and points the login and API URLs
+at a local socket that accepts connections and never answers, then times
+importing the app (worker boot) and its first dashboard request in a fresh
+interpreter, with integrations connecting lazily and with
+WARM_UP_INTEGRATIONS.
+
+    python benchmarks/bench_cold_start.py [NAME=VALUE ...]
+
+Extra NAME=VALUE pairs are passed to the app's environment, e.g.
+GRAPH_READ_TIMEOUT=2.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def measure():
+    """Child process: boot the app and serve one request, printing the timings as JSON"""
+    started = time.perf_counter()
+    from app import app
+    booted = time.perf_counter()
+    status = app.test_client().get('/').status_code
+    served = time.perf_counter()
+    print(json.dumps({'import_seconds': booted - started, 'first_request_seconds': served - booted, 'status': status}))
+    sys.stdout.flush()
+    # Skip interpreter teardown, which would wait on any connection still hanging
+    os._exit(0)
+
+def run(label, environment):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure'], cwd=ROOT,
+                            env=environment, capture_output=True, text=True, timeout=600).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    print(f"{label:<12} import {result['import_seconds']:6.2f}s  "
+          f"first request {result['first_request_seconds']:6.2f}s  (HTTP {result['status']})")
+
+def main():
+    # Accepts TCP connections (the backlog queues them) but never reads or replies
+    blackhole = socket.socket()
+    blackhole.bind(('127.0.0.1', 0))
+    blackhole.listen(128)
+    unreachable = f'http://127.0.0.1:{blackhole.getsockname()[1]}'
+    
+    environment = dict(os.environ,
+                       DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cold_start.db')}",
+                       OUTBOX_WORKERS='0',
+                       MICROSOFT_CLIENT_ID='client', MICROSOFT_CLIENT_SECRET='secret', MICROSOFT_TENANT_ID='tenant',
+                       MICROSOFT_LOGIN_URL=unreachable, MICROSOFT_GRAPH_URL=f'{unreachable}/v1.0',
+                       GRAPH_READ_TIMEOUT='5', GRAPH_MAX_RETRIES='1')
+    environment.update(argument.split('=', 1) for argument in sys.argv[1:])
+    
+    print(f"Integrations pointed at {unreachable} (read timeout {environment['GRAPH_READ_TIMEOUT']}s)")
+    run('lazy', dict(environment, WARM_UP_INTEGRATIONS='false'))
+    run('warm-up', dict(environment, WARM_UP_INTEGRATIONS='true'))
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--measure']:
+        measure()
+    else:
+        main()
@@ -0,0 +1,91 @@
+"""Micro-benchmark for message datetime extraction
+
+Times MessageScanner.extract_datetime_info over synthetic messages against
+the original four-pattern extractor, with a cold and a warm parse cache.
+
+    python benchmarks/bench_datetime.py [messages]
+"""
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('OUTBOX_WORKERS', '0')
+
+from app import app
+from message_scanner import _parse_datetime, message_scanner
+
+TEMPLATES = [
+    'Room {room} needs a terminal clean by {month}/{day}/2025 {hour}:{minute} {ampm}',
+    'Staff meeting tomorrow {hour}:{minute} {ampm} in the conference room',
+    'Reminder: floor stripping on {month}-{day}-2025 {hour}:{minute}',
+    'Call back about the linen order at {hour}:{minute} {ampm}',
+    'Can someone cover the {room} corridor today {hour}:{minute} {ampm}?',
+    'Thanks everyone for the great work this week on unit {room}',
+    'Spill in the main lobby near elevator {room}, please respond ASAP',
+    'Inspection next tuesday at {hour} {ampm}, make sure the break room is tidy',
+]
+
+LEGACY_PATTERNS = [
+    r'(\d{1,2})/(\d{1,2})/(\d{4})\s+(\d{1,2}):(\d{2})\s*(AM|PM)?',
+    r'(\d{1,2})-(\d{1,2})-(\d{4})\s+(\d{1,2}):(\d{2})',
+    r'(today|tomorrow)\s+(\d{1,2}):(\d{2})\s*(AM|PM)?',
+    r'(\d{1,2}):(\d{2})\s*(AM|PM)',
+]
+
+def legacy_extract(content):
+    """The original extractor: each pattern searched in turn over the lowercased content"""
+    content_lower = content.lower()
+    for pattern in LEGACY_PATTERNS:
+        match = re.search(pattern, content_lower)
+        if not match:
+            continue
+        groups = match.groups()
+        try:
+            if groups[0] in ('today', 'tomorrow'):
+                day = datetime.now().date() + timedelta(days=1 if groups[0] == 'tomorrow' else 0)
+                return datetime.combine(day, datetime.min.time().replace(hour=int(groups[1]), minute=int(groups[2])))
+            if len(groups) >= 5:
+                return datetime(int(groups[2]), int(groups[0]), int(groups[1]), int(groups[3]), int(groups[4]))
+            return datetime.combine(datetime.now().date(),
+                                    datetime.min.time().replace(hour=int(groups[0]), minute=int(groups[1])))
+        except (ValueError, IndexError):
+            continue
+    return None
+
+def synthetic_messages(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(
+            room=rng.randint(100, 999), month=rng.randint(1, 12), day=rng.randint(1, 28),
+            hour=rng.randint(1, 12), minute=f'{rng.randint(0, 59):02d}', ampm=rng.choice(['AM', 'PM'])
+        )
+        for _ in range(count)
+    ]
+
+def timed(label, extract, messages):
+    started = time.perf_counter()
+    found = sum(1 for content in messages if extract(content) is not None)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {elapsed:7.3f}s  {len(messages) / elapsed:11,.0f} msg/s  {found:,} with a datetime")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    messages = synthetic_messages(count)
+    print(f"{count:,} synthetic messages")
+    
+    try:
+        timed('legacy patterns', legacy_extract, messages)
+        _parse_datetime.cache_clear()
+        timed('grammar, cold cache', message_scanner.extract_datetime_info, messages)
+        timed('grammar, warm cache', message_scanner.extract_datetime_info, messages)
+        print(_parse_datetime.cache_info())
+    finally:
+        app.scheduler_service.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -25,13 +25,107 @@ class Config:
     MICROSOFT_CLIENT_ID = os.environ.get('MICROSOFT_CLIENT_ID', '')
     MICROSOFT_CLIENT_SECRET = os.environ.get('MICROSOFT_CLIENT_SECRET', '')
     MICROSOFT_TENANT_ID = os.environ.get('MICROSOFT_TENANT_ID', '')
+    MICROSOFT_GRAPH_URL = os.environ.get('MICROSOFT_GRAPH_URL', 'https://graph.microsoft.com/v1.0')
+    MICROSOFT_LOGIN_URL = os.environ.get('MICROSOFT_LOGIN_URL', 'https://login.microsoftonline.com')
+    
+    # Microsoft Graph HTTP client: pooled keep-alive connections, timeouts (seconds) and retries
+    GRAPH_POOL_SIZE = int(os.environ.get('GRAPH_POOL_SIZE', 10))
+    GRAPH_CONNECT_TIMEOUT = float(os.environ.get('GRAPH_CONNECT_TIMEOUT', 5))
+    GRAPH_READ_TIMEOUT = float(os.environ.get('GRAPH_READ_TIMEOUT', 30))
+    GRAPH_MAX_RETRIES = int(os.environ.get('GRAPH_MAX_RETRIES', 3))
+    GRAPH_MAX_CONCURRENCY = int(os.environ.get('GRAPH_MAX_CONCURRENCY', 4))  # Parallel $batch calls
+    GRAPH_RETRY_BACKOFF_SECONDS = 1
+    GRAPH_MAX_RETRY_DELAY_SECONDS = 60
+    
+    # Mailbox whose Outlook calendar receives events created from scanned messages (disabled when empty)
+    OUTLOOK_CALENDAR_USER = os.environ.get('OUTLOOK_CALENDAR_USER', '')
+    
+    # Connect integrations on a background thread at startup instead of on first use
+    WARM_UP_INTEGRATIONS = os.environ.get('WARM_UP_INTEGRATIONS', 'false').lower() == 'true'
     
     # iOS Shortcut integration
     IOS_SHORTCUT_TOKEN = os.environ.get('IOS_SHORTCUT_TOKEN', 'a1561b33-9322-4749-a93c-9265a90905da')
     
+    # Bulk ingest (/api/log_messages): rows per INSERT and most items accepted per request
+    BULK_INGEST_CHUNK_SIZE = 500
+    BULK_INGEST_MAX_ITEMS = 20000
+    
+    # Outbox worker pool delivering integration side effects (0 workers disables it)
+    OUTBOX_WORKERS = int(os.environ.get('OUTBOX_WORKERS', 2))
+    OUTBOX_BATCH_SIZE = 50
+    OUTBOX_POLL_SECONDS = 2
+    OUTBOX_LEASE_SECONDS = 300
+    OUTBOX_MAX_ATTEMPTS = 8
+    OUTBOX_RETRY_BACKOFF_SECONDS = 30
+    OUTBOX_RETENTION_DAYS = 7  # Delivered events are deleted after this long; failed ones are kept
+    OUTBOX_PURGE_MINUTES = 60
+    OUTBOX_PURGE_BATCH_SIZE = 1000  # Rows deleted per statement and commit
+    # Sheets rows wait this long before delivery, so a burst goes out as one append_rows per worksheet
+    SHEETS_FLUSH_SECONDS = 5
+    
     # Message scanning settings
     SCAN_INTERVAL_MINUTES = 15
     REMINDER_INTERVAL_MINUTES = 30
+    REMINDER_BACKOFF_AFTER = 5  # Reminders fired more often than this repeat every REMINDER_BACKOFF_HOURS
+    REMINDER_BACKOFF_HOURS = 2
+    REMINDER_BATCH_SIZE = 500  # Due reminders fired per UPDATE and commit
+    # The reminder timer hears about reminders committed in its own worker at once;
+    # ones written by other workers reach it on the next resync, which merges in
+    # reminders due within two intervals. Those can fire up to one interval late,
+    # no later than under the old 5-minute poll, and idle resyncs are one query.
+    REMINDER_RESYNC_MINUTES = 5
+    STATS_RECONCILE_MINUTES = 60  # Recount dashboard counters against the tables
+    
+    # Only the process holding the scheduler lease runs the jobs above; it renews
+    # every heartbeat and another worker takes over once it has expired
+    SCHEDULER_LEASE_SECONDS = 30
+    SCHEDULER_HEARTBEAT_SECONDS = 10
+    
+    # Dashboard fragment cache: in-process LRU unless a shared Redis URL is set
+    FRAGMENT_CACHE_URL = os.environ.get('FRAGMENT_CACHE_URL')
+    FRAGMENT_CACHE_MAX_ENTRIES = 256
+    FRAGMENT_CACHE_TTL_SECONDS = 3600
+    
+    # Dashboard delta API: re-scan window for late commits and items per list
+    DASHBOARD_DELTA_OVERLAP_SECONDS = 10
+    DASHBOARD_DELTA_MAX_ITEMS = 20
+    
+    # List views: keyset page sizes and how long approximate totals are reused
+    MESSAGES_PER_PAGE = 20
+    TASKS_PER_PAGE = 50
+    TASKS_MAX_PER_PAGE = 1000
+    STREAM_YIELD_PER = 100  # Rows fetched per batch when a listing is streamed
+    LISTING_COUNT_CACHE_SECONDS = 60
+    
+    # Calendar windows: longest event looked back for, and widest window the feed serves
+    CALENDAR_MAX_EVENT_DAYS = 14
+    CALENDAR_MAX_WINDOW_DAYS = 62
+    
+    # Server-sent event stream. Each open stream holds a worker thread, so the
+    # client cap should stay below gunicorn's --threads; beyond it clients poll.
+    EVENT_STREAM_MAX_CLIENTS = int(os.environ.get('EVENT_STREAM_MAX_CLIENTS', 24))
+    EVENT_STREAM_QUEUE_SIZE = 100
+    EVENT_STREAM_HISTORY_SIZE = 500
+    EVENT_STREAM_HEARTBEAT_SECONDS = 15
+    EVENT_STREAM_MAX_SECONDS = 300  # Streams are recycled so load balancers don't cut them mid-event
+    EVENT_STREAM_RETRY_MS = 5000
+    
+    # Each gunicorn worker has its own event broker, and scans and reminders run
+    # only in the scheduler leader, so with several workers a stream carries just
+    # the events its own worker publishes and the dashboard keeps polling at the
+    # normal delta interval.
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+    
+    # Incremental mail sync: first-run lookback and messages fetched per poll
+    MAIL_SYNC_LOOKBACK_HOURS = 24
+    MAIL_SYNC_PAGE_SIZE = 50
+    
+    # Mail ingestion pipeline: pages buffered between stages, and workers per stage
+    INGEST_QUEUE_SIZE = 4
+    INGEST_DEDUP_WORKERS = 1
+    INGEST_CLASSIFY_WORKERS = 2
+    INGEST_PERSIST_WORKERS = 1
+    INGEST_FANOUT_WORKERS = 1
     
     # Facilities configuration
     FACILITIES = [
@@ -52,3 +146,29 @@ class Config:
         'soon', 'tomorrow', 'schedule', 'meeting', 'appointment',
         'follow up', 'followup', 'review', 'check'
     ]
+    
+    # Keywords indicating a message describes a task or a calendar event
+    TASK_KEYWORDS = [
+        'need', 'needs', 'required', 'please', 'can you', 'could you',
+        'assign', 'schedule', 'clean', 'cleaning', 'maintenance',
+        'repair', 'fix', 'check', 'inspection', 'audit', 'coverage',
+        'staff', 'help', 'assist', 'complete', 'finish', 'do'
+    ]
+    
+    EVENT_KEYWORDS = [
+        'meeting', 'appointment', 'schedule', 'audit', 'inspection',
+        'training', 'conference', 'call', 'visit', 'at', 'on',
+        'deadline', 'due', 'reminder'
+    ]
+    
+    STAFFING_KEYWORDS = ['coverage', 'staff', 'assign']
+    
+    # Short names that identify a facility when the full name is not used
+    FACILITY_ALIASES = {
+        'bellevue': 'Bellevue Medical Center',
+        'clinic a': 'Clinic A',
+        'clinic b': 'Clinic B',
+        'clinic c': 'Clinic C',
+        'clinic d': 'Clinic D',
+        'main': 'Bellevue Medical Center'
+    }
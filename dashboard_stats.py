@@ -0,0 +1,244 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.orm import Session
+from models import CalendarEvent, DashboardStat, Message, Task, db
+from config import Config
+from fragment_cache import get_table_versions
+
+logger = logging.getLogger(__name__)
+
+PENDING_TASK_STATUSES = ['Not Started', 'In Progress']
+
+# Counter name -> (model, fields the predicate reads, predicate over those values, SQL condition)
+COUNTERS = {
+    'total_tasks': (
+        Task, (),
+        lambda values: True,
+        lambda: True
+    ),
+    'pending_tasks': (
+        Task, ('status',),
+        lambda values: values['status'] in PENDING_TASK_STATUSES,
+        lambda: Task.status.in_(PENDING_TASK_STATUSES)
+    ),
+    'high_priority_messages': (
+        Message, ('priority', 'processed'),
+        lambda values: values['priority'] == 'High' and values['processed'] is not None and not values['processed'],
+        lambda: (Message.priority == 'High') & (Message.processed == False)
+    ),
+}
+
+TRACKED_TABLES = {model.__table__: model for model, _, _, _ in COUNTERS.values()}
+
+def _noop(target, value, oldvalue, initiator):
+    pass
+
+# Load the previous value before an attribute is overwritten, so flush-time
+# history always knows what a counted field changed from
+for _model, _fields, _, _ in COUNTERS.values():
+    for _field in _fields:
+        event.listen(getattr(_model, _field), 'set', _noop, active_history=True)
+
+def _old_values(obj, fields) -> Dict:
+    state = inspect(obj)
+    values = {}
+    for field in fields:
+        history = state.attrs[field].history
+        if history.deleted:
+            values[field] = history.deleted[0]
+        elif history.unchanged:
+            values[field] = history.unchanged[0]
+        else:
+            values[field] = getattr(obj, field)
+    return values
+
+def _apply_deltas(connection, deltas: Dict[str, int]):
+    """Add deltas to the stored counters within the current transaction"""
+    table = DashboardStat.__table__
+    for name, delta in deltas.items():
+        if delta:
+            connection.execute(update(table).where(table.c.name == name).values(value=table.c.value + delta))
+
+@event.listens_for(Session, 'after_flush')
+def _count_flushed_changes(session, flush_context):
+    """Turn the inserts, updates and deletes of this flush into counter deltas"""
+    deltas = {}
+    for name, (model, fields, predicate, _) in COUNTERS.items():
+        delta = 0
+        for obj in session.new:
+            if isinstance(obj, model) and predicate({field: getattr(obj, field) for field in fields}):
+                delta += 1
+        for obj in session.deleted:
+            if isinstance(obj, model) and predicate(_old_values(obj, fields)):
+                delta -= 1
+        for obj in session.dirty:
+            if isinstance(obj, model) and fields and session.is_modified(obj):
+                before = predicate(_old_values(obj, fields))
+                after = predicate({field: getattr(obj, field) for field in fields})
+                delta += int(after) - int(before)
+        deltas[name] = delta
+    
+    if any(deltas.values()):
+        _apply_deltas(session.connection(), deltas)
+
+def _column_default(model, field):
+    default = model.__table__.c[field].default
+    if default is None:
+        return None
+    return default.arg if default.is_scalar else None
+
+@event.listens_for(Session, 'do_orm_execute')
+def _count_bulk_statements(orm_execute_state):
+    """Keep counters right for bulk INSERT/UPDATE/DELETE statements, which bypass flush"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    model = TRACKED_TABLES.get(getattr(orm_execute_state.statement, 'table', None))
+    if model is None:
+        return None
+    
+    result = orm_execute_state.invoke_statement()
+    session = orm_execute_state.session
+    counters = {name: counter for name, counter in COUNTERS.items() if counter[0] is model}
+    
+    if orm_execute_state.is_insert and orm_execute_state.parameters:
+        rows = orm_execute_state.parameters
+        if isinstance(rows, dict):
+            rows = [rows]
+        deltas = {}
+        for name, (_, fields, predicate, _) in counters.items():
+            deltas[name] = sum(
+                1 for row in rows
+                if predicate({field: row.get(field, _column_default(model, field)) for field in fields})
+            )
+        _apply_deltas(session.connection(), deltas)
+    else:
+        # Set-based changes can't be attributed row by row; recount what they touch
+        _recount(session.connection(), counters)
+    return result
+
+def _recount(connection, counters: Dict):
+    table = DashboardStat.__table__
+    now = datetime.utcnow()
+    for name, (model, _, _, condition) in counters.items():
+        count = connection.execute(select(func.count()).select_from(model).where(condition())).scalar()
+        updated = connection.execute(
+            update(table).where(table.c.name == name).values(value=count, reconciled_at=now)
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert().values(name=name, value=count, reconciled_at=now))
+
+def reconcile_counters():
+    """Recompute every counter from the tables, fixing any drift, and commit"""
+    try:
+        _recount(db.session.connection(), COUNTERS)
+        db.session.commit()
+        logger.info("Reconciled dashboard counters")
+    except Exception as e:
+        logger.error(f"Error reconciling dashboard counters: {e}")
+        db.session.rollback()
+
+def get_dashboard_stats() -> Dict[str, int]:
+    """Dashboard statistics from the maintained counters
+    
+    Upcoming events depend on the current time, so they are counted with a range
+    query over future events only; its cost does not grow with event history.
+    """
+    stats = {name: 0 for name in COUNTERS}
+    stats.update({stat.name: stat.value for stat in DashboardStat.query.all()})
+    stats['upcoming_events'] = CalendarEvent.query.filter(CalendarEvent.start_time >= datetime.now()).count()
+    return stats
+
+# Tables whose changes can alter a dashboard delta
+DELTA_TABLES = [Message.__table__.name, Task.__table__.name, CalendarEvent.__table__.name]
+
+def dashboard_etag() -> str:
+    """ETag over the dashboard table versions
+    
+    The upcoming-events count also changes with the clock alone, each time an
+    event starts, so the start of the next upcoming event is mixed in; the tag
+    moves when that event starts and otherwise only when a table changes.
+    """
+    versions = get_table_versions(DELTA_TABLES)
+    next_start = db.session.query(func.min(CalendarEvent.start_time)).filter(
+        CalendarEvent.start_time >= datetime.now()
+    ).scalar()
+    tag = ':'.join(str(version) for version in versions) + f":{next_start.isoformat() if next_start else ''}"
+    return hashlib.sha1(tag.encode('utf-8')).hexdigest()[:16]
+
+def parse_cursor(cursor: Optional[str]) -> Optional[datetime]:
+    """Cursors are the UTC timestamp of the previous delta; anything unparsable means no cursor"""
+    if not cursor:
+        return None
+    try:
+        return datetime.fromisoformat(cursor)
+    except ValueError:
+        return None
+
+def message_summary(message: Message) -> Dict:
+    """Fields the dashboard shows for a message, as sent to clients"""
+    return {
+        'id': message.id,
+        'sender': message.sender,
+        'content': message.content[:100],
+        'priority': message.priority,
+        'created_at': message.created_at.isoformat()
+    }
+
+def task_summary(task: Task) -> Dict:
+    return {
+        'id': task.id,
+        'title': task.title,
+        'facility': task.facility,
+        'priority': task.priority,
+        'status': task.status,
+        'assigned_to': task.assigned_to
+    }
+
+def event_summary(event: CalendarEvent) -> Dict:
+    return {
+        'id': event.id,
+        'title': event.title,
+        'location': event.location or event.facility,
+        'start_time': event.start_time.isoformat()
+    }
+
+def get_dashboard_delta(since: Optional[datetime]) -> Dict:
+    """Stats plus the high-priority messages, tasks and events changed since the cursor
+    
+    Rows are matched with an overlap window because created_at/updated_at are
+    stamped before commit; a transaction that commits late still shows up in the
+    next delta, and clients de-duplicate by id.
+    """
+    cursor = datetime.utcnow()
+    delta = {
+        'cursor': cursor.isoformat(),
+        'stats': get_dashboard_stats(),
+        'messages': [],
+        'tasks': [],
+        'events': []
+    }
+    if since is None:
+        return delta
+    
+    lower = since - timedelta(seconds=Config.DASHBOARD_DELTA_OVERLAP_SECONDS)
+    limit = Config.DASHBOARD_DELTA_MAX_ITEMS
+    
+    messages = Message.query.filter(
+        Message.priority == 'High',
+        Message.created_at > lower
+    ).order_by(Message.created_at.desc()).limit(limit).all()
+    delta['messages'] = [message_summary(message) for message in messages]
+    
+    tasks = Task.query.filter(Task.updated_at > lower).order_by(Task.updated_at.desc()).limit(limit).all()
+    delta['tasks'] = [task_summary(task) for task in tasks]
+    
+    events = CalendarEvent.query.filter(
+        CalendarEvent.created_at > lower,
+        CalendarEvent.start_time >= datetime.now()
+    ).order_by(CalendarEvent.start_time).limit(limit).all()
+    delta['events'] = [event_summary(event) for event in events]
+    
+    return delta
@@ -0,0 +1,113 @@
+import json
+import logging
+import queue
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """One connected stream client: a bounded queue of pre-formatted events"""
+    
+    def __init__(self, queue_size: int, replay: List[str]):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.replay = replay
+        self.overflowed = False
+    
+    def get(self, timeout: float) -> Optional[str]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class EventBroker:
+    """In-process publish/subscribe fan-out for the server-sent event stream
+    
+    Events are formatted once at publish time and the same string is handed to
+    every subscriber. A subscriber whose queue fills up is marked overflowed and
+    disconnected; its client reconnects with Last-Event-ID and is replayed from
+    the recent history, or told to resync when it has fallen further behind.
+    """
+    
+    def __init__(self, history_size: int, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._next_id = 1
+        self._lock = threading.Lock()
+    
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+    
+    def publish(self, event_type: str, data: Dict) -> int:
+        """Send an event to every subscriber; returns its id"""
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            message = f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+            self._history.append((event_id, message))
+            subscribers = list(self._subscribers)
+        
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                subscription.overflowed = True
+        return event_id
+    
+    def subscribe(self, last_event_id: Optional[int] = None) -> Optional[Subscription]:
+        """Register a client, or return None when this worker has no free stream slots"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            
+            replay = []
+            if last_event_id is not None:
+                oldest = self._history[0][0] if self._history else self._next_id
+                if last_event_id >= self._next_id or last_event_id < oldest - 1:
+                    # Another process (or a restart) issued that id, or history moved on
+                    replay = ["event: resync\ndata: {}\n\n"]
+                else:
+                    replay = [message for event_id, message in self._history if event_id > last_event_id]
+            
+            subscription = Subscription(self.queue_size, replay)
+            self._subscribers.add(subscription)
+            return subscription
+    
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+event_broker = EventBroker(
+    Config.EVENT_STREAM_HISTORY_SIZE,
+    Config.EVENT_STREAM_QUEUE_SIZE,
+    Config.EVENT_STREAM_MAX_CLIENTS
+)
+
+def publish_on_commit(event_type: str, data: Dict):
+    """Publish an event once the current transaction commits; dropped on rollback"""
+    db.session.info.setdefault('stream_events', []).append((event_type, data))
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed_events(session):
+    # Releasing a savepoint fires after_commit too; wait for the outermost commit
+    if session.in_nested_transaction():
+        return
+    for event_type, data in session.info.pop('stream_events', []):
+        try:
+            event_broker.publish(event_type, data)
+        except Exception as e:
+            logger.error(f"Error publishing {event_type} event: {e}")
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_stream_events(session, previous_transaction):
+    # A savepoint rolling back leaves the enclosing transaction's events pending
+    if previous_transaction.parent is None:
+        session.info.pop('stream_events', None)
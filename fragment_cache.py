@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import DashboardStat, LeaderLease, OutboxEvent, SyncState, TableVersion, db
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping tables no fragment is built from; writing them bumps no version
+UNVERSIONED_TABLES = {model.__table__.name for model in (TableVersion, DashboardStat, LeaderLease, OutboxEvent, SyncState)}
+
+def get_table_versions(tables: List[str]) -> List[int]:
+    """Current version of each table, read from the database so every worker agrees"""
+    rows = dict(db.session.execute(
+        select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(tables))
+    ).all())
+    return [rows.get(table, 0) for table in tables]
+
+def seed_table_versions():
+    """Create the version row of every cached table; writes to tables without a row bump nothing"""
+    try:
+        existing = set(db.session.execute(select(TableVersion.name)).scalars())
+        missing = [table.name for table in db.metadata.sorted_tables
+                   if table.name not in existing and table.name not in UNVERSIONED_TABLES]
+        if missing:
+            db.session.execute(insert(TableVersion), [{'name': name, 'version': 0} for name in missing])
+        db.session.commit()
+    except IntegrityError:
+        # Another worker seeded the same rows first
+        db.session.rollback()
+
+class MemoryCacheStore:
+    """In-process fragment store with bounded LRU eviction"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: str, expires_at: Optional[float] = None):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class RedisCacheStore:
+    """Fragment store shared by all workers through Redis
+    
+    Fragments are written with a TTL, so a server running with
+    maxmemory-policy volatile-lru evicts them in LRU order.
+    """
+    
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+    
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(f'fragment:{key}')
+        return value.decode('utf-8') if value is not None else None
+    
+    def set(self, key: str, value: str, expires_at: Optional[float] = None):
+        ttl = self.ttl_seconds
+        if expires_at is not None:
+            ttl = min(ttl, int(expires_at - time.time()))
+        if ttl > 0:
+            self.client.set(f'fragment:{key}', value, ex=ttl)
+
+class FragmentCache:
+    """Cache of rendered page fragments keyed on the versions of their tables
+    
+    Every commit bumps the version of each table it wrote, in the database
+    and within the same transaction, so a fragment is rendered again only
+    after its underlying data changed, whichever worker changed it. Versions
+    are read before rendering, which means a commit racing with a render can
+    only make the stored fragment newer than its key, never older.
+    """
+    
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_render(self, name: str, tables: List[str], render: Callable[[], Tuple[str, Optional[datetime]]]) -> str:
+        """Return the cached fragment, or call render() for (html, expires_at) and cache it"""
+        try:
+            versions = get_table_versions(tables)
+            key = name + ':' + ':'.join(str(version) for version in versions)
+            html = self.store.get(key)
+        except Exception as e:
+            logger.error(f"Error reading fragment cache for {name}: {e}")
+            return render()[0]
+        
+        if html is not None:
+            self.hits += 1
+            return html
+        
+        self.misses += 1
+        html, expires_at = render()
+        try:
+            self.store.set(key, html, expires_at.timestamp() if expires_at else None)
+        except Exception as e:
+            logger.error(f"Error writing fragment cache for {name}: {e}")
+        return html
+
+def create_store():
+    """Shared Redis store when FRAGMENT_CACHE_URL is set, in-process LRU otherwise"""
+    if Config.FRAGMENT_CACHE_URL:
+        try:
+            return RedisCacheStore(Config.FRAGMENT_CACHE_URL, Config.FRAGMENT_CACHE_TTL_SECONDS)
+        except ImportError:
+            logger.error("FRAGMENT_CACHE_URL is set but the redis package is not installed; using in-process cache")
+    return MemoryCacheStore(Config.FRAGMENT_CACHE_MAX_ENTRIES)
+
+fragment_cache = FragmentCache(create_store())
+
+@event.listens_for(Session, 'after_flush')
+def _record_flushed_tables(session, flush_context):
+    changed = session.info.setdefault('changed_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            changed.add(table.name)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_statement_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault('changed_tables', set()).add(table.name)
+
+@event.listens_for(Session, 'before_commit')
+def _bump_table_versions(session):
+    # Savepoint releases fire before_commit as well; bump once, for the outermost commit
+    if session.in_nested_transaction():
+        return
+    # before_commit runs ahead of the final flush, so flush now to record its tables too
+    session.flush()
+    changed = session.info.pop('changed_tables', set()) - UNVERSIONED_TABLES
+    if changed:
+        table = TableVersion.__table__
+        session.connection().execute(
+            update(table).where(table.c.name.in_(sorted(changed))).values(version=table.c.version + 1)
+        )
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changed_tables(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('changed_tables', None)
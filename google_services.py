@@ -1,6 +1,7 @@
 import os
 import json
 import logging
+import threading
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import gspread
@@ -8,17 +9,50 @@ from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from config import Config
+from service_proxy import LazyServiceProxy
 
 logger = logging.getLogger(__name__)
 
+# Header row written when a worksheet has to be created
+WORKSHEET_HEADERS = {
+    'Messages': ["Timestamp", "Sender", "Content", "Source", "Priority", "Processed"],
+    'Tasks': ["Timestamp", "Title", "Description", "Facility", "Priority", "Assigned To", "Status", "Due Date"]
+}
+
+def message_row(sender: str, content: str, source: str, priority: str) -> List:
+    """Row for the Messages worksheet"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return [timestamp, sender, content, source, priority, "No"]
+
+def task_row(title: str, description: str, facility: str, priority: str, assigned_to: str = "") -> List:
+    """Row for the Tasks worksheet"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return [timestamp, title, description, facility, priority, assigned_to, "Not Started", ""]
+
 class GoogleSheetsService:
-    """Service for Google Sheets integration"""
+    """Service for Google Sheets integration
+    
+    Rows are logged through the outbox ('sheets_row' events). Each event waits
+    SHEETS_FLUSH_SECONDS, so the workers pick up a burst together and call
+    write_rows with one batch per worksheet. Connecting to Google happens on the
+    first write or read, so request handlers never wait on the Sheets API.
+    """
     
     def __init__(self):
         self.credentials = None
         self.gc = None
         self.sheet = None
-        self._initialize_credentials()
+        self.initialized = False
+        self.init_lock = threading.Lock()
+        self.worksheets = {}
+    
+    def _ensure_initialized(self):
+        """Connect to Google Sheets once, on first real use"""
+        if not self.initialized:
+            with self.init_lock:
+                if not self.initialized:
+                    self._initialize_credentials()
+                    self.initialized = True
     
     def _initialize_credentials(self):
         """Initialize Google Sheets credentials"""
@@ -54,57 +88,37 @@ class GoogleSheetsService:
         except Exception as e:
             logger.error(f"Failed to initialize Google Sheets: {e}")
     
-    def log_message(self, sender: str, content: str, source: str, priority: str) -> bool:
-        """Log a message to Google Sheets"""
-        try:
-            if not self.sheet:
-                logger.error("Google Sheets not initialized")
-                return False
-            
-            # Get or create the messages worksheet
+    def _get_worksheet(self, title: str):
+        """Get or create a worksheet, caching the handle between flushes"""
+        worksheet = self.worksheets.get(title)
+        if worksheet is None:
             try:
-                worksheet = self.sheet.worksheet("Messages")
+                worksheet = self.sheet.worksheet(title)
             except gspread.WorksheetNotFound:
-                worksheet = self.sheet.add_worksheet(title="Messages", rows="1000", cols="6")
+                headers = WORKSHEET_HEADERS[title]
+                worksheet = self.sheet.add_worksheet(title=title, rows="1000", cols=str(len(headers)))
                 # Add headers
-                worksheet.append_row(["Timestamp", "Sender", "Content", "Source", "Priority", "Processed"])
-            
-            # Add the message
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            worksheet.append_row([timestamp, sender, content, source, priority, "No"])
-            
-            logger.info(f"Logged message from {sender} to Google Sheets")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to log message to Google Sheets: {e}")
-            return False
+                worksheet.append_row(headers)
+            self.worksheets[title] = worksheet
+        return worksheet
     
-    def log_task(self, title: str, description: str, facility: str, priority: str, assigned_to: str = "") -> bool:
-        """Log a task to Google Sheets"""
-        try:
-            if not self.sheet:
-                return False
-            
-            try:
-                worksheet = self.sheet.worksheet("Tasks")
-            except gspread.WorksheetNotFound:
-                worksheet = self.sheet.add_worksheet(title="Tasks", rows="1000", cols="8")
-                worksheet.append_row(["Timestamp", "Title", "Description", "Facility", "Priority", "Assigned To", "Status", "Due Date"])
-            
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            worksheet.append_row([timestamp, title, description, facility, priority, assigned_to, "Not Started", ""])
-            
-            logger.info(f"Logged task '{title}' to Google Sheets")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to log task to Google Sheets: {e}")
-            return False
+    def write_rows(self, title: str, rows: List[List]):
+        """Append rows to a worksheet now, with a single API call
+        
+        Raises on API errors so callers such as the outbox can retry.
+        """
+        self._ensure_initialized()
+        if not self.sheet:
+            logger.error(f"Google Sheets not initialized, discarding {len(rows)} rows for {title}")
+            return
+        
+        self._get_worksheet(title).append_rows(rows)
+        logger.info(f"Logged {len(rows)} rows to Google Sheets worksheet {title}")
     
     def get_tasks(self) -> List[Dict]:
         """Retrieve tasks from Google Sheets"""
         try:
+            self._ensure_initialized()
             if not self.sheet:
                 return []
             
@@ -206,6 +220,6 @@ class GoogleCalendarService:
             logger.error(f"Failed to get calendar events: {e}")
             return []
 
-# Initialize services
-sheets_service = GoogleSheetsService()
-calendar_service = GoogleCalendarService()
+# Initialize services on first use
+sheets_service = LazyServiceProxy('Google Sheets', GoogleSheetsService)
+calendar_service = LazyServiceProxy('Google Calendar', GoogleCalendarService)
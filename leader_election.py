@@ -0,0 +1,95 @@
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from models import LeaderLease, db
+
+logger = logging.getLogger(__name__)
+
+# Lease guarding the BackgroundScheduler jobs
+SCHEDULER_LEASE = 'scheduler'
+
+class LeaderElection:
+    """Database-backed lease so that exactly one process acts as leader
+    
+    Every candidate calls renew() on a heartbeat well inside ttl_seconds. The
+    holder extends its lease; anyone else takes the row over only once it has
+    expired, with a conditional UPDATE so two candidates can never both win.
+    Expiry is compared against each caller's clock, so hosts must keep their
+    clocks within a small fraction of the TTL.
+    """
+    
+    def __init__(self, name: str, ttl_seconds: int):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held_until = 0.0
+    
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process holds an unexpired lease, by its own clock and without a query"""
+        return time.monotonic() < self._held_until
+    
+    def renew(self) -> bool:
+        """Take or extend the lease; returns whether this process is now the leader"""
+        started = time.monotonic()
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        
+        try:
+            claimed = LeaderLease.query.filter(
+                LeaderLease.name == self.name,
+                or_(LeaderLease.holder == self.holder, LeaderLease.expires_at < now)
+            ).update({
+                LeaderLease.holder: self.holder,
+                LeaderLease.expires_at: expires_at,
+                LeaderLease.renewed_at: now
+            }, synchronize_session=False) > 0
+            
+            if not claimed:
+                # First run: create the row; a concurrent creator wins on the primary key
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(insert(LeaderLease).values(
+                            name=self.name, holder=self.holder, expires_at=expires_at, renewed_at=now
+                        ))
+                    claimed = True
+                except IntegrityError:
+                    pass
+            db.session.commit()
+        
+        except Exception as e:
+            logger.error(f"Error renewing lease {self.name}: {e}")
+            db.session.rollback()
+            claimed = False
+        
+        # Counted from before the query, so the local view expires no later than the row
+        self._held_until = started + self.ttl_seconds if claimed else 0.0
+        return claimed
+    
+    def current_holder(self) -> Optional[str]:
+        """The process holding an unexpired lease, by the database, or None"""
+        lease = db.session.get(LeaderLease, self.name)
+        if lease is None or lease.expires_at < datetime.utcnow():
+            return None
+        return lease.holder
+    
+    def release(self):
+        """Give the lease up so another process can take over without waiting for expiry"""
+        if not self.is_leader:
+            return
+        self._held_until = 0.0
+        try:
+            LeaderLease.query.filter(
+                LeaderLease.name == self.name,
+                LeaderLease.holder == self.holder
+            ).update({LeaderLease.expires_at: datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error releasing lease {self.name}: {e}")
+            db.session.rollback()
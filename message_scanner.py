@@ -1,201 +1,362 @@
 import logging
 import re
-from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Optional
-from models import Message, Task, CalendarEvent, db
-from google_services import sheets_service
+import threading
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from itertools import islice
+from flask import current_app
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from typing import Iterable, List, Dict, Tuple, Optional
+from models import Message, Task, CalendarEvent, Reminder, SyncState, db
+from google_services import message_row
+from outbox import enqueue, enqueue_many
+from event_stream import event_broker, publish_on_commit
+from reminder_timer import reminder_timer
+from pipeline import OrderedCompletion, Pipeline, Stage
 from microsoft_services import graph_service
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_FACILITY = 'Bellevue Medical Center'
+
+# SyncState name holding the receivedDateTime watermark for Outlook mail
+MAIL_SYNC_STATE = 'outlook_mail:me'
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Every supported date/time shape in one grammar, matched against lowercased
+# content. A date may be followed by a time; a time on its own needs AM/PM.
+# The leading lookahead lets the regex engine skip to plausible first characters.
+DATETIME_PATTERN = re.compile(r'''
+    (?=[\dtmwfsn])\b(?:
+        (?:
+            (?P<iso_year>\d{4})-(?P<iso_month>\d{1,2})-(?P<iso_day>\d{1,2})          # YYYY-MM-DD
+          | (?P<month>\d{1,2})(?P<sep>[/-])(?P<day>\d{1,2})(?P=sep)(?P<year>\d{4})   # MM/DD/YYYY, MM-DD-YYYY
+          | (?P<relative>today|tomorrow)
+          | (?:(?P<next>next)\s+)?(?P<weekday>''' + '|'.join(WEEKDAYS) + r''')
+        )
+        (?:
+            (?:t|,?\s+(?:at\s+)?)
+            (?P<hour>\d{1,2})(?=:\d{2}|\s*[ap]m\b)(?::(?P<minute>\d{2}))?\s*(?P<ampm>[ap]m)?
+        )?
+      | (?P<bare_hour>\d{1,2})(?::(?P<bare_minute>\d{2}))?\s*(?P<bare_ampm>[ap]m)          # HH:MM AM/PM
+    )\b
+''', re.VERBOSE)
+
+def _to_time(hour: str, minute: Optional[str], ampm: Optional[str]) -> time:
+    """Build a time from matched groups, applying 12-hour clock rules"""
+    hour, minute = int(hour), int(minute or 0)
+    if ampm == 'pm' and hour != 12:
+        hour += 12
+    elif ampm == 'am' and hour == 12:
+        hour = 0
+    return time(hour, minute)
+
+def _match_date(match: re.Match, reference_date: date) -> date:
+    """Resolve the date part of a grammar match against the reference date"""
+    if match.group('iso_year'):
+        return date(int(match.group('iso_year')), int(match.group('iso_month')), int(match.group('iso_day')))
+    if match.group('year'):
+        return date(int(match.group('year')), int(match.group('month')), int(match.group('day')))
+    if match.group('relative'):
+        return reference_date + timedelta(days=1 if match.group('relative') == 'tomorrow' else 0)
+    
+    weekday = WEEKDAYS.index(match.group('weekday'))
+    if match.group('next'):
+        # "next Tuesday" is the Tuesday of the following week
+        return reference_date + timedelta(days=7 - reference_date.weekday() + weekday)
+    # A bare weekday is its soonest occurrence, today included
+    return reference_date + timedelta(days=(weekday - reference_date.weekday()) % 7)
+
+@lru_cache(maxsize=4096)
+def _parse_datetime(content: str, reference_date: date) -> Optional[datetime]:
+    """Find the most specific datetime in normalized content
+    
+    The first date with a time wins. Otherwise a standalone date and a
+    standalone time are combined, and a time alone falls on the reference date.
+    """
+    date_only = None
+    time_only = None
+    
+    for match in DATETIME_PATTERN.finditer(content):
+        try:
+            if match.group('bare_hour'):
+                if time_only is None:
+                    time_only = _to_time(match.group('bare_hour'), match.group('bare_minute'), match.group('bare_ampm'))
+                continue
+            
+            match_date = _match_date(match, reference_date)
+            if match.group('hour'):
+                return datetime.combine(match_date, _to_time(match.group('hour'), match.group('minute'), match.group('ampm')))
+            if date_only is None:
+                date_only = match_date
+        except ValueError:
+            continue
+    
+    if time_only is None:
+        return None
+    return datetime.combine(date_only or reference_date, time_only)
+
+class KeywordClassifier:
+    """Single-pass keyword matcher for message classification
+    
+    All configured keywords are compiled into one case-insensitive regex whose
+    alternation is factored as a prefix trie, so the content is scanned once and
+    every feature (priority, task, event, staffing, facility) comes out of the
+    same set of matches. Keywords only match whole words.
+    """
+    
+    def __init__(self):
+        # Normalized keyword -> set of feature names it contributes to
+        self.features = {}
+        # Normalized keyword -> (rank, facility); lower rank wins
+        self.facilities = {}
+        
+        for keyword in Config.HIGH_PRIORITY_KEYWORDS:
+            self._add(keyword, 'high')
+        for keyword in Config.MEDIUM_PRIORITY_KEYWORDS:
+            self._add(keyword, 'medium')
+        for keyword in Config.TASK_KEYWORDS:
+            self._add(keyword, 'task')
+        for keyword in Config.EVENT_KEYWORDS:
+            self._add(keyword, 'event')
+        for keyword in Config.STAFFING_KEYWORDS:
+            self._add(keyword, 'staffing')
+        
+        # Full facility names take precedence over aliases, in configured order
+        facility_terms = [(name, name) for name in Config.FACILITIES]
+        facility_terms += list(Config.FACILITY_ALIASES.items())
+        for rank, (keyword, facility) in enumerate(facility_terms):
+            key = self._add(keyword, 'facility')
+            if key not in self.facilities:
+                self.facilities[key] = (rank, facility)
+        
+        self.pattern = re.compile(r'\b(?:' + self._build_trie_pattern(self.features) + r')\b', re.IGNORECASE)
+    
+    @staticmethod
+    def _normalize(keyword: str) -> str:
+        return ' '.join(keyword.lower().split())
+    
+    def _add(self, keyword: str, feature: str) -> str:
+        key = self._normalize(keyword)
+        self.features.setdefault(key, set()).add(feature)
+        return key
+    
+    @staticmethod
+    def _build_trie_pattern(keywords) -> str:
+        """Build a regex alternation with shared prefixes factored out"""
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        
+        def build(node) -> str:
+            branches = []
+            for char in sorted(key for key in node if key):
+                prefix = r'\s+' if char == ' ' else re.escape(char)
+                branches.append(prefix + build(node[char]))
+            if not branches:
+                return ''
+            pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            # A keyword ending here makes the rest optional; regex backtracking
+            # still prefers the longest keyword at each position
+            return f'(?:{pattern})?' if '' in node else pattern
+        
+        return build(trie)
+    
+    def classify(self, content: str) -> Dict[str, any]:
+        """Scan content once and return every keyword-derived feature"""
+        found = set()
+        facility_rank, facility = None, None
+        
+        for match in self.pattern.finditer(content or ''):
+            key = self._normalize(match.group(0))
+            found.update(self.features.get(key, ()))
+            if key in self.facilities:
+                rank, name = self.facilities[key]
+                if facility_rank is None or rank < facility_rank:
+                    facility_rank, facility = rank, name
+        
+        if 'high' in found:
+            priority = 'High'
+        elif 'medium' in found:
+            priority = 'Medium'
+        else:
+            priority = 'Low'
+        
+        return {
+            'priority': priority,
+            'is_task': 'task' in found,
+            'is_event': 'event' in found,
+            'needs_staffing': 'staffing' in found,
+            'facility': facility or DEFAULT_FACILITY
+        }
+
 class MessageScanner:
     """Service for scanning and processing messages"""
     
     def __init__(self):
-        self.high_priority_keywords = [keyword.lower() for keyword in Config.HIGH_PRIORITY_KEYWORDS]
-        self.medium_priority_keywords = [keyword.lower() for keyword in Config.MEDIUM_PRIORITY_KEYWORDS]
+        self.classifier = KeywordClassifier()
+        self.pipeline: Optional[Pipeline] = None
+    
+    def classify(self, content: str) -> Dict[str, any]:
+        """Return priority, task/event flags and facility in a single pass"""
+        return self.classifier.classify(content)
     
     def determine_priority(self, content: str) -> str:
         """Determine message priority based on keywords"""
-        content_lower = content.lower()
-        
-        # Check for high priority keywords
-        for keyword in self.high_priority_keywords:
-            if keyword in content_lower:
-                return 'High'
-        
-        # Check for medium priority keywords
-        for keyword in self.medium_priority_keywords:
-            if keyword in content_lower:
-                return 'Medium'
-        
-        return 'Low'
+        return self.classify(content)['priority']
     
-    def extract_datetime_info(self, content: str) -> Optional[datetime]:
+    def extract_datetime_info(self, content: str, reference: Optional[datetime] = None) -> Optional[datetime]:
         """Extract datetime information from message content"""
         try:
-            # Common date/time patterns
-            patterns = [
-                r'(\d{1,2})/(\d{1,2})/(\d{4})\s+(\d{1,2}):(\d{2})\s*(AM|PM)?',  # MM/DD/YYYY HH:MM AM/PM
-                r'(\d{1,2})-(\d{1,2})-(\d{4})\s+(\d{1,2}):(\d{2})',  # MM-DD-YYYY HH:MM
-                r'(today|tomorrow)\s+(\d{1,2}):(\d{2})\s*(AM|PM)?',  # today/tomorrow HH:MM
-                r'(\d{1,2}):(\d{2})\s*(AM|PM)',  # HH:MM AM/PM (assumes today)
-            ]
-            
-            content_lower = content.lower()
-            
-            for pattern in patterns:
-                match = re.search(pattern, content_lower)
-                if match:
-                    try:
-                        groups = match.groups()
-                        
-                        if 'today' in groups[0] if groups else False:
-                            date_part = datetime.now().date()
-                            hour = int(groups[1])
-                            minute = int(groups[2])
-                            if len(groups) > 3 and groups[3] and 'pm' in groups[3].lower() and hour != 12:
-                                hour += 12
-                            elif len(groups) > 3 and groups[3] and 'am' in groups[3].lower() and hour == 12:
-                                hour = 0
-                            return datetime.combine(date_part, datetime.min.time().replace(hour=hour, minute=minute))
-                        
-                        elif 'tomorrow' in groups[0] if groups else False:
-                            date_part = (datetime.now() + timedelta(days=1)).date()
-                            hour = int(groups[1])
-                            minute = int(groups[2])
-                            if len(groups) > 3 and groups[3] and 'pm' in groups[3].lower() and hour != 12:
-                                hour += 12
-                            elif len(groups) > 3 and groups[3] and 'am' in groups[3].lower() and hour == 12:
-                                hour = 0
-                            return datetime.combine(date_part, datetime.min.time().replace(hour=hour, minute=minute))
-                        
-                        elif len(groups) >= 5:  # Full date pattern
-                            month, day, year = int(groups[0]), int(groups[1]), int(groups[2])
-                            hour, minute = int(groups[3]), int(groups[4])
-                            if len(groups) > 5 and groups[5] and 'pm' in groups[5].lower() and hour != 12:
-                                hour += 12
-                            elif len(groups) > 5 and groups[5] and 'am' in groups[5].lower() and hour == 12:
-                                hour = 0
-                            return datetime(year, month, day, hour, minute)
-                        
-                        elif len(groups) >= 2:  # Time only pattern
-                            hour = int(groups[0])
-                            minute = int(groups[1])
-                            if len(groups) > 2 and groups[2] and 'pm' in groups[2].lower() and hour != 12:
-                                hour += 12
-                            elif len(groups) > 2 and groups[2] and 'am' in groups[2].lower() and hour == 12:
-                                hour = 0
-                            today = datetime.now().date()
-                            return datetime.combine(today, datetime.min.time().replace(hour=hour, minute=minute))
-                    
-                    except (ValueError, IndexError):
-                        continue
-            
-            return None
-            
+            reference_date = (reference or datetime.now()).date()
+            # The grammar tolerates any whitespace, so lowercasing is all the
+            # normalization the cache key needs
+            return _parse_datetime(content.lower(), reference_date)
+        
         except Exception as e:
             logger.error(f"Error extracting datetime from content: {e}")
             return None
     
     def extract_facility_info(self, content: str) -> str:
         """Extract facility information from message content"""
-        content_lower = content.lower()
-        
-        for facility in Config.FACILITIES:
-            if facility.lower() in content_lower:
-                return facility
-        
-        # Look for common facility indicators
-        facility_keywords = {
-            'bellevue': 'Bellevue Medical Center',
-            'clinic a': 'Clinic A',
-            'clinic b': 'Clinic B', 
-            'clinic c': 'Clinic C',
-            'clinic d': 'Clinic D',
-            'main': 'Bellevue Medical Center'
-        }
-        
-        for keyword, facility in facility_keywords.items():
-            if keyword in content_lower:
-                return facility
-        
-        return 'Bellevue Medical Center'  # Default facility
+        return self.classify(content)['facility']
     
     def is_task_related(self, content: str) -> bool:
         """Determine if message content indicates a task"""
-        task_indicators = [
-            'need', 'needs', 'required', 'please', 'can you', 'could you',
-            'assign', 'schedule', 'clean', 'cleaning', 'maintenance',
-            'repair', 'fix', 'check', 'inspection', 'audit', 'coverage',
-            'staff', 'help', 'assist', 'complete', 'finish', 'do'
-        ]
-        
-        content_lower = content.lower()
-        return any(indicator in content_lower for indicator in task_indicators)
+        return self.classify(content)['is_task']
     
     def is_event_related(self, content: str) -> bool:
         """Determine if message content indicates a calendar event"""
-        event_indicators = [
-            'meeting', 'appointment', 'schedule', 'audit', 'inspection',
-            'training', 'conference', 'call', 'visit', 'at', 'on',
-            'deadline', 'due', 'reminder'
-        ]
-        
-        content_lower = content.lower()
-        return any(indicator in content_lower for indicator in event_indicators)
+        return self.classify(content)['is_event']
     
     def process_message(self, message: Message) -> Dict[str, any]:
         """Process a message and determine appropriate actions"""
+        return self.process_content(message.id, message.content, message.priority)
+    
+    def process_content(self, message_id: int, content: str, priority: str, features: Optional[Dict] = None) -> Dict[str, any]:
+        """Determine the actions for a stored message's content and priority
+        
+        features is the content's classify() result when the caller already has it.
+        """
         try:
             result = {
-                'message_id': message.id,
+                'message_id': message_id,
                 'actions': [],
                 'suggestions': []
             }
             
+            if features is None:
+                features = self.classify(content)
+            
             # Check if it's task-related
-            if self.is_task_related(message.content):
-                task_title = self._extract_task_title(message.content)
-                facility = self.extract_facility_info(message.content)
+            if features['is_task']:
+                task_title = self._extract_task_title(content)
+                facility = features['facility']
                 
                 result['actions'].append({
                     'type': 'task',
                     'title': task_title,
-                    'description': message.content[:200] + '...' if len(message.content) > 200 else message.content,
+                    'description': content[:200] + '...' if len(content) > 200 else content,
                     'facility': facility,
-                    'priority': message.priority
+                    'priority': priority
                 })
             
             # Check if it's event-related
-            if self.is_event_related(message.content):
-                event_time = self.extract_datetime_info(message.content)
+            if features['is_event']:
+                event_time = self.extract_datetime_info(content)
                 if event_time:
-                    event_title = self._extract_event_title(message.content)
-                    location = self.extract_facility_info(message.content)
+                    event_title = self._extract_event_title(content)
+                    location = features['facility']
                     
                     result['actions'].append({
                         'type': 'event',
                         'title': event_title,
-                        'description': message.content[:200] + '...' if len(message.content) > 200 else message.content,
+                        'description': content[:200] + '...' if len(content) > 200 else content,
                         'start_time': event_time,
                         'end_time': event_time + timedelta(hours=1),  # Default 1 hour duration
                         'location': location
                     })
             
             # Add suggestions based on content analysis
-            if message.priority == 'High':
+            if priority == 'High':
                 result['suggestions'].append('Consider immediate response required')
             
-            if any(keyword in message.content.lower() for keyword in ['coverage', 'staff', 'assign']):
+            if features['needs_staffing']:
                 result['suggestions'].append('May require staff assignment')
             
             return result
-            
+        
         except Exception as e:
-            logger.error(f"Error processing message {message.id}: {e}")
-            return {'message_id': message.id, 'actions': [], 'suggestions': []}
+            logger.error(f"Error processing message {message_id}: {e}")
+            return {'message_id': message_id, 'actions': [], 'suggestions': []}
+    
+    def save_actions(self, processing_result: Dict) -> List[CalendarEvent]:
+        """Add the tasks, events and reminders for a processing result to the session
+        
+        The caller commits. Events are queued for export to Outlook in the same
+        transaction when an Outlook calendar is configured. Returns the created events.
+        """
+        created_events = []
+        message_id = processing_result['message_id']
+        actions = processing_result['actions']
+        
+        for action in actions:
+            if action['type'] == 'task':
+                # Create task
+                task = Task(
+                    title=action['title'],
+                    description=action['description'],
+                    facility=action['facility'],
+                    priority=action['priority'],
+                    message_id=message_id
+                )
+                db.session.add(task)
+                
+                # Create reminder for high priority tasks
+                if action['priority'] == 'High':
+                    reminder = Reminder(
+                        task=task,
+                        reminder_text=f"High priority task: {action['title']}",
+                        next_reminder=datetime.now() + timedelta(minutes=30)
+                    )
+                    db.session.add(reminder)
+            
+            elif action['type'] == 'event':
+                # Create calendar event
+                event = CalendarEvent(
+                    title=action['title'],
+                    description=action['description'],
+                    start_time=action['start_time'],
+                    end_time=action['end_time'],
+                    location=action['location'],
+                    facility=action.get('facility', 'Bellevue Medical Center'),
+                    message_id=message_id
+                )
+                db.session.add(event)
+                created_events.append(event)
+                
+                # Create reminder 30 minutes before event
+                reminder_time = action['start_time'] - timedelta(minutes=30)
+                if reminder_time > datetime.now():
+                    reminder = Reminder(
+                        event=event,
+                        reminder_text=f"Upcoming event: {action['title']}",
+                        next_reminder=reminder_time
+                    )
+                    db.session.add(reminder)
+        
+        if created_events and Config.OUTLOOK_CALENDAR_USER:
+            db.session.flush()
+            for event in created_events:
+                enqueue('outlook_event', {'event_id': event.id}, key=f'outlook_event:{event.id}')
+        
+        return created_events
     
     def _extract_task_title(self, content: str) -> str:
         """Extract a meaningful task title from content"""
@@ -229,51 +390,382 @@ class MessageScanner:
         first_part = content.split('.')[0].strip()
         return first_part[:100] + '...' if len(first_part) > 100 else first_part
     
-    def scan_incoming_messages(self) -> List[Dict]:
-        """Scan for new incoming messages from various sources"""
+    def ingest_messages(self, items: Iterable) -> List[Dict]:
+        """Classify and store many incoming messages in one transaction
+        
+        Each item is a dict like the /api/log_message body (message, sender,
+        source). Rows are inserted in chunks of BULK_INGEST_CHUNK_SIZE together
+        with their outbox events, and committed once at the end. Returns one
+        result per item, in order; invalid items are reported without affecting
+        the rest. Raises ValueError if there are more than BULK_INGEST_MAX_ITEMS.
+        """
         results = []
+        pending = []
         
-        try:
-            # Scan emails from Microsoft Graph
-            emails = graph_service.get_recent_emails(max_results=5)
-            for email in emails:
-                # Check if we've already processed this email
-                existing = Message.query.filter_by(
-                    source='email',
-                    content=email.get('bodyPreview', '')[:500]
-                ).first()
+        for index, item in enumerate(items):
+            if index >= Config.BULK_INGEST_MAX_ITEMS:
+                raise ValueError(f"At most {Config.BULK_INGEST_MAX_ITEMS} messages per request")
+            
+            content = item.get('message') if isinstance(item, dict) else None
+            if not content or not isinstance(content, str):
+                results.append({'index': index, 'success': False, 'error': 'Message content required'})
+                continue
+            
+            row = {
+                'sender': str(item.get('sender') or 'Unknown'),
+                'content': content,
+                'source': str(item.get('source') or 'text'),
+                'priority': self.classify(content)['priority']
+            }
+            results.append({'index': index, 'success': True, 'priority': row['priority']})
+            pending.append((results[-1], row))
+            
+            if len(pending) >= Config.BULK_INGEST_CHUNK_SIZE:
+                self._insert_ingested(pending)
+                pending = []
+        
+        if pending:
+            self._insert_ingested(pending)
+        db.session.commit()
+        return results
+    
+    def _insert_ingested(self, pending: List[Tuple[Dict, Dict]]):
+        """Bulk insert one chunk of ingested messages and their outbox events"""
+        rows = [row for _, row in pending]
+        inserted = db.session.execute(
+            insert(Message).returning(Message.id, Message.created_at, sort_by_parameter_order=True), rows
+        ).all()
+        
+        sheets_rows = []
+        high_priority = []
+        for (result, row), (message_id, created_at) in zip(pending, inserted):
+            result['message_id'] = message_id
+            sheets_rows.append((
+                {'worksheet': 'Messages', 'row': message_row(row['sender'], row['content'], row['source'], row['priority'])},
+                f'sheets_message:{message_id}'
+            ))
+            if row['priority'] == 'High':
+                high_priority.append(({'message_id': message_id}, f'process_message:{message_id}'))
+                publish_on_commit('high_priority_message', self._message_event(row, message_id, created_at))
+        
+        enqueue_many('sheets_row', sheets_rows)
+        enqueue_many('process_message', high_priority)
+    
+    @staticmethod
+    def _message_event(row: Dict, message_id: int, created_at: datetime) -> Dict:
+        """Stream event payload for a bulk-inserted message, as message_summary() builds for a Message"""
+        return {
+            'id': message_id,
+            'sender': row['sender'],
+            'content': row['content'][:100],
+            'priority': row['priority'],
+            'created_at': created_at.isoformat()
+        }
+    
+    def _dedup_stage(self, batch: Dict) -> Dict:
+        """Pipeline stage: drop emails already stored, or already seen earlier in this scan"""
+        # One indexed lookup for the whole batch instead of one query per email
+        email_ids = [email['id'] for email in batch['emails'] if email.get('id')]
+        stored_ids = set()
+        if email_ids:
+            stored_ids = {
+                external_id for (external_id,) in db.session.query(Message.external_id).filter(
+                    Message.source == 'email',
+                    Message.external_id.in_(email_ids)
+                )
+            }
+            stored_ids |= self._claim_legacy_emails([
+                email for email in batch['emails'] if email.get('id') and email['id'] not in stored_ids
+            ])
+        
+        batch['rows'] = []
+        with self._scan_lock:
+            for email in batch['emails']:
+                email_id = email.get('id')
+                if email_id and (email_id in stored_ids or email_id in self._scan_seen_ids):
+                    continue
+                if email_id:
+                    self._scan_seen_ids.add(email_id)
                 
-                if not existing:
-                    sender = email.get('from', {}).get('emailAddress', {}).get('address', 'Unknown')
-                    content = email.get('bodyPreview', '')
-                    priority = self.determine_priority(content)
-                    
-                    # Create message record
-                    message = Message(
-                        sender=sender,
-                        content=content,
-                        source='email',
-                        priority=priority
-                    )
-                    db.session.add(message)
-                    db.session.commit()
-                    
-                    # Log to Google Sheets
-                    sheets_service.log_message(sender, content, 'email', priority)
-                    
-                    # Process for actions
-                    processing_result = self.process_message(message)
-                    results.append(processing_result)
+                batch['rows'].append({
+                    'sender': email.get('from', {}).get('emailAddress', {}).get('address', 'Unknown'),
+                    'content': email.get('bodyPreview', ''),
+                    'source': 'email',
+                    'external_id': email_id
+                })
+        return batch
+    
+    @staticmethod
+    def _claim_legacy_emails(emails: List[Dict]) -> set:
+        """Match emails to rows stored before external IDs were kept, and backfill their IDs
+        
+        Those rows were deduplicated on content, so the preview is matched the
+        same way, once per batch. Each row is claimed by one email only, with a
+        conditional UPDATE so concurrent dedup workers can't both claim it.
+        """
+        if not emails:
+            return set()
+        previews = {email.get('bodyPreview', '') for email in emails}
+        legacy_ids = {}
+        for message_id, content in db.session.query(Message.id, Message.content).filter(
+            Message.source == 'email',
+            Message.external_id.is_(None),
+            Message.content.in_(previews)
+        ).order_by(Message.id):
+            legacy_ids.setdefault(content, []).append(message_id)
+        if not legacy_ids:
+            return set()
+        
+        claimed = set()
+        for email in emails:
+            candidates = legacy_ids.get(email.get('bodyPreview', ''))
+            while candidates:
+                updated = Message.query.filter(
+                    Message.id == candidates.pop(0),
+                    Message.external_id.is_(None)
+                ).update({Message.external_id: email['id']}, synchronize_session=False)
+                if updated:
+                    claimed.add(email['id'])
+                    break
+        db.session.commit()
+        return claimed
+    
+    def _classify_stage(self, batch: Dict) -> Dict:
+        """Pipeline stage: priority and derived actions for each new email"""
+        batch['results'] = []
+        for row in batch['rows']:
+            features = self.classify(row['content'])
+            row['priority'] = features['priority']
+            batch['results'].append(self.process_content(None, row['content'], row['priority'], features))
+        return batch
+    
+    def _persist_stage(self, batch: Dict) -> Dict:
+        """Pipeline stage: store a batch with its actions and outbox events in one transaction
+        
+        Each bulk insert runs in a savepoint; if it fails, the batch is retried
+        one message per savepoint, so a bad message only loses its own rows. The
+        watermark then advances to the newest batch stored with every earlier
+        batch, so an email in a batch that failed is fetched again next scan.
+        """
+        stored = self._insert_emails(batch['rows'])
+        result_for = {id(row): result for row, result in zip(batch['rows'], batch['results'])}
+        batch['stored'] = stored
+        batch['results'] = []
+        for row, message_id, _ in stored:
+            result = result_for[id(row)]
+            result['message_id'] = message_id
+            batch['results'].append(result)
+        
+        # Log to Google Sheets, delivered by the outbox worker
+        enqueue_many('sheets_row', [
+            ({'worksheet': 'Messages', 'row': message_row(row['sender'], row['content'], 'email', row['priority'])},
+             f'sheets_message:{message_id}')
+            for row, message_id, _ in stored
+        ])
+        batch['reminders'] = self._save_batch_actions(batch['results'])
+        
+        # ISO-8601 UTC timestamps from Graph compare correctly as strings
+        received = [email['receivedDateTime'] for email in batch['emails'] if email.get('receivedDateTime')]
+        newest = max(received) if received else None
+        # Batches stored out of order leave the watermark behind until the
+        # scan ends, which only means some emails are deduplicated again
+        self._advance_watermark(self._scan_completion.would_reach(batch['sequence'], newest))
+        db.session.commit()
+        self._scan_completion.done(batch['sequence'], newest)
+        return batch
+    
+    @staticmethod
+    def _advance_watermark(watermark: Optional[str]):
+        """Move the stored receivedDateTime watermark forward, never back"""
+        if watermark:
+            SyncState.query.filter(
+                SyncState.name == MAIL_SYNC_STATE,
+                or_(SyncState.cursor.is_(None), SyncState.cursor < watermark)
+            ).update({SyncState.cursor: watermark}, synchronize_session=False)
+    
+    def _fanout_stage(self, batch: Dict) -> Dict:
+        """Pipeline stage: notify dashboards and the reminder timer about a stored batch"""
+        for row, message_id, created_at in batch['stored']:
+            if row['priority'] == 'High':
+                event_broker.publish('high_priority_message', self._message_event(row, message_id, created_at))
+        for reminder_id, next_reminder in batch['reminders']:
+            reminder_timer.schedule(reminder_id, next_reminder)
+        
+        with self._scan_lock:
+            self._scan_results.extend(batch['results'])
+        return batch
+    
+    def _build_pipeline(self) -> Pipeline:
+        """fetch -> dedup -> classify -> persist -> fan out, with bounded queues of batches between stages"""
+        return Pipeline(current_app._get_current_object(), 'fetch', [
+            Stage('dedup', self._dedup_stage, Config.INGEST_DEDUP_WORKERS, Config.INGEST_QUEUE_SIZE),
+            Stage('classify', self._classify_stage, Config.INGEST_CLASSIFY_WORKERS, Config.INGEST_QUEUE_SIZE),
+            Stage('persist', self._persist_stage, Config.INGEST_PERSIST_WORKERS, Config.INGEST_QUEUE_SIZE),
+            Stage('fanout', self._fanout_stage, Config.INGEST_FANOUT_WORKERS, Config.INGEST_QUEUE_SIZE)
+        ], item_size=lambda batch: len(batch['emails']))
+    
+    def pipeline_metrics(self) -> Dict[str, Dict]:
+        """Per-stage metrics of the running or most recent scan"""
+        return self.pipeline.metrics() if self.pipeline else {}
+    
+    def _insert_emails(self, rows: List[Dict]) -> List[Tuple[Dict, int, datetime]]:
+        """Bulk insert email rows; returns (row, id, created_at) for each row stored"""
+        statement = insert(Message).returning(Message.id, Message.created_at, sort_by_parameter_order=True)
+        if not rows:
+            return []
+        try:
+            with db.session.begin_nested():
+                inserted = db.session.execute(statement, rows).all()
+            return [(row, message_id, created_at) for row, (message_id, created_at) in zip(rows, inserted)]
+        except SQLAlchemyError as e:
+            if not isinstance(e, IntegrityError):
+                logger.error(f"Error bulk storing emails, retrying one by one: {e}")
+        
+        stored = []
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    message_id, created_at = db.session.execute(statement, [row]).one()
+                stored.append((row, message_id, created_at))
+            except IntegrityError:
+                # Stored concurrently by another scan
+                continue
+            except SQLAlchemyError as e:
+                logger.error(f"Error storing email {row['external_id']}: {e}")
+        return stored
+    
+    def _save_batch_actions(self, results: List[Dict]) -> List[Tuple[int, datetime]]:
+        """Insert the actions of a batch of processing results, isolating failures per message
+        
+        Returns the inserted reminders as (id, next_reminder).
+        """
+        now = datetime.now()
+        try:
+            with db.session.begin_nested():
+                reminders = self._insert_actions(results, now)
+        except SQLAlchemyError as e:
+            logger.error(f"Error bulk saving message actions, retrying one by one: {e}")
+            reminders = []
+            for result in results:
+                try:
+                    with db.session.begin_nested():
+                        reminders.extend(self._insert_actions([result], now))
+                except SQLAlchemyError as e:
+                    logger.error(f"Error saving actions for message {result['message_id']}: {e}")
+        return reminders
+    
+    def _insert_actions(self, results: List[Dict], now: datetime) -> List[Tuple[int, datetime]]:
+        """Bulk insert tasks, events and reminders for processing results, as save_actions() does one by one
+        
+        Returns the inserted reminders as (id, next_reminder).
+        """
+        tasks = []
+        events = []
+        for result in results:
+            for action in result['actions']:
+                if action['type'] == 'task':
+                    tasks.append({
+                        'title': action['title'],
+                        'description': action['description'],
+                        'facility': action['facility'],
+                        'priority': action['priority'],
+                        'message_id': result['message_id']
+                    })
+                elif action['type'] == 'event':
+                    events.append({
+                        'title': action['title'],
+                        'description': action['description'],
+                        'start_time': action['start_time'],
+                        'end_time': action['end_time'],
+                        'location': action['location'],
+                        'facility': action.get('facility', DEFAULT_FACILITY),
+                        'message_id': result['message_id']
+                    })
+        
+        reminders = []
+        if tasks:
+            task_ids = db.session.execute(insert(Task).returning(Task.id, sort_by_parameter_order=True), tasks).scalars().all()
+            # Reminder for high priority tasks
+            reminders.extend({
+                'task_id': task_id,
+                'reminder_text': f"High priority task: {task['title']}",
+                'next_reminder': now + timedelta(minutes=30)
+            } for task, task_id in zip(tasks, task_ids) if task['priority'] == 'High')
+        
+        if events:
+            event_ids = db.session.execute(
+                insert(CalendarEvent).returning(CalendarEvent.id, sort_by_parameter_order=True), events
+            ).scalars().all()
+            # Reminder 30 minutes before each event that has not started
+            reminders.extend({
+                'event_id': event_id,
+                'reminder_text': f"Upcoming event: {event['title']}",
+                'next_reminder': event['start_time'] - timedelta(minutes=30)
+            } for event, event_id in zip(events, event_ids) if event['start_time'] - timedelta(minutes=30) > now)
+            
+            if Config.OUTLOOK_CALENDAR_USER:
+                enqueue_many('outlook_event', [
+                    ({'event_id': event_id}, f'outlook_event:{event_id}') for event_id in event_ids
+                ])
+        
+        if not reminders:
+            return []
+        return db.session.execute(
+            insert(Reminder).returning(Reminder.id, Reminder.next_reminder, sort_by_parameter_order=True), reminders
+        ).all()
+    
+    def scan_incoming_messages(self) -> List[Dict]:
+        """Scan for new incoming messages from various sources
+        
+        Emails run through a staged pipeline (see _build_pipeline) one Graph
+        page at a time, so fetching the next page overlaps with classifying and
+        storing the previous ones.
+        """
+        self._scan_results = []
+        
+        try:
+            # Scan emails from Microsoft Graph, resuming from the stored watermark
+            sync_state = SyncState.query.filter_by(name=MAIL_SYNC_STATE).first()
+            if not sync_state:
+                sync_state = SyncState(name=MAIL_SYNC_STATE)
+                db.session.add(sync_state)
+                db.session.commit()
+            
+            since = sync_state.cursor
+            if not since:
+                lookback = datetime.utcnow() - timedelta(hours=Config.MAIL_SYNC_LOOKBACK_HOURS)
+                since = lookback.strftime('%Y-%m-%dT%H:%M:%SZ')
+            # End this read transaction; the pipeline's stages write from their own sessions
+            db.session.commit()
+            
+            self._scan_lock = threading.Lock()
+            self._scan_seen_ids = set()
+            self._scan_completion = OrderedCompletion()
+            self.pipeline = self._build_pipeline()
+            self.pipeline.run(self._fetch_batches(since))
+            self._advance_watermark(self._scan_completion.latest)
+            db.session.commit()
             
             # Note: Teams messages would require additional configuration and permissions
             # This is a placeholder for when those are available
             
-            logger.info(f"Scanned and processed {len(results)} new messages")
-            return results
-            
+            logger.info(f"Scanned and processed {len(self._scan_results)} new messages; pipeline: {self.pipeline_metrics()}")
+            return self._scan_results
+        
         except Exception as e:
             logger.error(f"Error scanning incoming messages: {e}")
-            return results
+            return self._scan_results
+    
+    def _fetch_batches(self, since: str) -> Iterable[Dict]:
+        """Pipeline source: stream the backlog one page-sized, numbered batch at a time"""
+        emails = graph_service.iter_emails_since(since, page_size=Config.MAIL_SYNC_PAGE_SIZE)
+        sequence = 0
+        while True:
+            batch = list(islice(emails, Config.MAIL_SYNC_PAGE_SIZE))
+            if not batch:
+                return
+            yield {'sequence': sequence, 'emails': batch}
+            sequence += 1
 
 # Initialize scanner
 message_scanner = MessageScanner()
@@ -1,20 +1,130 @@
 import os
 import logging
+import threading
+import time
 import requests
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from typing import Iterator, List, Dict, Optional
 from config import Config
+from service_proxy import LazyServiceProxy
 
 logger = logging.getLogger(__name__)
 
+# Throttling is always safe to retry; server errors only when the call is idempotent
+THROTTLED_STATUS_CODES = {429}
+SERVER_ERROR_STATUS_CODES = {500, 502, 503, 504}
+
+# Graph accepts at most 20 sub-requests in one JSON $batch call
+GRAPH_BATCH_LIMIT = 20
+
 class MicrosoftGraphService:
     """Service for Microsoft Graph API integration (Outlook/Teams)"""
     
     def __init__(self):
         self.access_token = None
         self.token_expires = None
+        self.session = self._create_session()
+        self.latency_stats = {}
+        self._stats_lock = threading.Lock()
         self._get_access_token()
     
+    def _create_session(self) -> requests.Session:
+        """Create a pooled HTTP session that keeps connections alive between calls"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=Config.GRAPH_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def _retry_delay(self, headers: Optional[Dict], attempt: int) -> float:
+        """Seconds to wait before retrying, preferring the server's Retry-After header"""
+        delay = None
+        retry_after = CaseInsensitiveDict(headers or {}).get('Retry-After')
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = None
+        
+        if delay is None:
+            delay = Config.GRAPH_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+        return min(max(delay, 0), Config.GRAPH_MAX_RETRY_DELAY_SECONDS)
+    
+    def _record_latency(self, method: str, elapsed: float, failed: bool, retried: bool):
+        """Accumulate per-method call latency"""
+        with self._stats_lock:
+            stats = self.latency_stats.setdefault(method, {
+                'calls': 0, 'failures': 0, 'retries': 0, 'total_seconds': 0.0, 'max_seconds': 0.0
+            })
+            stats['calls'] += 1
+            stats['failures'] += int(failed)
+            stats['retries'] += int(retried)
+            stats['total_seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+    
+    def get_latency_stats(self) -> Dict[str, Dict]:
+        """Per-method call counts and latency in milliseconds"""
+        with self._stats_lock:
+            return {
+                method: {
+                    'calls': stats['calls'],
+                    'failures': stats['failures'],
+                    'retries': stats['retries'],
+                    'avg_ms': round(1000 * stats['total_seconds'] / stats['calls'], 1),
+                    'max_ms': round(1000 * stats['max_seconds'], 1)
+                }
+                for method, stats in self.latency_stats.items()
+            }
+    
+    def _send(self, method: str, url: str, idempotent: bool = None, **kwargs) -> requests.Response:
+        """Send a request on the pooled session with timeouts and Retry-After aware retries
+        
+        429 responses are retried for every method. Server errors and connection
+        failures are retried only for idempotent calls (GET by default), so a POST
+        such as sendMail is never repeated after the server may have acted on it.
+        """
+        if idempotent is None:
+            idempotent = method == 'GET'
+        kwargs.setdefault('timeout', (Config.GRAPH_CONNECT_TIMEOUT, Config.GRAPH_READ_TIMEOUT))
+        
+        for attempt in range(Config.GRAPH_MAX_RETRIES + 1):
+            last_attempt = attempt == Config.GRAPH_MAX_RETRIES
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retry = idempotent and not last_attempt
+                self._record_latency(method, time.perf_counter() - started, True, retry)
+                if not retry:
+                    raise
+                delay = self._retry_delay(None, attempt)
+                logger.warning(f"Graph {method} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            
+            elapsed = time.perf_counter() - started
+            status = response.status_code
+            retry = not last_attempt and (
+                status in THROTTLED_STATUS_CODES or (idempotent and status in SERVER_ERROR_STATUS_CODES)
+            )
+            self._record_latency(method, elapsed, status >= 400, retry)
+            logger.debug(f"Graph {method} {url.split('?')[0]} -> {status} in {1000 * elapsed:.0f}ms")
+            
+            if not retry:
+                return response
+            
+            delay = self._retry_delay(response.headers, attempt)
+            logger.warning(f"Graph {method} returned {status}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+    
     def _get_access_token(self):
         """Get access token for Microsoft Graph API"""
         try:
@@ -22,7 +132,7 @@ class MicrosoftGraphService:
                 logger.warning("Microsoft Graph credentials not configured")
                 return
             
-            url = f"https://login.microsoftonline.com/{Config.MICROSOFT_TENANT_ID}/oauth2/v2.0/token"
+            url = f"{Config.MICROSOFT_LOGIN_URL}/{Config.MICROSOFT_TENANT_ID}/oauth2/v2.0/token"
             
             data = {
                 'client_id': Config.MICROSOFT_CLIENT_ID,
@@ -31,7 +141,8 @@ class MicrosoftGraphService:
                 'grant_type': 'client_credentials'
             }
             
-            response = requests.post(url, data=data)
+            # The client-credentials grant has no side effects, so it is safe to retry
+            response = self._send('POST', url, idempotent=True, data=data)
             
             if response.status_code == 200:
                 token_data = response.json()
@@ -64,18 +175,22 @@ class MicrosoftGraphService:
                 'Content-Type': 'application/json'
             }
             
-            url = f"https://graph.microsoft.com/v1.0{endpoint}"
+            # Paging links (@odata.nextLink) are absolute URLs
+            url = endpoint if endpoint.startswith('http') else f"{Config.MICROSOFT_GRAPH_URL}{endpoint}"
             
             if method == 'GET':
-                response = requests.get(url, headers=headers)
+                response = self._send('GET', url, headers=headers)
             elif method == 'POST':
-                response = requests.post(url, headers=headers, json=data)
+                response = self._send('POST', url, headers=headers, json=data)
             else:
                 logger.error(f"Unsupported HTTP method: {method}")
                 return None
             
             if response.status_code in [200, 201]:
                 return response.json()
+            elif response.status_code in [202, 204]:
+                # Accepted with no body, e.g. sendMail
+                return {}
             else:
                 logger.error(f"Microsoft Graph API error: {response.status_code} - {response.text}")
                 return None
@@ -84,23 +199,128 @@ class MicrosoftGraphService:
             logger.error(f"Error making Microsoft Graph request: {e}")
             return None
     
+    def _iter_graph_items(self, endpoint: str) -> Iterator[Dict]:
+        """Lazily yield items from a Graph collection, following @odata.nextLink
+        
+        Only one page is held in memory at a time, and the next page is requested
+        only once the consumer has exhausted the current one. Iteration stops early
+        if a page request fails.
+        """
+        next_url = endpoint
+        while next_url:
+            page = self._make_graph_request(next_url)
+            if not page:
+                return
+            
+            yield from page.get('value', [])
+            next_url = page.get('@odata.nextLink')
+    
+    def _execute_batch(self, sub_requests: List[Dict]) -> List[Optional[Dict]]:
+        """Send up to GRAPH_BATCH_LIMIT sub-requests as one JSON $batch call
+        
+        Each sub-request is a dict with 'method', 'url' (relative to the Graph
+        version root) and optionally 'body'. Returns the sub-responses
+        ({'status', 'headers', 'body'}) in request order, or None for every
+        entry if the batch call itself failed.
+        """
+        payload = {'requests': []}
+        for index, sub_request in enumerate(sub_requests):
+            entry = {'id': str(index), 'method': sub_request['method'], 'url': sub_request['url']}
+            if 'body' in sub_request:
+                entry['body'] = sub_request['body']
+                entry['headers'] = {'Content-Type': 'application/json'}
+            payload['requests'].append(entry)
+        
+        result = self._make_graph_request('/$batch', 'POST', payload)
+        responses = [None] * len(sub_requests)
+        if not result:
+            return responses
+        
+        for response in result.get('responses', []):
+            responses[int(response['id'])] = response
+        return responses
+    
+    def _execute_batches(self, sub_requests: List[Dict]) -> List[Optional[Dict]]:
+        """Split sub-requests into $batch calls and run them on a bounded thread pool"""
+        chunks = [sub_requests[i:i + GRAPH_BATCH_LIMIT] for i in range(0, len(sub_requests), GRAPH_BATCH_LIMIT)]
+        if not chunks:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(Config.GRAPH_MAX_CONCURRENCY, len(chunks))) as pool:
+            return [response for chunk in pool.map(self._execute_batch, chunks) for response in chunk]
+    
+    def _execute_batches_with_retry(self, sub_requests: List[Dict]) -> List[Optional[Dict]]:
+        """Run sub-requests via $batch, re-sending only the ones that can safely be retried
+        
+        Follows the same rules as _send: throttled (429) sub-requests are retried for
+        any method, server errors only for GETs. Each round waits for the longest
+        Retry-After among the sub-requests being retried.
+        """
+        responses = [None] * len(sub_requests)
+        pending = list(range(len(sub_requests)))
+        
+        for attempt in range(Config.GRAPH_MAX_RETRIES + 1):
+            retry = []
+            delay = 0
+            for index, response in zip(pending, self._execute_batches([sub_requests[i] for i in pending])):
+                responses[index] = response
+                status = response.get('status') if response else None
+                if status in THROTTLED_STATUS_CODES or (
+                        status in SERVER_ERROR_STATUS_CODES and sub_requests[index]['method'] == 'GET'):
+                    retry.append(index)
+                    delay = max(delay, self._retry_delay(response.get('headers'), attempt))
+            
+            if not retry or attempt == Config.GRAPH_MAX_RETRIES:
+                break
+            logger.warning(f"Retrying {len(retry)} of {len(sub_requests)} Graph batch sub-requests in {delay:.1f}s")
+            time.sleep(delay)
+            pending = retry
+        
+        return responses
+    
+    def _batch_get(self, urls: List[str]) -> List[Optional[Dict]]:
+        """GET several Graph URLs via $batch; returns bodies in order, None where a read failed"""
+        bodies = []
+        responses = self._execute_batches_with_retry([{'method': 'GET', 'url': url} for url in urls])
+        for url, response in zip(urls, responses):
+            if response and 200 <= response.get('status', 500) < 300:
+                bodies.append(response.get('body'))
+            else:
+                status = response.get('status') if response else 'no response'
+                logger.error(f"Microsoft Graph batch read failed for {url}: {status}")
+                bodies.append(None)
+        return bodies
+    
     def get_recent_emails(self, user_id: str = 'me', max_results: int = 10) -> List[Dict]:
         """Get recent emails from Outlook"""
         try:
             endpoint = f"/users/{user_id}/messages"
             params = f"?$top={max_results}&$select=id,subject,bodyPreview,from,receivedDateTime&$orderby=receivedDateTime desc"
             
-            result = self._make_graph_request(endpoint + params)
-            
-            if result and 'value' in result:
-                return result['value']
-            return []
+            return list(islice(self._iter_graph_items(endpoint + params), max_results))
             
         except Exception as e:
             logger.error(f"Error getting emails: {e}")
             return []
     
-    def get_teams_messages(self, team_id: str = None) -> List[Dict]:
+    def iter_emails_since(self, since: str, user_id: str = 'me', page_size: int = 50) -> Iterator[Dict]:
+        """Stream emails received at or after a receivedDateTime watermark, oldest first
+        
+        Pages of page_size are fetched lazily, so a large backlog can be consumed
+        without loading it all at once. Callers persist the newest receivedDateTime
+        they have handled and pass it back on the next poll; messages at the
+        watermark itself are returned again and must be deduplicated by id.
+        """
+        endpoint = f"/users/{user_id}/messages"
+        params = (f"?$top={page_size}&$select=id,subject,bodyPreview,from,receivedDateTime"
+                  f"&$filter=receivedDateTime ge {since}&$orderby=receivedDateTime asc")
+        
+        try:
+            yield from self._iter_graph_items(endpoint + params)
+        except Exception as e:
+            logger.error(f"Error getting emails since {since}: {e}")
+    
+    def get_teams_messages(self, team_id: str = None, messages_per_channel: int = 5) -> List[Dict]:
         """Get recent Teams messages (requires team access)"""
         try:
             if not team_id:
@@ -108,51 +328,72 @@ class MicrosoftGraphService:
                 return []
             
             endpoint = f"/teams/{team_id}/channels"
-            result = self._make_graph_request(endpoint)
+            channels = list(self._iter_graph_items(endpoint))
+            messages = []
             
-            if result and 'value' in result:
-                channels = result['value']
-                messages = []
-                
-                for channel in channels[:3]:  # Limit to first 3 channels
-                    channel_id = channel['id']
-                    messages_endpoint = f"/teams/{team_id}/channels/{channel_id}/messages"
-                    channel_messages = self._make_graph_request(messages_endpoint + "?$top=5")
-                    
-                    if channel_messages and 'value' in channel_messages:
-                        messages.extend(channel_messages['value'])
-                
-                return messages
-            return []
+            # Read every channel at once: 20 channels per $batch, batches in parallel
+            urls = [f"/teams/{team_id}/channels/{channel['id']}/messages?$top={messages_per_channel}"
+                    for channel in channels]
+            for body in self._batch_get(urls):
+                if body:
+                    messages.extend(body.get('value', [])[:messages_per_channel])
+            
+            return messages
             
         except Exception as e:
             logger.error(f"Error getting Teams messages: {e}")
             return []
     
+    @staticmethod
+    def _event_payload(title: str, description: str, start_time: datetime,
+                       end_time: datetime, location: str = "") -> Dict:
+        """Build the Graph body for an Outlook calendar event"""
+        return {
+            "subject": title,
+            "body": {
+                "contentType": "text",
+                "content": description
+            },
+            "start": {
+                "dateTime": start_time.isoformat(),
+                "timeZone": "Pacific Standard Time"
+            },
+            "end": {
+                "dateTime": end_time.isoformat(),
+                "timeZone": "Pacific Standard Time"
+            },
+            "location": {
+                "displayName": location
+            }
+        }
+    
+    @staticmethod
+    def _email_payload(to_email: str, subject: str, body: str) -> Dict:
+        """Build the Graph sendMail body for a plain-text email"""
+        return {
+            "message": {
+                "subject": subject,
+                "body": {
+                    "contentType": "text",
+                    "content": body
+                },
+                "toRecipients": [
+                    {
+                        "emailAddress": {
+                            "address": to_email
+                        }
+                    }
+                ]
+            }
+        }
+    
     def create_calendar_event(self, user_id: str, title: str, description: str, 
                             start_time: datetime, end_time: datetime, location: str = "") -> Optional[str]:
         """Create a calendar event in Outlook"""
         try:
             endpoint = f"/users/{user_id}/events"
             
-            event_data = {
-                "subject": title,
-                "body": {
-                    "contentType": "text",
-                    "content": description
-                },
-                "start": {
-                    "dateTime": start_time.isoformat(),
-                    "timeZone": "Pacific Standard Time"
-                },
-                "end": {
-                    "dateTime": end_time.isoformat(),
-                    "timeZone": "Pacific Standard Time"
-                },
-                "location": {
-                    "displayName": location
-                }
-            }
+            event_data = self._event_payload(title, description, start_time, end_time, location)
             
             result = self._make_graph_request(endpoint, 'POST', event_data)
             
@@ -165,27 +406,63 @@ class MicrosoftGraphService:
             logger.error(f"Error creating Outlook event: {e}")
             return None
     
+    def create_calendar_events(self, user_id: str, events: List[Dict]) -> List[Optional[str]]:
+        """Create many Outlook calendar events through $batch
+        
+        Each event is a dict with the create_calendar_event arguments (title,
+        description, start_time, end_time and optionally location). Returns the
+        Outlook event ID for each event in order, or None where creation failed.
+        """
+        try:
+            sub_requests = [{
+                'method': 'POST',
+                'url': f"/users/{user_id}/events",
+                'body': self._event_payload(event['title'], event['description'], event['start_time'],
+                                            event['end_time'], event.get('location', ""))
+            } for event in events]
+            
+            event_ids = []
+            for event, response in zip(events, self._execute_batches_with_retry(sub_requests)):
+                body = response.get('body') if response else None
+                if response and response.get('status') == 201 and body and 'id' in body:
+                    event_ids.append(body['id'])
+                else:
+                    status = response.get('status') if response else 'no response'
+                    logger.error(f"Failed to create Outlook event '{event['title']}': {status}")
+                    event_ids.append(None)
+            
+            logger.info(f"Created {sum(1 for event_id in event_ids if event_id)} of {len(events)} Outlook calendar events")
+            return event_ids
+            
+        except Exception as e:
+            logger.error(f"Error creating Outlook events: {e}")
+            return [None] * len(events)
+    
+    def push_calendar_events(self, user_id: str, events: List) -> List[Optional[str]]:
+        """Create Outlook events for CalendarEvent rows and record their IDs on the rows
+        
+        The rows are only modified, not committed, so the caller can write every
+        returned ID in a single transaction.
+        """
+        event_ids = self.create_calendar_events(user_id, [{
+            'title': event.title,
+            'description': event.description or "",
+            'start_time': event.start_time,
+            'end_time': event.end_time,
+            'location': event.location or ""
+        } for event in events])
+        
+        for event, event_id in zip(events, event_ids):
+            if event_id:
+                event.outlook_event_id = event_id
+        return event_ids
+    
     def send_email(self, to_email: str, subject: str, body: str, user_id: str = 'me') -> bool:
         """Send an email via Outlook"""
         try:
             endpoint = f"/users/{user_id}/sendMail"
             
-            email_data = {
-                "message": {
-                    "subject": subject,
-                    "body": {
-                        "contentType": "text",
-                        "content": body
-                    },
-                    "toRecipients": [
-                        {
-                            "emailAddress": {
-                                "address": to_email
-                            }
-                        }
-                    ]
-                }
-            }
+            email_data = self._email_payload(to_email, subject, body)
             
             result = self._make_graph_request(endpoint, 'POST', email_data)
             
@@ -197,6 +474,34 @@ class MicrosoftGraphService:
         except Exception as e:
             logger.error(f"Error sending email: {e}")
             return False
+    
+    def send_emails(self, emails: List[Dict], user_id: str = 'me') -> List[bool]:
+        """Send many emails via Outlook through $batch
+        
+        Each email is a dict with to_email, subject and body. Returns whether each
+        email was accepted, in order.
+        """
+        try:
+            sub_requests = [{
+                'method': 'POST',
+                'url': f"/users/{user_id}/sendMail",
+                'body': self._email_payload(email['to_email'], email['subject'], email['body'])
+            } for email in emails]
+            
+            sent = []
+            for email, response in zip(emails, self._execute_batches_with_retry(sub_requests)):
+                accepted = bool(response) and 200 <= response.get('status', 500) < 300
+                if not accepted:
+                    status = response.get('status') if response else 'no response'
+                    logger.error(f"Failed to send email to {email['to_email']}: {status}")
+                sent.append(accepted)
+            
+            logger.info(f"Sent {sum(sent)} of {len(emails)} emails")
+            return sent
+            
+        except Exception as e:
+            logger.error(f"Error sending emails: {e}")
+            return [False] * len(emails)
 
-# Initialize service
-graph_service = MicrosoftGraphService()
+# Initialize service on first use
+graph_service = LazyServiceProxy('Microsoft Graph', MicrosoftGraphService)
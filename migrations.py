@@ -0,0 +1,64 @@
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateColumn
+
+logger = logging.getLogger(__name__)
+
+# Indexes that models no longer declare, dropped wherever they still exist
+DROPPED_INDEXES = {
+    # Superseded by ix_outbox_event_status_id, which matches the claim's id order
+    'outbox_event': ['ix_outbox_event_status_next_attempt_at'],
+}
+
+# Errors meaning a concurrent upgrade already made the change (SQLite, PostgreSQL, MySQL)
+ALREADY_APPLIED = ('duplicate column', 'already exists', 'duplicate key name')
+
+def upgrade_schema(db):
+    """Bring an existing database up to date with the models
+    
+    db.create_all() only creates missing tables, so columns and indexes added to
+    existing models are applied here. New columns must be nullable (or have a
+    server default) to be added in place.
+    
+    Every worker runs this at startup, so each change commits on its own and a
+    change another worker applied first is skipped rather than failing boot.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            _apply(engine, f"column {table.name}.{column.name}",
+                   lambda connection: connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column_ddl}')))
+        
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index_name in DROPPED_INDEXES.get(table.name, []):
+            if index_name in existing_indexes:
+                _apply(engine, f"drop of index {index_name}",
+                       lambda connection: connection.execute(text(f'DROP INDEX IF EXISTS {index_name}')))
+        
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                _apply(engine, f"index {index.name}",
+                       lambda connection: index.create(connection, checkfirst=True))
+
+def _apply(engine, change: str, ddl):
+    """Run one schema change in its own transaction, tolerating a worker that applied it first"""
+    try:
+        with engine.begin() as connection:
+            ddl(connection)
+        logger.info(f"Applied {change}")
+    except (OperationalError, ProgrammingError) as e:
+        message = str(e.orig).lower()
+        if not any(marker in message for marker in ALREADY_APPLIED):
+            raise
+        logger.info(f"Skipped {change}, already applied by another worker")
@@ -4,10 +4,20 @@ from sqlalchemy import Text, DateTime, String, Integer, Boolean
 
 class Message(db.Model):
     """Model for storing incoming messages"""
+    __table_args__ = (
+        # Provider message IDs are unique per source; NULLs (manual/API messages) never collide
+        db.Index('ix_message_source_external_id', 'source', 'external_id', unique=True),
+        # Newest-first listings, unfiltered and filtered by priority or source
+        db.Index('ix_message_created_at_id', 'created_at', 'id'),
+        db.Index('ix_message_priority_created_at_id', 'priority', 'created_at', 'id'),
+        db.Index('ix_message_source_created_at_id', 'source', 'created_at', 'id'),
+    )
+    
     id = db.Column(Integer, primary_key=True)
     sender = db.Column(String(255), nullable=False)
     content = db.Column(Text, nullable=False)
     source = db.Column(String(50), nullable=False)  # 'text', 'email', 'teams', 'notes'
+    external_id = db.Column(String(255))  # Provider message ID (e.g. Graph message id)
     priority = db.Column(String(20), default='Low')  # 'High', 'Medium', 'Low'
     processed = db.Column(Boolean, default=False)
     created_at = db.Column(DateTime, default=datetime.utcnow)
@@ -17,6 +27,16 @@ class Message(db.Model):
 
 class Task(db.Model):
     """Model for managing tasks"""
+    __table_args__ = (
+        # Open/closed task lists and the /tasks filters, newest first
+        db.Index('ix_task_status_created_at_id', 'status', 'created_at', 'id'),
+        db.Index('ix_task_facility_created_at_id', 'facility', 'created_at', 'id'),
+        db.Index('ix_task_created_at_id', 'created_at', 'id'),
+        # Dashboard delta: tasks changed since a cursor
+        db.Index('ix_task_updated_at', 'updated_at'),
+        db.Index('ix_task_message_id', 'message_id'),
+    )
+    
     id = db.Column(Integer, primary_key=True)
     title = db.Column(String(255), nullable=False)
     description = db.Column(Text)
@@ -34,6 +54,13 @@ class Task(db.Model):
 
 class CalendarEvent(db.Model):
     """Model for calendar events"""
+    __table_args__ = (
+        # Upcoming events and calendar windows
+        db.Index('ix_calendar_event_start_time_end_time', 'start_time', 'end_time'),
+        db.Index('ix_calendar_event_created_at', 'created_at'),
+        db.Index('ix_calendar_event_message_id', 'message_id'),
+    )
+    
     id = db.Column(Integer, primary_key=True)
     title = db.Column(String(255), nullable=False)
     description = db.Column(Text)
@@ -64,6 +91,10 @@ class StaffMember(db.Model):
 
 class StaffAssignment(db.Model):
     """Model for tracking staff coverage history"""
+    __table_args__ = (
+        db.Index('ix_staff_assignment_assignment_date', 'assignment_date'),
+    )
+    
     id = db.Column(Integer, primary_key=True)
     staff_id = db.Column(Integer, db.ForeignKey('staff_member.id'), nullable=False)
     facility = db.Column(String(100), nullable=False)
@@ -80,6 +111,10 @@ class StaffAssignment(db.Model):
 
 class Announcement(db.Model):
     """Model for team announcements"""
+    __table_args__ = (
+        db.Index('ix_announcement_active_created_at', 'active', 'created_at'),
+    )
+    
     id = db.Column(Integer, primary_key=True)
     title = db.Column(String(255), nullable=False)
     content = db.Column(Text, nullable=False)
@@ -94,6 +129,13 @@ class Announcement(db.Model):
 
 class Reminder(db.Model):
     """Model for smart reminders"""
+    __table_args__ = (
+        # Pending reminders by due time, for the dashboard and the reminder job
+        db.Index('ix_reminder_acknowledged_next_reminder', 'acknowledged', 'next_reminder'),
+        db.Index('ix_reminder_task_id', 'task_id'),
+        db.Index('ix_reminder_event_id', 'event_id'),
+    )
+    
     id = db.Column(Integer, primary_key=True)
     task_id = db.Column(Integer, db.ForeignKey('task.id'))
     event_id = db.Column(Integer, db.ForeignKey('calendar_event.id'))
@@ -109,3 +151,63 @@ class Reminder(db.Model):
     
     def __repr__(self):
         return f'<Reminder {self.id}: {"Task" if self.task_id else "Event"} - {"Ack" if self.acknowledged else "Pending"}>'
+
+class SyncState(db.Model):
+    """Model for persisted incremental sync cursors"""
+    id = db.Column(Integer, primary_key=True)
+    name = db.Column(String(100), nullable=False, unique=True)  # e.g. 'outlook_mail:me'
+    cursor = db.Column(Text)  # Opaque position, e.g. a receivedDateTime watermark
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SyncState {self.name}: {self.cursor}>'
+
+class OutboxEvent(db.Model):
+    """Model for external side effects recorded in the same transaction as their domain change"""
+    __table_args__ = (
+        # Claims walk pending events in id order; delivered events never enter the range
+        db.Index('ix_outbox_event_status_id', 'status', 'id'),
+    )
+    
+    id = db.Column(Integer, primary_key=True)
+    kind = db.Column(String(50), nullable=False)  # 'sheets_row', 'process_message', 'outlook_event', 'email'
+    payload = db.Column(Text, nullable=False)  # JSON
+    idempotency_key = db.Column(String(255), unique=True)
+    status = db.Column(String(20), default='pending')  # 'pending', 'done', 'failed'
+    attempts = db.Column(Integer, default=0)
+    next_attempt_at = db.Column(DateTime, default=datetime.utcnow)
+    locked_by = db.Column(String(64))
+    locked_until = db.Column(DateTime)
+    last_error = db.Column(Text)
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+    processed_at = db.Column(DateTime)
+    
+    def __repr__(self):
+        return f'<OutboxEvent {self.id}: {self.kind} - {self.status}>'
+
+class DashboardStat(db.Model):
+    """Model for dashboard counters maintained incrementally on every flush"""
+    name = db.Column(String(50), primary_key=True)
+    value = db.Column(Integer, nullable=False, default=0)
+    reconciled_at = db.Column(DateTime)
+    
+    def __repr__(self):
+        return f'<DashboardStat {self.name}: {self.value}>'
+
+class TableVersion(db.Model):
+    """Model for per-table change counters that key cached fragments, bumped by every commit writing the table"""
+    name = db.Column(String(64), primary_key=True)  # Table name
+    version = db.Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<TableVersion {self.name}: {self.version}>'
+
+class LeaderLease(db.Model):
+    """Model for time-limited leadership held by one process, renewed by heartbeat"""
+    name = db.Column(String(50), primary_key=True)  # e.g. 'scheduler'
+    holder = db.Column(String(255), nullable=False)  # host:pid:token of the holding process
+    expires_at = db.Column(DateTime, nullable=False)
+    renewed_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<LeaderLease {self.name}: {self.holder} until {self.expires_at}>'
@@ -0,0 +1,293 @@
+import atexit
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import delete, event, insert, or_, select
+from sqlalchemy.orm import Session
+from models import OutboxEvent, db
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# kind -> handler(payloads) returning None (all delivered) or one bool per payload
+OUTBOX_HANDLERS: Dict[str, Callable[[List[Dict]], Optional[List[bool]]]] = {}
+
+# kind -> seconds its events wait before their first delivery attempt, so that
+# events enqueued close together are claimed and delivered as one batch
+OUTBOX_DELIVERY_DELAY_SECONDS: Dict[str, int] = {
+    'sheets_row': Config.SHEETS_FLUSH_SECONDS
+}
+
+# Set when a transaction that enqueued events commits, so idle workers wake early
+outbox_wakeup = threading.Event()
+
+def outbox_handler(kind: str):
+    """Register the handler that delivers outbox events of a kind"""
+    def register(func):
+        OUTBOX_HANDLERS[kind] = func
+        return func
+    return register
+
+def enqueue(kind: str, payload: Dict, key: str = None) -> OutboxEvent:
+    """Record a side effect in the current session
+    
+    Nothing is sent here: the event is committed (or rolled back) together with
+    the caller's domain changes and delivered later by the OutboxWorker. The
+    optional key must be unique per side effect, e.g. 'sheets_message:<id>'.
+    """
+    outbox_event = OutboxEvent(kind=kind, payload=json.dumps(payload, default=str), idempotency_key=key,
+                               next_attempt_at=_first_attempt_at(kind))
+    db.session.add(outbox_event)
+    db.session.info['outbox_pending'] = True
+    return outbox_event
+
+def enqueue_many(kind: str, items: List[Tuple[Dict, Optional[str]]]):
+    """Record many side effects of one kind with a single bulk INSERT
+    
+    items holds (payload, key) pairs; like enqueue(), the events commit with the
+    caller's transaction.
+    """
+    if not items:
+        return
+    first_attempt_at = _first_attempt_at(kind)
+    db.session.execute(insert(OutboxEvent), [
+        {'kind': kind, 'payload': json.dumps(payload, default=str), 'idempotency_key': key,
+         'next_attempt_at': first_attempt_at}
+        for payload, key in items
+    ])
+    db.session.info['outbox_pending'] = True
+
+def _first_attempt_at(kind: str) -> datetime:
+    return datetime.utcnow() + timedelta(seconds=OUTBOX_DELIVERY_DELAY_SECONDS.get(kind, 0))
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    if not session.in_nested_transaction() and session.info.pop('outbox_pending', False):
+        outbox_wakeup.set()
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_wakeup(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('outbox_pending', None)
+
+class OutboxWorker:
+    """Worker pool draining the outbox with at-least-once delivery
+    
+    Each worker claims a batch of due events by stamping them with a lease, runs
+    the handlers grouped by kind, then marks each event done or schedules a retry
+    with exponential backoff. Events claimed by a worker that dies become
+    claimable again when the lease expires, so a side effect may be delivered
+    more than once; handlers skip work that is already done where they can.
+    """
+    
+    def __init__(self, app, workers: int = None):
+        self.app = app
+        self.workers = Config.OUTBOX_WORKERS if workers is None else workers
+        self.threads = []
+        self.stopping = threading.Event()
+    
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'outbox-worker-{index}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"Outbox worker pool started with {self.workers} workers")
+    
+    def shutdown(self):
+        self.stopping.set()
+        outbox_wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout=Config.OUTBOX_POLL_SECONDS * 2)
+    
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                with self.app.app_context():
+                    if self.drain_once():
+                        continue
+            except Exception as e:
+                logger.error(f"Error draining outbox: {e}")
+            
+            outbox_wakeup.wait(timeout=Config.OUTBOX_POLL_SECONDS)
+            outbox_wakeup.clear()
+    
+    def drain_once(self) -> int:
+        """Claim and deliver one batch of due events; returns how many were claimed"""
+        events = self._claim_batch()
+        if events:
+            self._deliver(events)
+        return len(events)
+    
+    def _claim_batch(self) -> List[OutboxEvent]:
+        now = datetime.utcnow()
+        available = or_(OutboxEvent.locked_until.is_(None), OutboxEvent.locked_until < now)
+        
+        candidate_ids = [event_id for (event_id,) in db.session.query(OutboxEvent.id).filter(
+            OutboxEvent.status == 'pending',
+            OutboxEvent.next_attempt_at <= now,
+            available
+        ).order_by(OutboxEvent.id).limit(Config.OUTBOX_BATCH_SIZE)]
+        if not candidate_ids:
+            db.session.rollback()
+            return []
+        
+        # Conditional update so concurrent workers never claim the same event
+        token = uuid.uuid4().hex
+        db.session.query(OutboxEvent).filter(OutboxEvent.id.in_(candidate_ids), available).update({
+            OutboxEvent.locked_by: token,
+            OutboxEvent.locked_until: now + timedelta(seconds=Config.OUTBOX_LEASE_SECONDS),
+            OutboxEvent.attempts: OutboxEvent.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        
+        # Re-read through the primary key; only the rows this token won are returned
+        return OutboxEvent.query.filter(
+            OutboxEvent.id.in_(candidate_ids),
+            OutboxEvent.locked_by == token
+        ).order_by(OutboxEvent.id).all()
+    
+    def _deliver(self, events: List[OutboxEvent]):
+        by_kind = {}
+        for outbox_event in events:
+            by_kind.setdefault(outbox_event.kind, []).append(outbox_event)
+        
+        for kind, group in by_kind.items():
+            try:
+                handler = OUTBOX_HANDLERS.get(kind)
+                if handler is None:
+                    raise LookupError(f"No outbox handler registered for '{kind}'")
+                
+                delivered = handler([json.loads(outbox_event.payload) for outbox_event in group])
+                if delivered is None:
+                    delivered = [True] * len(group)
+                errors = [None if ok else 'Delivery failed' for ok in delivered]
+            except Exception as e:
+                logger.error(f"Error delivering {len(group)} '{kind}' outbox events: {e}")
+                db.session.rollback()
+                errors = [str(e)] * len(group)
+            
+            self._record_results(group, errors)
+    
+    def _record_results(self, group: List[OutboxEvent], errors: List[Optional[str]]):
+        now = datetime.utcnow()
+        for outbox_event, error in zip(group, errors):
+            outbox_event.locked_by = None
+            outbox_event.locked_until = None
+            
+            if error is None:
+                outbox_event.status = 'done'
+                outbox_event.processed_at = now
+            elif outbox_event.attempts >= Config.OUTBOX_MAX_ATTEMPTS:
+                outbox_event.status = 'failed'
+                outbox_event.last_error = error
+                logger.error(f"Outbox event {outbox_event.id} ({outbox_event.kind}) failed permanently: {error}")
+            else:
+                delay = Config.OUTBOX_RETRY_BACKOFF_SECONDS * (2 ** (outbox_event.attempts - 1))
+                outbox_event.next_attempt_at = now + timedelta(seconds=delay)
+                outbox_event.last_error = error
+        db.session.commit()
+
+def purge_delivered(retention_days: int = None, batch_size: int = None) -> int:
+    """Delete events delivered more than retention_days ago; returns how many were removed
+    
+    Deletes go in id-ordered chunks of batch_size, each in its own commit, so a
+    large backlog never holds a long write lock. Failed events are kept for
+    inspection.
+    """
+    retention_days = Config.OUTBOX_RETENTION_DAYS if retention_days is None else retention_days
+    batch_size = batch_size or Config.OUTBOX_PURGE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    
+    purged = 0
+    while True:
+        expired_ids = select(OutboxEvent.id).where(
+            OutboxEvent.status == 'done',
+            OutboxEvent.processed_at < cutoff
+        ).order_by(OutboxEvent.id).limit(batch_size)
+        deleted = db.session.execute(
+            delete(OutboxEvent).where(OutboxEvent.id.in_(expired_ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+
+@outbox_handler('sheets_row')
+def deliver_sheets_rows(payloads: List[Dict]):
+    """Append rows to Google Sheets, one API call per worksheet"""
+    from google_services import sheets_service
+    
+    rows_by_worksheet = {}
+    for payload in payloads:
+        rows_by_worksheet.setdefault(payload['worksheet'], []).append(payload['row'])
+    for worksheet, rows in rows_by_worksheet.items():
+        sheets_service.write_rows(worksheet, rows)
+
+@outbox_handler('process_message')
+def deliver_message_processing(payloads: List[Dict]):
+    """Derive tasks, events and reminders for messages that have not been acted on yet"""
+    from models import CalendarEvent, Message, Task
+    from message_scanner import message_scanner
+    
+    for payload in payloads:
+        message = db.session.get(Message, payload['message_id'])
+        if message is None:
+            continue
+        # Idempotency: a message that already produced records was handled by an earlier delivery
+        if (Task.query.filter_by(message_id=message.id).first()
+                or CalendarEvent.query.filter_by(message_id=message.id).first()):
+            continue
+        
+        message_scanner.save_actions(message_scanner.process_message(message))
+    db.session.commit()
+
+@outbox_handler('outlook_event')
+def deliver_outlook_events(payloads: List[Dict]) -> List[bool]:
+    """Create Outlook events in bulk and store every returned ID in one transaction"""
+    from models import CalendarEvent
+    from microsoft_services import graph_service
+    
+    event_ids = [payload['event_id'] for payload in payloads]
+    events = CalendarEvent.query.filter(CalendarEvent.id.in_(event_ids)).all()
+    # Idempotency: events that already have an Outlook ID are not created again
+    to_create = [event for event in events if not event.outlook_event_id]
+    if to_create:
+        graph_service.push_calendar_events(Config.OUTLOOK_CALENDAR_USER, to_create)
+        db.session.commit()
+    
+    created = {event.id for event in events if event.outlook_event_id}
+    existing = {event.id for event in events}
+    return [event_id in created or event_id not in existing for event_id in event_ids]
+
+@outbox_handler('email')
+def deliver_emails(payloads: List[Dict]) -> List[bool]:
+    """Send queued emails (to_email, subject, body, optional user_id) via Outlook in bulk"""
+    from microsoft_services import graph_service
+    
+    by_user = {}
+    for index, payload in enumerate(payloads):
+        by_user.setdefault(payload.get('user_id', 'me'), []).append(index)
+    
+    sent = [False] * len(payloads)
+    for user_id, indexes in by_user.items():
+        results = graph_service.send_emails([payloads[index] for index in indexes], user_id=user_id)
+        for index, ok in zip(indexes, results):
+            sent[index] = ok
+    return sent
+
+def init_outbox_worker(app) -> Optional[OutboxWorker]:
+    """Start the outbox worker pool for this process"""
+    if Config.OUTBOX_WORKERS <= 0:
+        return None
+    
+    worker = OutboxWorker(app)
+    worker.start()
+    app.outbox_worker = worker
+    
+    # Let a delivery in progress finish on exit; undelivered events stay in the table
+    atexit.register(worker.shutdown)
+    return worker
@@ -0,0 +1,169 @@
+import base64
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import or_
+from config import Config
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for a (created_at, id) position"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Position encoded in a cursor, or None when it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+class KeysetPage:
+    """One page of a newest-first keyset listing
+    
+    Iterating the page yields its items, like Flask-SQLAlchemy's Pagination.
+    """
+    
+    def __init__(self, items: List, has_next: bool, has_prev: bool, total: Optional[int] = None):
+        self.items = items
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.total = total
+        self.first = items[0] if items else None
+        self.last = items[-1] if items else None
+    
+    @property
+    def next_cursor(self) -> Optional[str]:
+        """Cursor for the following (older) page"""
+        if not self.has_next or self.last is None:
+            return None
+        return encode_cursor(self.last.created_at, self.last.id)
+    
+    @property
+    def prev_cursor(self) -> Optional[str]:
+        """Cursor for the preceding (newer) page"""
+        if not self.has_prev or self.first is None:
+            return None
+        return encode_cursor(self.first.created_at, self.first.id)
+    
+    def __iter__(self):
+        return iter(self.items)
+
+class KeysetStream(KeysetPage):
+    """Keyset page whose rows are fetched in batches while it is iterated
+    
+    Meant for streamed templates: rows are never held all at once, and
+    has_next and the cursors are known once iteration has finished, so the
+    template must render the pager after the rows.
+    """
+    
+    def __init__(self, rows: Iterable, per_page: int, has_prev: bool, total: Optional[int] = None):
+        super().__init__([], has_next=False, has_prev=has_prev, total=total)
+        self._rows = rows
+        self._per_page = per_page
+    
+    def __iter__(self):
+        for count, row in enumerate(self._rows):
+            if count == self._per_page:
+                self.has_next = True
+                break
+            if count == 0:
+                self.first = row
+            self.last = row
+            yield row
+
+def _older_than(query, model, position: Tuple[datetime, int]):
+    # Written as a bound on created_at plus a tie-break so that planners
+    # without row-value support still seek into the index
+    cursor_created_at, cursor_id = position
+    return query.filter(
+        model.created_at <= cursor_created_at,
+        or_(model.created_at < cursor_created_at, model.id < cursor_id)
+    )
+
+def _newer_than(query, model, position: Tuple[datetime, int]):
+    cursor_created_at, cursor_id = position
+    return query.filter(
+        model.created_at >= cursor_created_at,
+        or_(model.created_at > cursor_created_at, model.id > cursor_id)
+    )
+
+def keyset_paginate(query, model, per_page: int, after: Optional[str] = None,
+                    before: Optional[str] = None) -> KeysetPage:
+    """Page through query newest first on (created_at, id)
+    
+    'after' returns the page older than that cursor, 'before' the page newer
+    than it, and neither the newest page. Each page is a single index range
+    read of per_page + 1 rows, whatever its depth; the extra row tells whether
+    another page exists in that direction.
+    """
+    position = decode_cursor(before)
+    if position:
+        rows = _newer_than(query, model, position).order_by(
+            model.created_at.asc(), model.id.asc()
+        ).limit(per_page + 1).all()
+        if len(rows) > per_page:
+            return KeysetPage(list(reversed(rows[:per_page])), has_next=True, has_prev=True)
+        # Reached the newest rows: fall through to a full first page rather than a short one
+        after = None
+    
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    position = decode_cursor(after)
+    if position:
+        query = _older_than(query, model, position)
+    rows = query.limit(per_page + 1).all()
+    
+    return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_prev=position is not None)
+
+def keyset_stream(query, model, per_page: int, after: Optional[str] = None,
+                  before: Optional[str] = None) -> KeysetPage:
+    """Like keyset_paginate, but older-than pages are streamed with yield_per
+    
+    The query runs here and its first batch is fetched; the rest is read as
+    the page is iterated. Newer-than pages are read in ascending order and
+    reversed, so they are loaded whole; they are bounded by per_page.
+    """
+    if decode_cursor(before):
+        return keyset_paginate(query, model, per_page, before=before)
+    
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    position = decode_cursor(after)
+    if position:
+        query = _older_than(query, model, position)
+    rows = iter(query.limit(per_page + 1).yield_per(Config.STREAM_YIELD_PER))
+    # Run the query and fetch its first batch now, so that an error in it is
+    # raised to the view rather than partway through a streamed response
+    first = next(rows, None)
+    rows = chain([first], rows) if first is not None else []
+    
+    return KeysetStream(rows, per_page, has_prev=position is not None)
+
+class CountCache:
+    """Short-lived cache of COUNT(*) results, so listings show an approximate total"""
+    
+    def __init__(self, ttl_seconds: int, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._counts: Dict[Tuple, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+    
+    def count(self, key: Tuple, query) -> int:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._counts.get(key)
+            if cached and cached[1] > now:
+                return cached[0]
+        
+        value = query.order_by(None).count()
+        with self._lock:
+            if len(self._counts) >= self.max_entries:
+                self._counts.clear()
+            self._counts[key] = (value, now + self.ttl_seconds)
+        return value
+
+count_cache = CountCache(Config.LISTING_COUNT_CACHE_SECONDS)
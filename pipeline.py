@@ -0,0 +1,188 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Passed down the queues once the source is exhausted
+_STOP = object()
+
+class StageMetrics:
+    """Counters for one pipeline stage, updated by its workers"""
+    
+    def __init__(self):
+        self.items = 0
+        self.records = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, records: int, busy: float, blocked: float, error: bool = False):
+        with self._lock:
+            self.items += 1
+            self.records += records
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+            if error:
+                self.errors += 1
+
+class Stage:
+    """One step of a pipeline: handler(item) returns the item for the next stage, or None to drop it
+    
+    workers threads run the handler, each inside its own app context, and read
+    from a queue holding at most queue_size items. A full queue blocks the
+    stage feeding it, so a slow stage holds back everything upstream instead
+    of letting work pile up in memory.
+    """
+    
+    def __init__(self, name: str, handler: Callable[[Any], Any], workers: int = 1, queue_size: int = 4):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.metrics = StageMetrics()
+        self._running = 0
+        self._lock = threading.Lock()
+
+class Pipeline:
+    """Staged producer/consumer pipeline connected by bounded queues
+    
+    run() feeds items from a source iterator (recorded as the source stage)
+    through each stage in turn and returns once every item has left the last
+    stage. A handler that raises drops its item, counted as an error; the
+    pipeline itself keeps going.
+    """
+    
+    def __init__(self, app, source_name: str, stages: List[Stage], item_size: Callable[[Any], int] = None):
+        self.app = app
+        self.source = Stage(source_name, None, workers=1)
+        self.stages = stages
+        self.item_size = item_size or (lambda item: 1)
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+    
+    def run(self, items: Iterable):
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        threads = []
+        for index, stage in enumerate(self.stages):
+            downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            stage._running = stage.workers
+            for worker in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(stage, downstream),
+                                          name=f'pipeline-{stage.name}-{worker}', daemon=True)
+                thread.start()
+                threads.append(thread)
+        
+        try:
+            self._produce(items)
+        finally:
+            for _ in range(self.stages[0].workers):
+                self.stages[0].queue.put(_STOP)
+            for thread in threads:
+                thread.join()
+            self.finished_at = time.monotonic()
+    
+    def _produce(self, items: Iterable):
+        iterator = iter(items)
+        first = self.stages[0]
+        while True:
+            started = time.monotonic()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            except Exception as e:
+                logger.error(f"Error in pipeline stage {self.source.name}: {e}")
+                self.source.metrics.record(0, time.monotonic() - started, 0.0, error=True)
+                return
+            fetched = time.monotonic()
+            first.queue.put(item)
+            self.source.metrics.record(self.item_size(item), fetched - started, time.monotonic() - fetched)
+    
+    def _work(self, stage: Stage, downstream: Optional[Stage]):
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                break
+            
+            started = time.monotonic()
+            records = self.item_size(item)
+            error = False
+            try:
+                with self.app.app_context():
+                    item = stage.handler(item)
+            except Exception as e:
+                logger.error(f"Error in pipeline stage {stage.name}: {e}")
+                item, error = None, True
+            
+            handled = time.monotonic()
+            if item is not None and downstream is not None:
+                downstream.queue.put(item)
+            stage.metrics.record(records, handled - started, time.monotonic() - handled, error)
+        
+        # The last worker out tells every worker of the next stage to stop
+        with stage._lock:
+            stage._running -= 1
+            last = stage._running == 0
+        if last and downstream is not None:
+            for _ in range(downstream.workers):
+                downstream.queue.put(_STOP)
+    
+    def metrics(self) -> Dict[str, Dict]:
+        """Per-stage throughput, queue depth and backpressure, for monitoring"""
+        if self.started_at is None:
+            return {}
+        elapsed = max((self.finished_at or time.monotonic()) - self.started_at, 1e-9)
+        report = {}
+        for stage in [self.source] + self.stages:
+            metrics = stage.metrics
+            report[stage.name] = {
+                'workers': stage.workers,
+                'items': metrics.items,
+                'records': metrics.records,
+                'errors': metrics.errors,
+                'records_per_second': round(metrics.records / elapsed, 1),
+                'busy_seconds': round(metrics.busy_seconds, 3),
+                'blocked_seconds': round(metrics.blocked_seconds, 3),
+                'queue_depth': stage.queue.qsize() if stage.handler else None,
+                'queue_size': stage.queue.maxsize if stage.handler else None
+            }
+        return report
+
+class OrderedCompletion:
+    """Tracks items completed out of order and how far they are contiguous
+    
+    Items are numbered from 0 as they enter the pipeline. latest is the value
+    of the newest item whose predecessors have all completed; an item that
+    never completes holds it back.
+    """
+    
+    def __init__(self):
+        self.latest: Optional[Any] = None
+        self._next = 0
+        self._done: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+    
+    def would_reach(self, sequence: int, value: Any) -> Optional[Any]:
+        """What latest would become if this item completed now, or None if it would not move"""
+        with self._lock:
+            if sequence != self._next:
+                return None
+            latest, following = value, sequence + 1
+            while following in self._done:
+                latest = self._done[following] if self._done[following] is not None else latest
+                following += 1
+            return latest
+    
+    def done(self, sequence: int, value: Any):
+        with self._lock:
+            self._done[sequence] = value
+            while self._next in self._done:
+                value = self._done.pop(self._next)
+                if value is not None:
+                    self.latest = value
+                self._next += 1
@@ -0,0 +1,168 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Reminder
+
+logger = logging.getLogger(__name__)
+
+class ReminderTimer:
+    """In-process min-heap of pending reminders that wakes exactly when the next one is due
+    
+    The heap holds (next_reminder, id) pairs; an entry is stale once the id's
+    current due time differs, and stale entries are dropped lazily as they reach
+    the top. While nothing is pending the thread blocks without a timeout, so an
+    idle timer costs nothing. The database stays the source of truth: the timer
+    is only a wake-up hint for fire(), which fires whatever is due there, and
+    load() merges in rows read from the table. An entry the table no longer
+    backs costs one wake-up that fires nothing.
+    """
+    
+    def __init__(self):
+        self._heap = []
+        self._due: Dict[int, datetime] = {}
+        # Reminder id -> time.monotonic() of its last schedule() or cancel(), since the last load()
+        self._changed_at: Dict[int, float] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._fire: Optional[Callable[[], object]] = None
+        self._stopped = False
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    @property
+    def next_due(self) -> Optional[datetime]:
+        with self._condition:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+    
+    def start(self, fire: Callable[[], object]):
+        """Start the timer thread; fire() is called whenever a reminder comes due"""
+        with self._condition:
+            if self.running:
+                return
+            self._fire = fire
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='reminder-timer', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        # A stopped timer holds nothing; the first load() after a restart refills it
+        with self._condition:
+            self._heap = []
+            self._due = {}
+            self._changed_at = {}
+    
+    def load(self, pending: Iterable[Tuple[int, datetime]], read_at: float):
+        """Merge pending (id, next_reminder) pairs read from the database into the heap
+        
+        read_at is the time.monotonic() taken before the read. A reminder
+        scheduled or cancelled here since then has a newer due time than its row,
+        so its row is skipped. Entries missing from pending are kept.
+        """
+        with self._condition:
+            for reminder_id, next_reminder in pending:
+                if next_reminder is None or self._changed_at.get(reminder_id, 0.0) > read_at:
+                    continue
+                if self._due.get(reminder_id) != next_reminder:
+                    self._due[reminder_id] = next_reminder
+                    heapq.heappush(self._heap, (next_reminder, reminder_id))
+            # Later loads read after read_at, so older change times can no longer matter
+            self._changed_at = {reminder_id: changed_at for reminder_id, changed_at in self._changed_at.items()
+                                if changed_at > read_at}
+            self._condition.notify()
+    
+    def schedule(self, reminder_id: int, next_reminder: datetime):
+        """Add or move a reminder; ignored until the timer is started"""
+        if not self.running or next_reminder is None:
+            return
+        with self._condition:
+            if self._due.get(reminder_id) == next_reminder:
+                return
+            self._due[reminder_id] = next_reminder
+            self._changed_at[reminder_id] = time.monotonic()
+            heapq.heappush(self._heap, (next_reminder, reminder_id))
+            # Only an earlier deadline changes how long the thread should sleep
+            if self._heap[0] == (next_reminder, reminder_id):
+                self._condition.notify()
+    
+    def cancel(self, reminder_id: int):
+        """Forget an acknowledged reminder; its heap entry is dropped when it surfaces"""
+        if not self.running:
+            return
+        with self._condition:
+            self._due.pop(reminder_id, None)
+            self._changed_at[reminder_id] = time.monotonic()
+    
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+    
+    def _wait_until_due(self) -> bool:
+        """Block until the earliest reminder is due and pop every due entry; False once stopped"""
+        with self._condition:
+            while not self._stopped:
+                self._drop_stale()
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = (self._heap[0][0] - datetime.now()).total_seconds()
+                if delay <= 0:
+                    break
+                self._condition.wait(delay)
+            if self._stopped:
+                return False
+            
+            now = datetime.now()
+            while self._heap and self._heap[0][0] <= now:
+                next_reminder, reminder_id = heapq.heappop(self._heap)
+                if self._due.get(reminder_id) == next_reminder:
+                    del self._due[reminder_id]
+            return True
+    
+    def _run(self):
+        while self._wait_until_due():
+            try:
+                # Fired reminders are rescheduled through schedule() with their new due time
+                self._fire()
+            except Exception as e:
+                logger.error(f"Error firing due reminders: {e}")
+
+reminder_timer = ReminderTimer()
+
+@event.listens_for(Session, 'after_flush')
+def _record_reminder_changes(session, flush_context):
+    changes = session.info.setdefault('reminder_changes', {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Reminder):
+            changes[obj.id] = None if obj.acknowledged else obj.next_reminder
+    for obj in session.deleted:
+        if isinstance(obj, Reminder):
+            changes[obj.id] = None
+
+@event.listens_for(Session, 'after_commit')
+def _apply_reminder_changes(session):
+    if session.in_nested_transaction():
+        return
+    for reminder_id, next_reminder in session.info.pop('reminder_changes', {}).items():
+        if next_reminder is None:
+            reminder_timer.cancel(reminder_id)
+        else:
+            reminder_timer.schedule(reminder_id, next_reminder)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_reminder_changes(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop('reminder_changes', None)
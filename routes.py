@@ -1,14 +1,100 @@
+import io
+import json
 import logging
+import time
 from datetime import datetime, timedelta
-from flask import render_template, request, redirect, url_for, flash, jsonify
+from typing import List, Optional, Tuple
+from flask import render_template, stream_template, request, redirect, url_for, flash, jsonify, Response
+from markupsafe import Markup
 from models import Message, Task, CalendarEvent, StaffMember, StaffAssignment, Announcement, Reminder, db
-from google_services import sheets_service, calendar_service
+from google_services import message_row, task_row
 from microsoft_services import graph_service
 from message_scanner import message_scanner
+from outbox import enqueue
+from dashboard_stats import PENDING_TASK_STATUSES, get_dashboard_stats, get_dashboard_delta, dashboard_etag, parse_cursor, message_summary, task_summary
+from event_stream import event_broker, publish_on_commit
+from pagination import keyset_paginate, keyset_stream, count_cache, decode_cursor
+from fragment_cache import fragment_cache
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+def _iter_ndjson(stream):
+    """Yield one parsed object per non-empty NDJSON line, or None for lines that are not valid JSON"""
+    # Werkzeug's raw input stream reads lines a byte at a time; buffer it
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream, buffer_size=64 * 1024)
+    
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+def _log_stream_errors(chunks, view: str):
+    """Pass a streamed page through, logging an error raised once its headers are sent
+    
+    By then the status can't change, so the page is closed off with an error
+    notice instead of being cut short without a trace.
+    """
+    try:
+        yield from chunks
+    except Exception as e:
+        logger.error(f"Error streaming {view}: {e}")
+        yield '<div class="alert alert-danger m-3">Error loading the rest of this page</div>'
+
+def _render_panel(name: str, tables: List[str], load, expires_at=None) -> Markup:
+    """Render a dashboard panel partial, reusing the cached fragment while its tables are unchanged"""
+    def render():
+        items = load()
+        html = render_template(f'partials/dashboard_{name}.html', **{name: items})
+        return html, expires_at(items) if expires_at else None
+    
+    return Markup(fragment_cache.get_or_render(name, tables, render))
+
+CALENDAR_VIEWS = ('month', 'week')
+
+def _parse_window_time(value: str) -> Optional[datetime]:
+    """Parse a window bound; offsets (as sent by calendar widgets) become server-local naive times"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def _calendar_window(view: str, anchor: datetime) -> Tuple[datetime, datetime]:
+    """[start, end) of the week (from Monday) or calendar month containing anchor"""
+    day = datetime.combine(anchor.date(), datetime.min.time())
+    if view == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+def _events_in_window(window_start: datetime, window_end: datetime, facility: str = ''):
+    """Events overlapping [window_start, window_end), in start order
+    
+    The start_time range is bounded below by the longest event we expect, so the
+    query stays an index range read however much history exists; events longer
+    than CALENDAR_MAX_EVENT_DAYS that started before the window are not shown.
+    """
+    query = CalendarEvent.query.filter(
+        CalendarEvent.start_time >= window_start - timedelta(days=Config.CALENDAR_MAX_EVENT_DAYS),
+        CalendarEvent.start_time < window_end,
+        CalendarEvent.end_time > window_start
+    )
+    if facility:
+        query = query.filter(CalendarEvent.facility == facility)
+    return query.order_by(CalendarEvent.start_time)
+
 def register_routes(app):
     """Register all application routes"""
     
@@ -16,48 +102,56 @@ def register_routes(app):
     def dashboard():
         """Main dashboard view"""
         try:
-            # Get recent high priority messages
-            high_priority_messages = Message.query.filter_by(priority='High').order_by(Message.created_at.desc()).limit(5).all()
-            
-            # Get pending tasks
-            pending_tasks = Task.query.filter(Task.status.in_(['Not Started', 'In Progress'])).order_by(Task.created_at.desc()).limit(10).all()
-            
-            # Get upcoming events
-            upcoming_events = CalendarEvent.query.filter(CalendarEvent.start_time >= datetime.now()).order_by(CalendarEvent.start_time).limit(5).all()
-            
-            # Get recent announcements
-            recent_announcements = Announcement.query.filter_by(active=True).order_by(Announcement.created_at.desc()).limit(3).all()
-            
-            # Get pending reminders
-            pending_reminders = Reminder.query.filter_by(acknowledged=False).order_by(Reminder.next_reminder).limit(5).all()
-            
-            # Calculate statistics
-            stats = {
-                'total_tasks': Task.query.count(),
-                'pending_tasks': Task.query.filter(Task.status.in_(['Not Started', 'In Progress'])).count(),
-                'high_priority_messages': Message.query.filter_by(priority='High', processed=False).count(),
-                'upcoming_events': CalendarEvent.query.filter(CalendarEvent.start_time >= datetime.now()).count()
+            # Taken first so the client's first delta covers anything committed while rendering
+            delta_etag = dashboard_etag()
+            delta_cursor = datetime.utcnow().isoformat()
+            
+            # Each panel is re-queried and re-rendered only when its table changed
+            panels = {
+                'high_priority_messages': _render_panel(
+                    'high_priority_messages', [Message.__table__.name],
+                    lambda: Message.query.filter_by(priority='High').order_by(Message.created_at.desc()).limit(5).all()
+                ),
+                'pending_tasks': _render_panel(
+                    'pending_tasks', [Task.__table__.name],
+                    lambda: Task.query.filter(Task.status.in_(['Not Started', 'In Progress'])).order_by(Task.created_at.desc()).limit(10).all()
+                ),
+                # Upcoming events drop out as they start, so the fragment expires with the first one
+                'upcoming_events': _render_panel(
+                    'upcoming_events', [CalendarEvent.__table__.name],
+                    lambda: CalendarEvent.query.filter(CalendarEvent.start_time >= datetime.now()).order_by(CalendarEvent.start_time).limit(5).all(),
+                    expires_at=lambda events: events[0].start_time if events else None
+                ),
+                'recent_announcements': _render_panel(
+                    'recent_announcements', [Announcement.__table__.name],
+                    lambda: Announcement.query.filter_by(active=True).order_by(Announcement.created_at.desc()).limit(3).all()
+                ),
+                'pending_reminders': _render_panel(
+                    'pending_reminders', [Reminder.__table__.name],
+                    lambda: Reminder.query.filter_by(acknowledged=False).order_by(Reminder.next_reminder).limit(5).all()
+                )
             }
             
+            # Statistics come from incrementally maintained counters
+            stats = get_dashboard_stats()
+            
             return render_template('dashboard.html',
-                                 high_priority_messages=high_priority_messages,
-                                 pending_tasks=pending_tasks,
-                                 upcoming_events=upcoming_events,
-                                 recent_announcements=recent_announcements,
-                                 pending_reminders=pending_reminders,
+                                 panels=panels,
                                  stats=stats,
+                                 delta_cursor=delta_cursor,
+                                 delta_etag=delta_etag,
+                                 stream_partial=Config.WEB_CONCURRENCY > 1,
                                  facilities=Config.FACILITIES,
                                  now=datetime.now())
         except Exception as e:
             logger.error(f"Error loading dashboard: {e}")
             flash('Error loading dashboard data', 'error')
-            return render_template('dashboard.html', stats={}, facilities=Config.FACILITIES, now=datetime.now())
+            return render_template('dashboard.html', panels={}, stats={}, facilities=Config.FACILITIES, now=datetime.now())
     
     @app.route('/messages')
     def messages():
         """Messages management view"""
         try:
-            page = request.args.get('page', 1, type=int)
             priority_filter = request.args.get('priority', '')
             source_filter = request.args.get('source', '')
             
@@ -68,12 +162,15 @@ def register_routes(app):
             if source_filter:
                 query = query.filter_by(source=source_filter)
             
-            messages_paginated = query.order_by(Message.created_at.desc()).paginate(
-                page=page, per_page=20, error_out=False
+            # Keyset pages cost the same at any depth; the total is a cached approximation
+            messages_page = keyset_paginate(
+                query, Message, Config.MESSAGES_PER_PAGE,
+                after=request.args.get('after'), before=request.args.get('before')
             )
+            messages_page.total = count_cache.count(('messages', priority_filter, source_filter), query)
             
             return render_template('messages.html', 
-                                 messages=messages_paginated,
+                                 messages=messages_page,
                                  priority_filter=priority_filter,
                                  source_filter=source_filter)
         except Exception as e:
@@ -86,42 +183,96 @@ def register_routes(app):
         """Tasks management view"""
         try:
             facility_filter = request.args.get('facility', '')
-            status_filter = request.args.get('status', '')
+            status_filter = request.args.get('status', 'open')  # 'open', 'all' or a single status
             priority_filter = request.args.get('priority', '')
+            per_page = min(max(request.args.get('per_page', Config.TASKS_PER_PAGE, type=int), 1), Config.TASKS_MAX_PER_PAGE)
             
             query = Task.query
             
             if facility_filter:
                 query = query.filter_by(facility=facility_filter)
-            if status_filter:
+            if status_filter == 'open':
+                query = query.filter(Task.status.in_(PENDING_TASK_STATUSES))
+            elif status_filter and status_filter != 'all':
                 query = query.filter_by(status=status_filter)
             if priority_filter:
                 query = query.filter_by(priority=priority_filter)
             
-            tasks = query.order_by(Task.created_at.desc()).all()
+            after, before = request.args.get('after'), request.args.get('before')
+            if (after and not decode_cursor(after)) or (before and not decode_cursor(before)):
+                flash('Invalid page link, showing the first page', 'warning')
+                after = before = None
+            
+            total = count_cache.count(('tasks', facility_filter, status_filter, priority_filter), query)
+            tasks_page = keyset_stream(query, Task, per_page, after=after, before=before)
+            tasks_page.total = total
             
-            return render_template('tasks.html', 
-                                 tasks=tasks,
+            # The first batch is already fetched; later ones are read as the page streams out
+            return _log_stream_errors(stream_template('tasks.html', 
+                                 tasks=tasks_page,
                                  facilities=Config.FACILITIES,
                                  facility_filter=facility_filter,
                                  status_filter=status_filter,
-                                 priority_filter=priority_filter)
+                                 priority_filter=priority_filter,
+                                 per_page=per_page), 'tasks')
         except Exception as e:
             logger.error(f"Error loading tasks: {e}")
             flash('Error loading tasks', 'error')
-            return render_template('tasks.html', tasks=[], facilities=Config.FACILITIES)
+            return render_template('tasks.html', tasks=None, facilities=Config.FACILITIES, status_filter='open')
     
     @app.route('/calendar')
     def calendar():
         """Calendar management view"""
         try:
-            events = CalendarEvent.query.order_by(CalendarEvent.start_time).all()
-            return render_template('calendar.html', events=events, facilities=Config.FACILITIES)
+            view = request.args.get('view', 'month')
+            if view not in CALENDAR_VIEWS:
+                view = 'month'
+            anchor = _parse_window_time(request.args.get('date')) or datetime.now()
+            window_start, window_end = _calendar_window(view, anchor)
+            events = _events_in_window(window_start, window_end).all()
+            
+            # Adjacent windows are reached through links, never loaded up front
+            return render_template('calendar.html',
+                                 events=events,
+                                 view=view,
+                                 window_start=window_start,
+                                 window_end=window_end,
+                                 prev_date=_calendar_window(view, window_start - timedelta(days=1))[0].date().isoformat(),
+                                 next_date=window_end.date().isoformat(),
+                                 facilities=Config.FACILITIES)
         except Exception as e:
             logger.error(f"Error loading calendar: {e}")
             flash('Error loading calendar', 'error')
             return render_template('calendar.html', events=[], facilities=Config.FACILITIES)
     
+    @app.route('/api/calendar/events')
+    def calendar_events():
+        """JSON feed of events overlapping the [start, end) window, for the month/week views"""
+        window_start = _parse_window_time(request.args.get('start'))
+        window_end = _parse_window_time(request.args.get('end'))
+        if not window_start or not window_end or window_end <= window_start:
+            return jsonify({'error': 'start and end are required, with end after start'}), 400
+        if window_end - window_start > timedelta(days=Config.CALENDAR_MAX_WINDOW_DAYS):
+            return jsonify({'error': f'Windows are limited to {Config.CALENDAR_MAX_WINDOW_DAYS} days'}), 400
+        
+        try:
+            events = _events_in_window(window_start, window_end, request.args.get('facility', ''))
+            return jsonify([{
+                'id': event.id,
+                'title': event.title,
+                'start': event.start_time.isoformat(),
+                'end': event.end_time.isoformat(),
+                'extendedProps': {
+                    'location': event.location,
+                    'facility': event.facility,
+                    'description': event.description
+                }
+            } for event in events])
+        
+        except Exception as e:
+            logger.error(f"Error loading calendar events: {e}")
+            return jsonify({'error': 'Failed to load events'}), 500
+    
     @app.route('/staff')
     def staff():
         """Staff management view"""
@@ -149,6 +300,60 @@ def register_routes(app):
             flash('Error loading announcements', 'error')
             return render_template('announcements.html', announcements=[], facilities=Config.FACILITIES)
     
+    # Live dashboard updates
+    @app.route('/api/dashboard/delta')
+    def dashboard_delta():
+        """Stats and items changed since the client's cursor
+        
+        Clients send the last ETag in If-None-Match; while no dashboard table has
+        changed and no event has started the answer is a 304 that costs two
+        indexed reads.
+        """
+        try:
+            etag = dashboard_etag()
+            if etag in request.if_none_match:
+                response = app.response_class(status=304)
+            else:
+                response = jsonify(get_dashboard_delta(parse_cursor(request.args.get('since'))))
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
+        except Exception as e:
+            logger.error(f"Error building dashboard delta: {e}")
+            return jsonify({'error': 'Failed to load dashboard changes'}), 500
+    
+    @app.route('/api/stream')
+    def stream_events():
+        """Server-sent events for new high-priority messages, due reminders and task status changes
+        
+        Returns 503 when this worker has no free stream slots; the dashboard then
+        keeps polling /api/dashboard/delta instead.
+        """
+        last_event_id = request.headers.get('Last-Event-ID', type=int)
+        subscription = event_broker.subscribe(last_event_id)
+        if subscription is None:
+            return jsonify({'error': 'Too many open streams'}), 503
+        
+        def generate():
+            try:
+                yield f"retry: {Config.EVENT_STREAM_RETRY_MS}\n\n"
+                for message in subscription.replay:
+                    yield message
+                
+                deadline = time.monotonic() + Config.EVENT_STREAM_MAX_SECONDS
+                while not subscription.overflowed and time.monotonic() < deadline:
+                    message = subscription.get(timeout=Config.EVENT_STREAM_HEARTBEAT_SECONDS)
+                    # A comment line keeps idle connections open through proxies
+                    yield message if message is not None else ": keepalive\n\n"
+            finally:
+                event_broker.unsubscribe(subscription)
+        
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+    
     # API endpoints for iOS Shortcut integration
     @app.route('/api/log_message', methods=['POST'])
     def log_message():
@@ -178,16 +383,18 @@ def register_routes(app):
                 priority=priority
             )
             db.session.add(message)
-            db.session.commit()
+            db.session.flush()
             
-            # Log to Google Sheets
-            sheets_service.log_message(sender, content, source, priority)
+            # Side effects are recorded in the same transaction and delivered by the outbox worker
+            enqueue('sheets_row', {'worksheet': 'Messages', 'row': message_row(sender, content, source, priority)},
+                    key=f'sheets_message:{message.id}')
             
-            # Process for immediate actions if high priority
+            # Auto-create tasks/events for high priority messages
             if priority == 'High':
-                processing_result = message_scanner.process_message(message)
-                # Auto-create tasks/events for high priority messages
-                # This would be expanded based on specific business rules
+                enqueue('process_message', {'message_id': message.id}, key=f'process_message:{message.id}')
+                publish_on_commit('high_priority_message', message_summary(message))
+            
+            db.session.commit()
             
             logger.info(f"Logged message from {sender} via API")
             
@@ -197,11 +404,82 @@ def register_routes(app):
                 'priority': priority,
                 'message': 'Message logged successfully'
             })
-            
+        
         except Exception as e:
             logger.error(f"Error logging message via API: {e}")
             return jsonify({'error': 'Failed to log message'}), 500
     
+    @app.route('/api/log_messages', methods=['POST'])
+    def log_messages():
+        """Bulk API endpoint accepting an NDJSON stream or a JSON array of messages
+        
+        The token comes from the X-Shortcut-Token header, the token query parameter,
+        or a {"token": ..., "messages": [...]} body.
+        """
+        try:
+            token = request.headers.get('X-Shortcut-Token') or request.args.get('token')
+            
+            if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+                items = _iter_ndjson(request.stream)
+            else:
+                data = request.get_json(silent=True)
+                if isinstance(data, dict):
+                    token = data.get('token', token)
+                    items = data.get('messages', [])
+                elif isinstance(data, list):
+                    items = data
+                else:
+                    return jsonify({'error': 'Expected a JSON array or NDJSON body'}), 400
+            
+            # Verify token
+            if token != Config.IOS_SHORTCUT_TOKEN:
+                return jsonify({'error': 'Invalid token'}), 401
+            
+            try:
+                results = message_scanner.ingest_messages(items)
+            except ValueError as e:
+                db.session.rollback()
+                return jsonify({'error': str(e)}), 413
+            
+            accepted = sum(1 for result in results if result['success'])
+            logger.info(f"Logged {accepted} of {len(results)} messages via bulk API")
+            
+            return jsonify({
+                'success': True,
+                'accepted': accepted,
+                'rejected': len(results) - accepted,
+                'results': results
+            })
+        
+        except Exception as e:
+            logger.error(f"Error logging messages via bulk API: {e}")
+            db.session.rollback()
+            return jsonify({'error': 'Failed to log messages'}), 500
+    
+    # Monitoring endpoints
+    @app.route('/api/ingest/metrics')
+    def ingest_metrics():
+        """Per-stage throughput and queue depth of the mail ingestion pipeline in this process
+        
+        Scans run only in the scheduler leader, so other workers report no
+        stages; leader_holder names the process to ask instead.
+        """
+        election = app.scheduler_service.election
+        return jsonify({
+            'holder': election.holder,
+            'leader': election.is_leader,
+            'leader_holder': election.current_holder(),
+            'stages': message_scanner.pipeline_metrics()
+        })
+    
+    @app.route('/api/graph/latency')
+    def graph_latency():
+        """Per-method Microsoft Graph call counts and latency in this process"""
+        # Reading stats must not be what connects the integration
+        if not graph_service.initialized:
+            return jsonify({})
+        return jsonify(graph_service.get_latency_stats())
+    
     # Form submission handlers
     @app.route('/update_task_status', methods=['POST'])
     def update_task_status():
@@ -215,13 +493,14 @@ def register_routes(app):
             task.status = new_status
             if assigned_to:
                 task.assigned_to = assigned_to
-            task.updated_at = datetime.now()
+            # updated_at is stamped in UTC on flush, which the dashboard delta relies on
+            publish_on_commit('task_status', task_summary(task))
             
             db.session.commit()
             
             flash(f'Task "{task.title}" updated successfully', 'success')
             return redirect(url_for('tasks'))
-            
+        
         except Exception as e:
             logger.error(f"Error updating task: {e}")
             flash('Error updating task', 'error')
@@ -249,14 +528,16 @@ def register_routes(app):
                 assigned_to=assigned_to
             )
             db.session.add(task)
-            db.session.commit()
+            db.session.flush()
             
-            # Log to Google Sheets
-            sheets_service.log_task(title, description, facility, priority, assigned_to)
+            # Log to Google Sheets, delivered by the outbox worker
+            enqueue('sheets_row', {'worksheet': 'Tasks', 'row': task_row(title, description, facility, priority, assigned_to)},
+                    key=f'sheets_task:{task.id}')
+            db.session.commit()
             
             flash(f'Task "{title}" created successfully', 'success')
             return redirect(url_for('tasks'))
-            
+        
         except Exception as e:
             logger.error(f"Error creating task: {e}")
             flash('Error creating task', 'error')
@@ -273,7 +554,7 @@ def register_routes(app):
             
             flash('Reminder acknowledged', 'success')
             return redirect(url_for('dashboard'))
-            
+        
         except Exception as e:
             logger.error(f"Error acknowledging reminder: {e}")
             flash('Error acknowledging reminder', 'error')
@@ -303,7 +584,7 @@ def register_routes(app):
             
             flash(f'Announcement "{title}" created successfully', 'success')
             return redirect(url_for('announcements'))
-            
+        
         except Exception as e:
             logger.error(f"Error creating announcement: {e}")
             flash('Error creating announcement', 'error')
@@ -1,21 +1,64 @@
+import atexit
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import case, func, select, update
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from models import Reminder, Task, CalendarEvent, db
+from models import Reminder, db
 from message_scanner import message_scanner
+from dashboard_stats import reconcile_counters
+from event_stream import publish_on_commit
+from reminder_timer import reminder_timer
+from outbox import purge_delivered
+from leader_election import SCHEDULER_LEASE, LeaderElection
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Jobs that run only in the process holding the scheduler lease
+LEADER_JOBS = ('message_scanner', 'reminder_checker', 'stats_reconciler', 'outbox_purger')
+
 class SchedulerService:
     """Service for managing scheduled tasks"""
     
     def __init__(self, app):
         self.app = app
+        self.election = LeaderElection(SCHEDULER_LEASE, Config.SCHEDULER_LEASE_SECONDS)
+        self._heartbeat_lock = threading.Lock()
+        self._stopped = False
         self.scheduler = BackgroundScheduler()
         self.scheduler.start()
         
+        # Every worker runs the heartbeat; only the lease holder runs the jobs
+        self.scheduler.add_job(
+            func=self.leader_heartbeat_job,
+            trigger=IntervalTrigger(seconds=Config.SCHEDULER_HEARTBEAT_SECONDS),
+            id='leader_heartbeat',
+            name='Renew scheduler lease',
+            replace_existing=True,
+            next_run_time=datetime.now()
+        )
+        
+        logger.info(f"Scheduler initialized as {self.election.holder}, waiting for the scheduler lease")
+    
+    def leader_heartbeat_job(self):
+        """Scheduled job to take or renew the scheduler lease and start or stop the jobs to match"""
+        with self._heartbeat_lock:
+            if self._stopped:
+                return
+            with self.app.app_context():
+                leader = self.election.renew()
+            
+            if leader and not self.scheduler.get_job('message_scanner'):
+                self.start_leader_jobs()
+            elif not leader and self.scheduler.get_job('message_scanner'):
+                self.stop_leader_jobs()
+    
+    def start_leader_jobs(self):
+        """Schedule the jobs that must run in exactly one process"""
         # Schedule message scanning
         self.scheduler.add_job(
             func=self.scan_messages_job,
@@ -25,137 +68,200 @@ class SchedulerService:
             replace_existing=True
         )
         
-        # Schedule reminder checking
+        # Reminders fire from the in-memory timer; the periodic job only
+        # merges in reminders coming due soon, to pick up changes made elsewhere
+        reminder_timer.start(self.check_reminders_job)
         self.scheduler.add_job(
-            func=self.check_reminders_job,
-            trigger=IntervalTrigger(minutes=5),  # Check every 5 minutes
+            func=self.resync_reminders_job,
+            trigger=IntervalTrigger(minutes=Config.REMINDER_RESYNC_MINUTES),
             id='reminder_checker',
-            name='Check pending reminders',
+            name='Resync pending reminders',
+            replace_existing=True,
+            next_run_time=datetime.now()
+        )
+        
+        # Schedule dashboard counter reconciliation
+        self.scheduler.add_job(
+            func=self.reconcile_stats_job,
+            trigger=IntervalTrigger(minutes=Config.STATS_RECONCILE_MINUTES),
+            id='stats_reconciler',
+            name='Reconcile dashboard counters',
             replace_existing=True
         )
         
-        logger.info("Scheduler initialized with message scanning and reminder checking")
+        # Schedule removal of delivered outbox events
+        self.scheduler.add_job(
+            func=self.purge_outbox_job,
+            trigger=IntervalTrigger(minutes=Config.OUTBOX_PURGE_MINUTES),
+            id='outbox_purger',
+            name='Purge delivered outbox events',
+            replace_existing=True
+        )
+        
+        logger.info("Took the scheduler lease; running message scanning and reminder checking")
+    
+    def stop_leader_jobs(self):
+        """Unschedule the leader-only jobs; a run already in progress finishes on its own"""
+        for job_id in LEADER_JOBS:
+            if self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
+        reminder_timer.stop()
+        logger.info("Lost the scheduler lease; stopped message scanning and reminder checking")
     
     def scan_messages_job(self):
-        """Scheduled job to scan for new messages"""
+        """Scheduled job to scan for new messages
+        
+        The scanner stores each batch of messages together with the tasks, events
+        and reminders derived from them, in one transaction per batch.
+        """
+        if not self.election.is_leader:
+            return
         try:
             with self.app.app_context():
                 logger.info("Starting scheduled message scan")
                 results = message_scanner.scan_incoming_messages()
-                
-                # Process any identified actions
-                for result in results:
-                    self.process_message_actions(result)
-                
-                logger.info(f"Completed message scan, processed {len(results)} messages")
-                
+                actions = sum(len(result['actions']) for result in results)
+                logger.info(f"Completed message scan, processed {len(results)} messages with {actions} actions")
+        
         except Exception as e:
             logger.error(f"Error in scheduled message scan: {e}")
     
-    def process_message_actions(self, processing_result: dict):
-        """Process actions identified from message scanning"""
+    def reconcile_stats_job(self):
+        """Scheduled job to correct drift in the dashboard counters"""
+        if not self.election.is_leader:
+            return
+        with self.app.app_context():
+            reconcile_counters()
+    
+    def purge_outbox_job(self):
+        """Scheduled job to delete outbox events delivered more than OUTBOX_RETENTION_DAYS ago"""
+        if not self.election.is_leader:
+            return
         try:
-            message_id = processing_result['message_id']
-            actions = processing_result['actions']
-            
-            for action in actions:
-                if action['type'] == 'task':
-                    # Create task
-                    task = Task(
-                        title=action['title'],
-                        description=action['description'],
-                        facility=action['facility'],
-                        priority=action['priority'],
-                        message_id=message_id
-                    )
-                    db.session.add(task)
-                    
-                    # Create reminder for high priority tasks
-                    if action['priority'] == 'High':
-                        reminder = Reminder(
-                            task=task,
-                            reminder_text=f"High priority task: {action['title']}",
-                            next_reminder=datetime.now() + timedelta(minutes=30)
-                        )
-                        db.session.add(reminder)
-                
-                elif action['type'] == 'event':
-                    # Create calendar event
-                    event = CalendarEvent(
-                        title=action['title'],
-                        description=action['description'],
-                        start_time=action['start_time'],
-                        end_time=action['end_time'],
-                        location=action['location'],
-                        facility=action.get('facility', 'Bellevue Medical Center'),
-                        message_id=message_id
-                    )
-                    db.session.add(event)
-                    
-                    # Create reminder 30 minutes before event
-                    reminder_time = action['start_time'] - timedelta(minutes=30)
-                    if reminder_time > datetime.now():
-                        reminder = Reminder(
-                            event=event,
-                            reminder_text=f"Upcoming event: {action['title']}",
-                            next_reminder=reminder_time
-                        )
-                        db.session.add(reminder)
-            
-            db.session.commit()
-            
+            with self.app.app_context():
+                purged = purge_delivered()
+                if purged:
+                    logger.info(f"Purged {purged} delivered outbox events")
+        
         except Exception as e:
-            logger.error(f"Error processing message actions: {e}")
-            db.session.rollback()
+            logger.error(f"Error purging outbox events: {e}")
     
-    def check_reminders_job(self):
-        """Scheduled job to check for pending reminders"""
+    def resync_reminders_job(self):
+        """Scheduled job to merge pending reminders due before the next resync into the reminder timer
+        
+        The horizon is two intervals ahead, so a resync that runs late still
+        loads each reminder before it is due; reminders further out are picked
+        up by a later resync. A reminder written by another worker and due
+        before the next resync is only seen then, so it fires up to
+        REMINDER_RESYNC_MINUTES late.
+        """
+        if not self.election.is_leader:
+            return
         try:
             with self.app.app_context():
-                now = datetime.now()
-                
-                # Get pending reminders that are due
-                pending_reminders = Reminder.query.filter(
-                    Reminder.acknowledged == False,
-                    Reminder.next_reminder <= now
+                read_at = time.monotonic()
+                horizon = datetime.now() + timedelta(minutes=2 * Config.REMINDER_RESYNC_MINUTES)
+                pending = db.session.execute(
+                    select(Reminder.id, Reminder.next_reminder).where(
+                        Reminder.acknowledged == False,
+                        Reminder.next_reminder < horizon
+                    )
                 ).all()
+                reminder_timer.load(pending, read_at)
+                logger.debug(f"Merged {len(pending)} reminders due before {horizon} into the reminder timer")
+        
+        except Exception as e:
+            logger.error(f"Error resyncing reminders: {e}")
+    
+    def check_reminders_job(self) -> List[Dict]:
+        """Scheduled job to fire due reminders; returns what it fired for bulk notification"""
+        fired = []
+        # A leader that stalled past its lease may have been replaced
+        if not self.election.is_leader:
+            return fired
+        try:
+            with self.app.app_context():
+                while True:
+                    chunk = self.fire_due_reminders(datetime.now(), Config.REMINDER_BATCH_SIZE)
+                    fired.extend(chunk)
+                    if len(chunk) < Config.REMINDER_BATCH_SIZE:
+                        break
                 
-                for reminder in pending_reminders:
-                    self.process_reminder(reminder)
-                
-                if pending_reminders:
-                    logger.info(f"Processed {len(pending_reminders)} pending reminders")
-                
+                if fired:
+                    logger.info(f"Processed {len(fired)} pending reminders")
+        
         except Exception as e:
             logger.error(f"Error checking reminders: {e}")
+        return fired
     
-    def process_reminder(self, reminder: Reminder):
-        """Process a single reminder"""
+    def fire_due_reminders(self, now: datetime, limit: int) -> List[Dict]:
+        """Fire up to limit due reminders with one UPDATE and one commit
+        
+        The backoff is applied in SQL: a reminder is due again in
+        REMINDER_INTERVAL_MINUTES, or REMINDER_BACKOFF_HOURS once it has fired
+        more than REMINDER_BACKOFF_AFTER times. The due conditions are repeated
+        in the UPDATE so a reminder acknowledged since the SELECT is left alone.
+        """
+        due = (
+            Reminder.acknowledged == False,
+            Reminder.next_reminder <= now
+        )
+        due_ids = select(Reminder.id).where(*due).order_by(Reminder.next_reminder).limit(limit)
+        reminder_count = func.coalesce(Reminder.reminder_count, 0) + 1
+        
         try:
-            # Increment reminder count
-            reminder.reminder_count += 1
-            
-            # Set next reminder time (every 30 minutes)
-            reminder.next_reminder = datetime.now() + timedelta(minutes=Config.REMINDER_INTERVAL_MINUTES)
-            
-            # If it's been reminded too many times, reduce frequency
-            if reminder.reminder_count > 5:
-                reminder.next_reminder = datetime.now() + timedelta(hours=2)
+            rows = db.session.execute(
+                update(Reminder)
+                .where(Reminder.id.in_(due_ids), *due)
+                .values(
+                    reminder_count=reminder_count,
+                    next_reminder=case(
+                        (reminder_count > Config.REMINDER_BACKOFF_AFTER, now + timedelta(hours=Config.REMINDER_BACKOFF_HOURS)),
+                        else_=now + timedelta(minutes=Config.REMINDER_INTERVAL_MINUTES)
+                    )
+                )
+                .returning(Reminder.id, Reminder.reminder_text, Reminder.reminder_count, Reminder.next_reminder)
+                .execution_options(synchronize_session=False)
+            ).all()
             
+            fired = [{
+                'id': row.id,
+                'text': row.reminder_text,
+                'reminder_count': row.reminder_count,
+                'next_reminder': row.next_reminder.isoformat()
+            } for row in rows]
+            for reminder in fired:
+                publish_on_commit('reminder_due', reminder)
             db.session.commit()
             
-            # Log the reminder (in a real implementation, this would trigger a notification)
-            logger.info(f"Reminder triggered: {reminder.reminder_text}")
-            
+            for row in rows:
+                reminder_timer.schedule(row.id, row.next_reminder)
+        
         except Exception as e:
-            logger.error(f"Error processing reminder {reminder.id}: {e}")
+            logger.error(f"Error firing due reminders: {e}")
             db.session.rollback()
+            return []
+        
+        # Log the reminders (in a real implementation, this would trigger notifications)
+        for reminder in fired:
+            logger.info(f"Reminder triggered: {reminder['text']}")
+        return fired
     
     def shutdown(self):
-        """Shutdown the scheduler"""
+        """Shutdown the scheduler, handing the lease to another worker; later calls do nothing"""
+        # Waits for a heartbeat in progress, so none can renew the lease after it is released
+        with self._heartbeat_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        
+        reminder_timer.stop()
         if self.scheduler.running:
-            self.scheduler.shutdown()
+            # Jobs still running keep going; each checks is_leader, which the release clears
+            self.scheduler.shutdown(wait=False)
             logger.info("Scheduler shut down")
+        with self.app.app_context():
+            self.election.release()
 
 def init_scheduler(app):
     """Initialize the scheduler with the Flask app"""
@@ -164,4 +270,7 @@ def init_scheduler(app):
     # Store reference to scheduler in app for cleanup
     app.scheduler_service = scheduler_service
     
+    # Release the lease when the worker exits, so another takes over without waiting for it to expire
+    atexit.register(scheduler_service.shutdown)
+    
     return scheduler_service
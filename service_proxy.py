@@ -0,0 +1,47 @@
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+class LazyServiceProxy:
+    """Proxy that constructs an integration service on first use
+    
+    Service constructors authenticate and connect to remote APIs, so building
+    them at import time made every worker start (and every import of routes)
+    wait on the network. The proxy defers construction until an attribute is
+    first accessed, and warm_up() can build the service on a background thread
+    instead.
+    """
+    
+    def __init__(self, name: str, factory: Callable):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+    
+    def _get_instance(self):
+        """Build the service once, even if several threads ask at the same time"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    logger.info(f"Initializing {self._name}")
+                    self._instance = self._factory()
+        return self._instance
+    
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+    
+    def warm_up(self) -> threading.Thread:
+        """Start building the service on a daemon thread and return the thread"""
+        thread = threading.Thread(target=self._get_instance, name=f"warm-up-{self._name}", daemon=True)
+        thread.start()
+        return thread
+    
+    def __getattr__(self, attr):
+        return getattr(self._get_instance(), attr)
+    
+    def __repr__(self):
+        state = 'initialized' if self.initialized else 'not initialized'
+        return f'<LazyServiceProxy {self._name}: {state}>'
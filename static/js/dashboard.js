@@ -5,10 +5,30 @@
 
 // Global configuration
 const DASHBOARD_CONFIG = {
-    refreshInterval: 5 * 60 * 1000, // 5 minutes
+    refreshInterval: 60 * 1000, // 1 minute; a refresh is one conditional delta request
+    streamFallbackInterval: 5 * 60 * 1000, // Safety-net polling while the event stream is connected
+    streamSyncDelay: 2000, // Debounce before syncing counters after pushed events
     notificationDuration: 5000, // 5 seconds
     animationDuration: 300,
-    maxRecentItems: 10
+    maxRecentItems: 10,
+    panelLimits: {
+        high_priority_messages: 5,
+        pending_tasks: 10,
+        upcoming_events: 5
+    }
+};
+
+// Cursor and ETag of the last dashboard delta, seeded from the rendered page
+const dashboardDelta = {
+    cursor: null,
+    etag: null
+};
+
+// Server-sent event stream state
+const dashboardStream = {
+    source: null,
+    connected: false,
+    syncTimer: null
 };
 
 // Initialize dashboard when DOM is loaded
@@ -42,7 +62,7 @@ function initializeDashboard() {
     initializeDataTables();
     
     // Set up real-time updates
-    setupWebSocket();
+    setupEventStream();
     
     console.log('Dashboard initialized successfully');
 }
@@ -213,10 +233,14 @@ function startAutoRefresh() {
         clearInterval(window.dashboardRefreshInterval);
     }
     
-    // Set up new interval
+    // Set up new interval; pushed events make polling a slow fallback, unless the
+    // server runs several workers and the stream only sees its own worker's events
+    const root = document.getElementById('dashboard');
+    const streamComplete = dashboardStream.connected && !(root && root.dataset.streamPartial === 'true');
+    const interval = streamComplete ? DASHBOARD_CONFIG.streamFallbackInterval : DASHBOARD_CONFIG.refreshInterval;
     window.dashboardRefreshInterval = setInterval(() => {
         refreshDashboard();
-    }, DASHBOARD_CONFIG.refreshInterval);
+    }, interval);
     
     console.log('Auto-refresh started');
 }
@@ -228,11 +252,8 @@ function refreshDashboard() {
     // Update timestamp
     updateLastRefreshTime();
     
-    // Refresh statistics
-    refreshStatistics();
-    
-    // Refresh recent items
-    refreshRecentItems();
+    // Refresh statistics and recent items from the changes since the last refresh
+    fetchDashboardDelta();
     
     // Check for new notifications
     checkForNotifications();
@@ -240,6 +261,52 @@ function refreshDashboard() {
     console.log('Dashboard refreshed at', new Date().toLocaleTimeString());
 }
 
+/**
+ * Fetch stats and items changed since the last cursor
+ */
+function fetchDashboardDelta() {
+    const root = document.getElementById('dashboard');
+    if (!root || !root.dataset.deltaCursor) {
+        return Promise.resolve(null);
+    }
+    
+    if (dashboardDelta.cursor === null) {
+        dashboardDelta.cursor = root.dataset.deltaCursor;
+        dashboardDelta.etag = root.dataset.deltaEtag ? `"${root.dataset.deltaEtag}"` : null;
+    }
+    
+    const headers = {};
+    if (dashboardDelta.etag) {
+        headers['If-None-Match'] = dashboardDelta.etag;
+    }
+    
+    // no-store so a 304 reaches this code instead of being answered from the HTTP cache
+    return fetch(`/api/dashboard/delta?since=${encodeURIComponent(dashboardDelta.cursor)}`, {
+        headers: headers,
+        cache: 'no-store'
+    })
+        .then(response => {
+            if (response.status === 304) {
+                return null;
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            dashboardDelta.etag = response.headers.get('ETag');
+            return response.json();
+        })
+        .then(delta => {
+            if (!delta) return;
+            
+            dashboardDelta.cursor = delta.cursor;
+            refreshStatistics(delta.stats);
+            refreshRecentItems(delta);
+        })
+        .catch(error => {
+            console.warn('Dashboard refresh failed:', error);
+        });
+}
+
 /**
  * Update last refresh time display
  */
@@ -256,17 +323,14 @@ function updateLastRefreshTime() {
 /**
  * Refresh statistics counters
  */
-function refreshStatistics() {
-    // In a full implementation, this would make AJAX calls to get updated stats
-    // For now, we'll simulate random updates
-    const statElements = document.querySelectorAll('.card-body h2');
+function refreshStatistics(stats) {
+    if (!stats) return;
     
-    statElements.forEach(element => {
-        const currentValue = parseInt(element.textContent) || 0;
-        // Simulate small random changes
-        const change = Math.floor(Math.random() * 3) - 1; // -1, 0, or 1
-        const newValue = Math.max(0, currentValue + change);
+    document.querySelectorAll('[data-stat]').forEach(element => {
+        const newValue = stats[element.dataset.stat];
+        if (newValue === undefined) return;
         
+        const currentValue = parseInt(element.textContent) || 0;
         if (newValue !== currentValue) {
             animateCounter(element, currentValue, newValue);
         }
@@ -298,17 +362,125 @@ function animateCounter(element, from, to) {
 /**
  * Refresh recent items lists
  */
-function refreshRecentItems() {
-    // In a full implementation, this would fetch updated data
-    // For now, we'll just add visual feedback
-    const recentLists = document.querySelectorAll('.recent-items, .pending-items');
+function refreshRecentItems(delta) {
+    // Lists arrive newest first; insert oldest first so the newest ends up on top
+    const newMessages = (delta.messages || []).slice().reverse().filter(message => {
+        return upsertPanelItem('high_priority_messages', 'message', message.id, () => buildPanelItem(
+            message.sender, message.priority, 'bg-danger', message.content,
+            new Date(message.created_at + 'Z').toLocaleString()
+        ));
+    });
     
-    recentLists.forEach(list => {
-        list.classList.add('refreshing');
-        setTimeout(() => {
-            list.classList.remove('refreshing');
-        }, 500);
+    (delta.tasks || []).slice().reverse().forEach(task => {
+        const pending = task.status === 'Not Started' || task.status === 'In Progress';
+        const existing = findPanelItem('pending_tasks', 'task', task.id);
+        
+        if (existing && !pending) {
+            existing.remove();
+        } else if (existing) {
+            const statusBadge = existing.querySelector('.badge.bg-info');
+            const statusSelect = existing.querySelector('select[name="status"]');
+            if (statusBadge) statusBadge.textContent = task.status;
+            if (statusSelect) statusSelect.value = task.status;
+        } else if (pending) {
+            upsertPanelItem('pending_tasks', 'task', task.id, () => buildPanelItem(
+                task.title, task.priority, task.priority === 'High' ? 'bg-danger' : 'bg-secondary', task.facility,
+                'Status: ' + task.status + (task.assigned_to ? ' | Assigned to: ' + task.assigned_to : '')
+            ));
+        }
+    });
+    
+    (delta.events || []).forEach(event => {
+        upsertPanelItem('upcoming_events', 'event', event.id, () => {
+            const item = buildPanelItem(event.title, null, null, event.location, new Date(event.start_time).toLocaleString());
+            item.dataset.start = event.start_time;
+            return item;
+        }, 'start');
     });
+    
+    if (newMessages.length > 0) {
+        showNotification(`${newMessages.length} new high priority message(s)`, 'danger');
+    }
+}
+
+/**
+ * Find a dashboard panel item by id
+ */
+function findPanelItem(panelName, kind, id) {
+    const panel = document.querySelector(`[data-panel="${panelName}"]`);
+    return panel ? panel.querySelector(`[data-${kind}-id="${id}"]`) : null;
+}
+
+/**
+ * Add an item to the top of a panel (or in sortKey order) unless it is already shown
+ * Returns true when the item was added.
+ */
+function upsertPanelItem(panelName, kind, id, build, sortKey = null) {
+    const panel = document.querySelector(`[data-panel="${panelName}"]`);
+    if (!panel || findPanelItem(panelName, kind, id)) return false;
+    
+    // Drop the empty-state placeholder
+    const placeholder = panel.querySelector(':scope > .text-center.text-muted');
+    if (placeholder) placeholder.remove();
+    
+    const item = build();
+    item.setAttribute(`data-${kind}-id`, id);
+    panel.insertBefore(item, panel.firstChild);
+    if (sortKey) {
+        sortPanelItems(panelName, sortKey);
+    }
+    
+    // Keep the panel at the size the server renders
+    const items = panel.querySelectorAll(`:scope > [data-${kind}-id]`);
+    const limit = DASHBOARD_CONFIG.panelLimits[panelName] || DASHBOARD_CONFIG.maxRecentItems;
+    for (let i = limit; i < items.length; i++) {
+        items[i].remove();
+    }
+    return true;
+}
+
+/**
+ * Build a panel row; text is set through textContent so nothing is parsed as HTML
+ */
+function buildPanelItem(title, badgeText, badgeClass, detail, meta) {
+    const item = document.createElement('div');
+    item.className = 'border-bottom pb-2 mb-2';
+    
+    const strong = document.createElement('strong');
+    strong.textContent = title;
+    item.appendChild(strong);
+    
+    if (badgeText) {
+        const badge = document.createElement('span');
+        badge.className = `badge ${badgeClass} ms-2`;
+        badge.textContent = badgeText;
+        item.appendChild(badge);
+    }
+    
+    const detailElement = document.createElement('p');
+    detailElement.className = 'mb-1 text-muted small';
+    detailElement.textContent = detail || '';
+    item.appendChild(detailElement);
+    
+    const metaElement = document.createElement('small');
+    metaElement.className = 'text-muted';
+    metaElement.textContent = meta;
+    item.appendChild(metaElement);
+    
+    return item;
+}
+
+/**
+ * Re-order panel items by a data attribute
+ */
+function sortPanelItems(panelName, key) {
+    const panel = document.querySelector(`[data-panel="${panelName}"]`);
+    if (!panel) return;
+    
+    Array.from(panel.children)
+        .filter(item => item.dataset[key])
+        .sort((a, b) => a.dataset[key].localeCompare(b.dataset[key]))
+        .forEach(item => panel.appendChild(item));
 }
 
 /**
@@ -506,12 +678,64 @@ function updateBulkActionButtons() {
 }
 
 /**
- * Setup WebSocket for real-time updates
+ * Set up the server-sent event stream for real-time updates
+ */
+function setupEventStream() {
+    const root = document.getElementById('dashboard');
+    if (!root || typeof EventSource === 'undefined') return;
+    
+    const source = new EventSource('/api/stream');
+    dashboardStream.source = source;
+    
+    source.addEventListener('open', () => {
+        dashboardStream.connected = true;
+        startAutoRefresh();
+        // Catch up on anything committed while disconnected
+        fetchDashboardDelta();
+    });
+    
+    source.addEventListener('error', () => {
+        // EventSource reconnects by itself unless the server refused the stream
+        if (dashboardStream.connected) {
+            dashboardStream.connected = false;
+            startAutoRefresh();
+        }
+    });
+    
+    source.addEventListener('high_priority_message', event => {
+        refreshRecentItems({ messages: [JSON.parse(event.data)] });
+        scheduleStreamSync();
+    });
+    
+    source.addEventListener('task_status', event => {
+        refreshRecentItems({ tasks: [JSON.parse(event.data)] });
+        scheduleStreamSync();
+    });
+    
+    source.addEventListener('reminder_due', event => {
+        const reminder = JSON.parse(event.data);
+        showNotification(`<i class="fas fa-bell me-1"></i>${escapeHtml(reminder.text)}`, 'warning');
+    });
+    
+    // The server lost track of what this client has seen
+    source.addEventListener('resync', () => fetchDashboardDelta());
+}
+
+/**
+ * Sync counters once a burst of pushed events has settled
+ */
+function scheduleStreamSync() {
+    clearTimeout(dashboardStream.syncTimer);
+    dashboardStream.syncTimer = setTimeout(fetchDashboardDelta, DASHBOARD_CONFIG.streamSyncDelay);
+}
+
+/**
+ * Escape text for insertion into HTML
  */
-function setupWebSocket() {
-    // In a full implementation, this would establish WebSocket connection
-    // For now, we'll simulate with periodic checks
-    console.log('WebSocket simulation started');
+function escapeHtml(text) {
+    const element = document.createElement('div');
+    element.textContent = text;
+    return element.innerHTML;
 }
 
 /**
@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_graph import FakeGraphServer
+
+# Config reads the environment at import time, so the fake Graph server and a
+# throwaway database have to be in place before the app is first imported
+fake_graph_server = FakeGraphServer().start()
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}",
+    'MICROSOFT_GRAPH_URL': f'{fake_graph_server.url}/v1.0',
+    'MICROSOFT_LOGIN_URL': fake_graph_server.url,
+    'MICROSOFT_CLIENT_ID': 'client',
+    'MICROSOFT_CLIENT_SECRET': 'secret',
+    'MICROSOFT_TENANT_ID': 'tenant',
+    'OUTBOX_WORKERS': '0',
+})
+
+# models imports db from app, so tests import models and services inside
+# the test, after this fixture has created the app
+@pytest.fixture(scope='session')
+def app():
+    from app import app as flask_app
+    yield flask_app
+    flask_app.scheduler_service.shutdown()
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+
+@pytest.fixture
+def fake_graph():
+    fake_graph_server.reset()
+    yield fake_graph_server
+    fake_graph_server.reset()
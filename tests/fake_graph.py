@@ -0,0 +1,94 @@
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeGraphServer:
+    """In-process stand-in for the Graph token endpoint and mailbox listing
+    
+    mailbox holds message dicts (id, receivedDateTime, bodyPreview, from).
+    /users/<id>/messages honours the receivedDateTime ge filter, $top and
+    $skip, and pages with absolute @odata.nextLink URLs like Graph does.
+    /$batch answers each GET sub-request with {'url': url}, after first
+    returning any statuses queued for that url in batch_failures.
+    Every request is appended to requests as (method, path).
+    """
+    
+    def __init__(self):
+        self.mailbox = []
+        self.batch_failures = {}
+        self.requests = []
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.port = self._server.server_port
+        self.url = f'http://127.0.0.1:{self.port}'
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-graph', daemon=True)
+    
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def reset(self):
+        self.mailbox.clear()
+        self.batch_failures.clear()
+        self.requests.clear()
+    
+    def list_messages(self, path: str, query: dict) -> dict:
+        items = sorted(self.mailbox, key=lambda message: message['receivedDateTime'])
+        condition = query.get('$filter', '')
+        if condition.startswith('receivedDateTime ge '):
+            since = condition.split()[-1]
+            items = [message for message in items if message['receivedDateTime'] >= since]
+        
+        top, skip = int(query.get('$top', 10)), int(query.get('$skip', 0))
+        body = {'value': items[skip:skip + top]}
+        if skip + top < len(items):
+            next_query = dict(query, **{'$skip': str(skip + top)})
+            body['@odata.nextLink'] = f'{self.url}{path}?{urllib.parse.urlencode(next_query)}'
+        return body
+    
+    def batch(self, payload: dict) -> dict:
+        responses = []
+        for sub_request in payload['requests']:
+            failures = self.batch_failures.get(sub_request['url'])
+            if failures:
+                responses.append({'id': sub_request['id'], 'status': failures.pop(0), 'headers': {'Retry-After': '0'}})
+            else:
+                responses.append({'id': sub_request['id'], 'status': 200, 'body': {'url': sub_request['url']}})
+        return {'responses': responses}
+    
+    def _handler(self):
+        fake = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def _send(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                fake.requests.append(('POST', self.path))
+                if self.path.endswith('/oauth2/v2.0/token'):
+                    return self._send(200, {'access_token': 'token', 'expires_in': 3600})
+                if self.path.endswith('/$batch'):
+                    return self._send(200, fake.batch(json.loads(body)))
+                return self._send(404, {'error': {'code': 'NotFound'}})
+            
+            def do_GET(self):
+                fake.requests.append(('GET', self.path))
+                url = urllib.parse.urlsplit(self.path)
+                if url.path.endswith('/messages'):
+                    return self._send(200, fake.list_messages(url.path, dict(urllib.parse.parse_qsl(url.query))))
+                return self._send(404, {'error': {'code': 'NotFound'}})
+        
+        return Handler
@@ -0,0 +1,53 @@
+import json
+import pytest
+
+@pytest.fixture
+def client(app_context, app):
+    from models import Message, OutboxEvent, db
+    Message.query.filter_by(source='bulk').delete()
+    OutboxEvent.query.delete()
+    db.session.commit()
+    return app.test_client()
+
+def post_ndjson(client, items):
+    from config import Config
+    body = '\n'.join(json.dumps(item) for item in items)
+    return client.post('/api/log_messages', data=body, content_type='application/x-ndjson',
+                       headers={'X-Shortcut-Token': Config.IOS_SHORTCUT_TOKEN})
+
+def test_bulk_ingest_inserts_in_chunks_and_reports_each_item(client, monkeypatch):
+    from config import Config
+    from models import Message, OutboxEvent
+    from message_scanner import message_scanner
+    monkeypatch.setattr(Config, 'BULK_INGEST_CHUNK_SIZE', 3)
+    chunks = []
+    insert_ingested = message_scanner._insert_ingested
+    monkeypatch.setattr(message_scanner, '_insert_ingested',
+                        lambda pending: chunks.append(len(pending)) or insert_ingested(pending))
+    items = [{'message': f'Bulk message {index}', 'source': 'bulk'} for index in range(8)]
+    items[2] = {'source': 'bulk'}
+    
+    response = post_ndjson(client, items)
+    
+    body = response.get_json()
+    assert response.status_code == 200
+    assert (body['accepted'], body['rejected']) == (7, 1)
+    assert [result['index'] for result in body['results']] == list(range(8))
+    assert body['results'][2] == {'index': 2, 'success': False, 'error': 'Message content required'}
+    assert chunks == [3, 3, 1]
+    stored = {message.id for message in Message.query.filter_by(source='bulk')}
+    assert {result['message_id'] for result in body['results'] if result['success']} == stored
+    assert OutboxEvent.query.filter_by(kind='sheets_row').count() == 7
+
+def test_bulk_ingest_rejects_too_many_items_without_storing_any(client, monkeypatch):
+    from config import Config
+    from models import Message, OutboxEvent
+    monkeypatch.setattr(Config, 'BULK_INGEST_CHUNK_SIZE', 2)
+    monkeypatch.setattr(Config, 'BULK_INGEST_MAX_ITEMS', 5)
+    
+    response = post_ndjson(client, [{'message': f'Bulk message {index}', 'source': 'bulk'} for index in range(6)])
+    
+    assert response.status_code == 413
+    # Chunks inserted before the limit was reached are rolled back
+    assert Message.query.filter_by(source='bulk').count() == 0
+    assert OutboxEvent.query.count() == 0
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+import pytest
+
+WINDOW_START = datetime(2025, 3, 1)
+WINDOW_END = datetime(2025, 4, 1)
+
+@pytest.fixture
+def window_events(app_context):
+    from models import CalendarEvent, db
+    CalendarEvent.query.filter_by(facility='Window').delete()
+    spans = {
+        'inside': (datetime(2025, 3, 10, 9), datetime(2025, 3, 10, 10)),
+        'overlaps start': (datetime(2025, 2, 27), datetime(2025, 3, 2)),
+        'overlaps end': (datetime(2025, 3, 31, 23), datetime(2025, 4, 1, 1)),
+        'ends at start': (datetime(2025, 2, 28, 23), WINDOW_START),
+        'before': (datetime(2025, 2, 10), datetime(2025, 2, 11)),
+        'starts at end': (WINDOW_END, datetime(2025, 4, 1, 1)),
+        'longer than the lookback': (WINDOW_START - timedelta(days=20), datetime(2025, 3, 5)),
+    }
+    db.session.add_all([CalendarEvent(title=title, start_time=start, end_time=end, facility='Window')
+                        for title, (start, end) in spans.items()])
+    db.session.commit()
+    yield
+    CalendarEvent.query.filter_by(facility='Window').delete()
+    db.session.commit()
+
+def test_events_in_window_include_events_started_before_it(window_events):
+    from routes import _events_in_window
+    
+    events = _events_in_window(WINDOW_START, WINDOW_END, 'Window').all()
+    
+    # Only events longer than CALENDAR_MAX_EVENT_DAYS that started earlier are missed
+    assert [event.title for event in events] == ['overlaps start', 'inside', 'overlaps end']
+
+def test_calendar_feed_serves_the_window(app, window_events):
+    response = app.test_client().get('/api/calendar/events?start=2025-03-01T00:00:00&end=2025-04-01T00:00:00&facility=Window')
+    
+    assert [event['title'] for event in response.get_json()] == ['overlaps start', 'inside', 'overlaps end']
+    too_wide = app.test_client().get('/api/calendar/events?start=2025-01-01T00:00:00&end=2025-04-01T00:00:00')
+    assert too_wide.status_code == 400
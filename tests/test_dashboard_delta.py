@@ -0,0 +1,49 @@
+import time
+from datetime import datetime, timedelta
+
+def get_delta(client, etag=None, since=None):
+    headers = {'If-None-Match': f'"{etag}"'} if etag else {}
+    return client.get('/api/dashboard/delta', query_string={'since': since} if since else {}, headers=headers)
+
+def test_unchanged_dashboard_answers_304(app):
+    client = app.test_client()
+    first = get_delta(client)
+    etag = first.headers['ETag'].strip('"')
+    
+    assert first.status_code == 200
+    assert get_delta(client, etag).status_code == 304
+    assert get_delta(client, etag).headers['ETag'].strip('"') == etag
+
+def test_etag_changes_when_a_task_changes(app, app_context):
+    from models import Task, db
+    client = app.test_client()
+    etag = get_delta(client).headers['ETag'].strip('"')
+    
+    db.session.add(Task(title='Restock gloves', facility='Clinic A'))
+    db.session.commit()
+    
+    assert get_delta(client, etag).status_code == 200
+
+def test_etag_changes_when_the_next_event_starts(app, app_context):
+    from models import CalendarEvent, db
+    client = app.test_client()
+    start = datetime.now() + timedelta(seconds=1)
+    db.session.add(CalendarEvent(title='Huddle', start_time=start, end_time=start + timedelta(minutes=15)))
+    db.session.commit()
+    etag = get_delta(client).headers['ETag'].strip('"')
+    
+    assert get_delta(client, etag).status_code == 304
+    time.sleep(max((start - datetime.now()).total_seconds(), 0) + 0.1)
+    assert get_delta(client, etag).status_code == 200
+
+def test_status_update_shows_up_in_the_next_delta(app, app_context):
+    from models import Task, db
+    task = Task(title='Strip floor 3B', facility='Clinic B')
+    db.session.add(task)
+    db.session.commit()
+    since = datetime.utcnow().isoformat()
+    
+    app.test_client().post('/update_task_status', data={'task_id': task.id, 'status': 'In Progress'})
+    
+    delta = get_delta(app.test_client(), since=since).get_json()
+    assert [item['status'] for item in delta['tasks'] if item['id'] == task.id] == ['In Progress']
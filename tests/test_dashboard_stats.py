@@ -0,0 +1,55 @@
+from sqlalchemy import func, insert, select
+
+def actual_counts():
+    from models import db
+    from dashboard_stats import COUNTERS
+    return {
+        name: db.session.execute(select(func.count()).select_from(model).where(condition())).scalar()
+        for name, (model, _, _, condition) in COUNTERS.items()
+    }
+
+def maintained_counts():
+    from dashboard_stats import COUNTERS, get_dashboard_stats
+    stats = get_dashboard_stats()
+    return {name: stats[name] for name in COUNTERS}
+
+def test_counters_follow_orm_changes(app_context):
+    from models import Message, Task, db
+    tasks = [Task(title=f'Counter task {index}', facility='Test') for index in range(3)]
+    message = Message(sender='counter', content='Urgent spill', source='text', priority='High', processed=False)
+    db.session.add_all(tasks + [message])
+    db.session.commit()
+    assert maintained_counts() == actual_counts()
+    
+    tasks[0].status = 'Completed'
+    message.processed = True
+    db.session.delete(tasks[1])
+    db.session.commit()
+    
+    assert maintained_counts() == actual_counts()
+
+def test_counters_follow_bulk_statements(app_context):
+    from models import Message, Task, db
+    db.session.execute(insert(Message), [
+        {'sender': 'counter', 'content': f'Bulk urgent {index}', 'source': 'bulk-counter', 'priority': 'High'}
+        for index in range(4)
+    ])
+    db.session.execute(insert(Task), [{'title': f'Bulk task {index}', 'facility': 'Bulk'} for index in range(2)])
+    db.session.commit()
+    assert maintained_counts() == actual_counts()
+    
+    Task.query.filter_by(facility='Bulk').update({Task.status: 'Completed'}, synchronize_session=False)
+    Message.query.filter_by(source='bulk-counter').delete(synchronize_session=False)
+    db.session.commit()
+    
+    assert maintained_counts() == actual_counts()
+
+def test_reconcile_repairs_drift(app_context):
+    from models import DashboardStat, db
+    from dashboard_stats import reconcile_counters
+    DashboardStat.query.filter_by(name='total_tasks').update({DashboardStat.value: -5})
+    db.session.commit()
+    
+    reconcile_counters()
+    
+    assert maintained_counts() == actual_counts()
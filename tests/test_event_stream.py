@@ -0,0 +1,56 @@
+import pytest
+
+@pytest.fixture
+def subscription(app_context):
+    from event_stream import event_broker
+    subscription = event_broker.subscribe()
+    yield subscription
+    event_broker.unsubscribe(subscription)
+
+def received(subscription):
+    events = []
+    while True:
+        message = subscription.get(timeout=0)
+        if message is None:
+            return events
+        events.append(message.split('\n')[1])
+
+def failing_savepoint(db):
+    from models import Announcement
+    try:
+        with db.session.begin_nested():
+            db.session.add(Announcement(title=None, content='missing title'))
+            db.session.flush()
+    except Exception:
+        pass
+
+def test_events_wait_for_the_outermost_commit(subscription):
+    from event_stream import publish_on_commit
+    from models import Announcement, db
+    publish_on_commit('task_status', {'id': 1})
+    with db.session.begin_nested():
+        db.session.add(Announcement(title='Savepoint', content='released'))
+    
+    assert received(subscription) == []
+    db.session.commit()
+    assert received(subscription) == ['event: task_status']
+
+def test_savepoint_rollback_keeps_pending_events(subscription):
+    from event_stream import publish_on_commit
+    from models import db
+    publish_on_commit('task_status', {'id': 1})
+    failing_savepoint(db)
+    db.session.commit()
+    
+    assert received(subscription) == ['event: task_status']
+
+def test_rollback_drops_pending_events(subscription):
+    from event_stream import publish_on_commit
+    from models import Announcement, db
+    db.session.add(Announcement(title='Rolled back', content='never committed'))
+    db.session.flush()
+    publish_on_commit('task_status', {'id': 1})
+    db.session.rollback()
+    db.session.commit()
+    
+    assert received(subscription) == []
@@ -0,0 +1,86 @@
+from datetime import datetime
+import pytest
+
+@pytest.fixture
+def versions(app_context):
+    from fragment_cache import get_table_versions
+    return lambda *tables: get_table_versions(list(tables))
+
+def add_announcement(db, title='Floor closed'):
+    from models import Announcement
+    db.session.add(Announcement(title=title, content='Use the east stairs'))
+
+def test_commit_bumps_the_versions_of_written_tables(versions):
+    from models import db
+    before = versions('announcement', 'task')
+    
+    add_announcement(db)
+    db.session.commit()
+    
+    assert versions('announcement', 'task') == [before[0] + 1, before[1]]
+
+def test_orm_bulk_statements_bump_versions(versions):
+    from sqlalchemy import insert
+    from models import Message, db
+    before = versions('message')[0]
+    
+    db.session.execute(insert(Message), [{'sender': 'ops', 'content': 'bulk', 'source': 'text', 'priority': 'Low'}])
+    db.session.commit()
+    
+    assert versions('message')[0] == before + 1
+
+def test_rollback_bumps_nothing(versions):
+    from models import db
+    before = versions('announcement')
+    
+    add_announcement(db)
+    db.session.flush()
+    db.session.rollback()
+    
+    assert versions('announcement') == before
+
+def test_bookkeeping_tables_have_no_version(versions):
+    from models import SyncState, db
+    db.session.add(SyncState(name=f'test:{datetime.utcnow().timestamp()}'))
+    db.session.commit()
+    
+    assert versions('sync_state', 'table_version') == [0, 0]
+
+def test_fragments_are_invalidated_in_every_worker(versions):
+    from fragment_cache import FragmentCache, MemoryCacheStore
+    from models import db
+    # Each worker process has its own in-process store
+    workers = [FragmentCache(MemoryCacheStore(16)) for _ in range(2)]
+    renders = []
+    
+    def render():
+        renders.append(1)
+        return f'<p>{len(renders)}</p>', None
+    
+    for worker in workers:
+        worker.get_or_render('announcements', ['announcement'], render)
+        worker.get_or_render('announcements', ['announcement'], render)
+    assert len(renders) == 2
+    
+    add_announcement(db)
+    db.session.commit()
+    
+    for worker in workers:
+        worker.get_or_render('announcements', ['announcement'], render)
+    assert len(renders) == 4
+
+def test_savepoint_rollback_keeps_the_outer_transactions_tables(versions):
+    from models import Task, db
+    before = versions('announcement')
+    
+    add_announcement(db)
+    db.session.flush()
+    try:
+        with db.session.begin_nested():
+            db.session.add(Task(title=None))
+            db.session.flush()
+    except Exception:
+        pass
+    db.session.commit()
+    
+    assert versions('announcement') == [before[0] + 1]
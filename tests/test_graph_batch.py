@@ -0,0 +1,19 @@
+def test_batch_get_retries_throttled_and_failed_reads(app, fake_graph):
+    from microsoft_services import graph_service
+    urls = [f'/users/me/messages/AAMk-{index}' for index in range(25)]
+    fake_graph.batch_failures[urls[3]] = [429]
+    fake_graph.batch_failures[urls[21]] = [503, 429]
+    
+    bodies = graph_service._batch_get(urls)
+    
+    assert bodies == [{'url': url} for url in urls]
+    # Two $batch calls for 25 reads, then one retry round per failure left
+    assert len([path for method, path in fake_graph.requests if path.endswith('/$batch')]) == 4
+
+def test_batch_get_gives_up_after_max_retries(app, fake_graph):
+    from config import Config
+    from microsoft_services import graph_service
+    urls = ['/users/me/messages/AAMk-0', '/users/me/messages/AAMk-1']
+    fake_graph.batch_failures[urls[1]] = [429] * (Config.GRAPH_MAX_RETRIES + 1)
+    
+    assert graph_service._batch_get(urls) == [{'url': urls[0]}, None]
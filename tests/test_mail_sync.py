@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+from urllib.parse import unquote_plus
+import pytest
+
+# Inside the first-run lookback, so an empty watermark still picks everything up
+BASE_RECEIVED = datetime.utcnow().replace(microsecond=0) - timedelta(hours=1)
+
+def received(offset_seconds: int) -> str:
+    return (BASE_RECEIVED + timedelta(seconds=offset_seconds)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def add_mail(fake_graph, count: int, start: int = 0):
+    # Two messages per second, so page boundaries fall between equal timestamps
+    for index in range(start, start + count):
+        fake_graph.mailbox.append({
+            'id': f'AAMk-{index}',
+            'receivedDateTime': received(index // 2),
+            'bodyPreview': f'Routine update {index}',
+            'from': {'emailAddress': {'address': 'sender@example.com'}}
+        })
+
+@pytest.fixture
+def clean_mail(app_context):
+    from models import Message, OutboxEvent, SyncState, db
+    from message_scanner import MAIL_SYNC_STATE
+    Message.query.filter_by(source='email').delete()
+    # SQLite reuses deleted message ids, which key the outbox events
+    OutboxEvent.query.delete()
+    SyncState.query.filter_by(name=MAIL_SYNC_STATE).delete()
+    db.session.commit()
+
+def test_iter_emails_since_streams_every_page_oldest_first(app, fake_graph):
+    from microsoft_services import graph_service
+    add_mail(fake_graph, 120)
+    
+    emails = list(graph_service.iter_emails_since(received(0), page_size=50))
+    
+    assert [email['id'] for email in emails] == [f'AAMk-{index}' for index in range(120)]
+    message_pages = [path for method, path in fake_graph.requests if path.startswith('/v1.0/users/me/messages')]
+    assert len(message_pages) == 3
+
+def test_iter_emails_since_includes_messages_at_the_watermark(app, fake_graph):
+    from microsoft_services import graph_service
+    add_mail(fake_graph, 10)
+    
+    emails = list(graph_service.iter_emails_since(received(2), page_size=50))
+    
+    assert [email['id'] for email in emails] == [f'AAMk-{index}' for index in range(4, 10)]
+
+def test_iter_emails_since_is_lazy(app, fake_graph):
+    from microsoft_services import graph_service
+    add_mail(fake_graph, 120)
+    
+    emails = graph_service.iter_emails_since(received(0), page_size=50)
+    first = next(emails)
+    
+    assert first['id'] == 'AAMk-0'
+    assert len([path for method, path in fake_graph.requests if method == 'GET']) == 1
+
+def test_scan_stores_each_message_once_and_advances_the_watermark(app, fake_graph, clean_mail):
+    from models import Message, SyncState
+    from message_scanner import MAIL_SYNC_STATE, message_scanner
+    add_mail(fake_graph, 120)
+    
+    first = message_scanner.scan_incoming_messages()
+    
+    assert len(first) == 120
+    assert Message.query.filter_by(source='email').count() == 120
+    assert SyncState.query.filter_by(name=MAIL_SYNC_STATE).one().cursor == received(119 // 2)
+    
+    # Nothing new: the message at the watermark is fetched again but not stored twice
+    assert message_scanner.scan_incoming_messages() == []
+    assert Message.query.filter_by(source='email').count() == 120
+    
+    add_mail(fake_graph, 30, start=120)
+    fake_graph.requests.clear()
+    third = message_scanner.scan_incoming_messages()
+    
+    new_ids = Message.query.filter(Message.external_id.in_([f'AAMk-{index}' for index in range(120, 150)]))
+    assert sorted(result['message_id'] for result in third) == sorted(message.id for message in new_ids)
+    assert Message.query.filter_by(source='email').count() == 150
+    assert SyncState.query.filter_by(name=MAIL_SYNC_STATE).one().cursor == received(149 // 2)
+    # Resumed from the watermark rather than re-reading the whole mailbox
+    watermark_query = [path for method, path in fake_graph.requests if 'receivedDateTime' in path]
+    assert watermark_query and all(received(119 // 2) in unquote_plus(path) for path in watermark_query)
+
+def test_scan_backfills_messages_stored_without_an_external_id(app, fake_graph, clean_mail):
+    from models import Message, db
+    from message_scanner import message_scanner
+    add_mail(fake_graph, 4)
+    # Stored by the content-deduplicating scanner before the upgrade
+    db.session.add(Message(sender='sender@example.com', content='Routine update 1', source='email'))
+    db.session.commit()
+    
+    results = message_scanner.scan_incoming_messages()
+    
+    assert len(results) == 3
+    assert Message.query.filter_by(source='email').count() == 4
+    assert Message.query.filter_by(content='Routine update 1').one().external_id == 'AAMk-1'
+
+def test_graph_latency_reports_calls_made(app, fake_graph):
+    from microsoft_services import graph_service
+    add_mail(fake_graph, 10)
+    list(graph_service.iter_emails_since(received(0)))
+    
+    stats = app.test_client().get('/api/graph/latency').get_json()
+    
+    assert stats['GET']['calls'] >= 1
+    assert stats['GET']['failures'] == 0
+    assert stats['GET']['max_ms'] >= stats['GET']['avg_ms']
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+from sqlalchemy import create_engine, inspect, text
+
+def legacy_database(tmp_path, metadata):
+    """A database from before message.external_id was added"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text('DROP INDEX ix_message_source_external_id'))
+        connection.execute(text('ALTER TABLE message DROP COLUMN external_id'))
+    return SimpleNamespace(engine=engine, metadata=metadata)
+
+def test_upgrade_schema_adds_columns_and_indexes(app, tmp_path):
+    from models import db
+    from migrations import upgrade_schema
+    legacy = legacy_database(tmp_path, db.metadata)
+    
+    upgrade_schema(legacy)
+    
+    inspector = inspect(legacy.engine)
+    assert 'external_id' in {column['name'] for column in inspector.get_columns('message')}
+    assert 'ix_message_source_external_id' in {index['name'] for index in inspector.get_indexes('message')}
+
+def test_upgrade_schema_tolerates_a_concurrent_upgrade(app, tmp_path, monkeypatch):
+    import migrations
+    from models import db
+    legacy = legacy_database(tmp_path, db.metadata)
+    # A worker that inspected the schema just before another worker upgraded it
+    stale = inspect(legacy.engine)
+    table = db.metadata.tables['message']
+    stale.get_columns(table.name)
+    stale.get_indexes(table.name)
+    migrations.upgrade_schema(legacy)
+    monkeypatch.setattr(migrations, 'inspect', lambda engine: stale)
+    
+    migrations.upgrade_schema(legacy)
+    
+    assert 'external_id' in {column['name'] for column in inspect(legacy.engine).get_columns('message')}
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+def test_purge_delivered_removes_only_old_delivered_events(app_context):
+    from models import OutboxEvent, db
+    from outbox import purge_delivered
+    OutboxEvent.query.delete()
+    now = datetime.utcnow()
+    old = now - timedelta(days=30)
+    events = {
+        'old_done': [OutboxEvent(kind='email', payload='{}', status='done', processed_at=old) for _ in range(5)],
+        'recent_done': [OutboxEvent(kind='email', payload='{}', status='done', processed_at=now)],
+        'old_failed': [OutboxEvent(kind='email', payload='{}', status='failed', processed_at=old)],
+        'pending': [OutboxEvent(kind='email', payload='{}', status='pending')],
+    }
+    db.session.add_all([event for group in events.values() for event in group])
+    db.session.commit()
+    kept = sorted(event.id for name, group in events.items() if name != 'old_done' for event in group)
+    
+    assert purge_delivered(retention_days=7, batch_size=2) == 5
+    assert sorted(event_id for (event_id,) in db.session.query(OutboxEvent.id)) == kept
+    assert purge_delivered(retention_days=7, batch_size=2) == 0
+
+def test_sheets_rows_are_held_back_and_written_per_worksheet(app_context, monkeypatch):
+    import google_services
+    from models import OutboxEvent, db
+    from outbox import OutboxWorker, enqueue, enqueue_many
+    OutboxEvent.query.delete()
+    written = []
+    monkeypatch.setattr(google_services, 'sheets_service',
+                        type('Sheets', (), {'write_rows': lambda self, title, rows: written.append((title, rows))})())
+    enqueue_many('sheets_row', [({'worksheet': 'Messages', 'row': [index]}, None) for index in range(3)])
+    enqueue('sheets_row', {'worksheet': 'Tasks', 'row': ['task']})
+    db.session.commit()
+    worker = OutboxWorker(None, workers=0)
+    
+    # Still inside the flush delay
+    assert worker.drain_once() == 0
+    
+    OutboxEvent.query.update({OutboxEvent.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    assert worker.drain_once() == 4
+    assert sorted(written) == [('Messages', [[0], [1], [2]]), ('Tasks', [['task']])]
+    assert OutboxEvent.query.filter_by(status='done').count() == 4
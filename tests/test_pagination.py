@@ -0,0 +1,78 @@
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+
+@pytest.fixture
+def tied_messages(app_context):
+    from models import Message, db
+    Message.query.filter_by(source='keyset').delete()
+    # Two timestamps, each shared by several rows, so pages split inside a tie
+    created = [datetime(2025, 1, 1, 8, 0), datetime(2025, 1, 1, 9, 0)]
+    messages = [Message(sender='keyset', content=f'Keyset {index}', source='keyset', created_at=created[index % 2])
+                for index in range(8)]
+    db.session.add_all(messages)
+    db.session.commit()
+    return sorted(messages, key=lambda message: (message.created_at, message.id), reverse=True)
+
+def keyset_query():
+    from models import Message
+    return Message.query.filter_by(source='keyset')
+
+def test_after_cursors_walk_tied_rows_once_each(tied_messages):
+    from models import Message
+    from pagination import keyset_paginate
+    pages, cursor = [], None
+    while True:
+        page = keyset_paginate(keyset_query(), Message, 3, after=cursor)
+        pages.append([message.id for message in page])
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+    
+    assert pages == [[message.id for message in tied_messages[start:start + 3]] for start in (0, 3, 6)]
+
+def test_before_cursors_walk_back_to_the_same_pages(tied_messages):
+    from models import Message
+    from pagination import keyset_paginate
+    first = keyset_paginate(keyset_query(), Message, 3)
+    second = keyset_paginate(keyset_query(), Message, 3, after=first.next_cursor)
+    third = keyset_paginate(keyset_query(), Message, 3, after=second.next_cursor)
+    
+    back = keyset_paginate(keyset_query(), Message, 3, before=third.prev_cursor)
+    
+    assert [message.id for message in back] == [message.id for message in second]
+    assert back.has_next and back.has_prev
+    # Fewer than a page of newer rows: the newest full page instead of a short one
+    newest = keyset_paginate(keyset_query(), Message, 3, before=back.prev_cursor)
+    assert [message.id for message in newest] == [message.id for message in first]
+    assert not newest.has_prev
+
+class CountingQuery:
+    def __init__(self, value):
+        self.value = value
+        self.counts = 0
+    
+    def order_by(self, *args):
+        return self
+    
+    def count(self):
+        self.counts += 1
+        return self.value
+
+def test_count_cache_reuses_totals_until_the_ttl_expires(monkeypatch):
+    import pagination
+    now = [1000.0]
+    monkeypatch.setattr(pagination, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    cache = pagination.CountCache(ttl_seconds=60)
+    query = CountingQuery(5)
+    
+    assert cache.count(('messages',), query) == 5
+    query.value = 6
+    now[0] += 59
+    assert cache.count(('messages',), query) == 5
+    now[0] += 2
+    assert cache.count(('messages',), query) == 6
+    assert query.counts == 2
+    # Each key is counted separately
+    assert cache.count(('messages', 'High'), query) == 6
+    assert query.counts == 3
@@ -0,0 +1,86 @@
+import threading
+from test_mail_sync import add_mail, clean_mail, received
+
+def test_pipeline_passes_items_through_every_stage(app):
+    from pipeline import Pipeline, Stage
+    stored = []
+    lock = threading.Lock()
+    def store(item):
+        with lock:
+            stored.append(item)
+        return item
+    pipeline = Pipeline(app, 'source', [
+        Stage('double', lambda item: item * 2, workers=3, queue_size=1),
+        Stage('store', store, workers=2, queue_size=1)
+    ])
+    
+    pipeline.run(range(100))
+    
+    assert sorted(stored) == [item * 2 for item in range(100)]
+    metrics = pipeline.metrics()
+    assert [metrics[name]['items'] for name in ('source', 'double', 'store')] == [100, 100, 100]
+    assert metrics['double']['queue_size'] == 1
+
+def test_pipeline_drops_items_whose_handler_raises(app):
+    from pipeline import Pipeline, Stage
+    stored = []
+    def check(item):
+        if item % 10 == 0:
+            raise ValueError(f'bad item {item}')
+        return item
+    pipeline = Pipeline(app, 'source', [Stage('check', check), Stage('store', stored.append)])
+    
+    pipeline.run(range(30))
+    
+    assert stored == [item for item in range(30) if item % 10]
+    assert pipeline.metrics()['check']['errors'] == 3
+
+def test_ordered_completion_waits_for_earlier_items():
+    from pipeline import OrderedCompletion
+    completion = OrderedCompletion()
+    
+    assert completion.would_reach(1, 'b') is None
+    completion.done(1, 'b')
+    completion.done(2, None)
+    assert completion.latest is None
+    
+    assert completion.would_reach(0, 'a') == 'b'
+    completion.done(0, 'a')
+    assert completion.latest == 'b'
+
+def test_scan_classifies_each_message_once(app, fake_graph, clean_mail, monkeypatch):
+    from message_scanner import message_scanner
+    add_mail(fake_graph, 60)
+    calls = []
+    classify = message_scanner.classify
+    monkeypatch.setattr(message_scanner, 'classify', lambda content: calls.append(content) or classify(content))
+    
+    message_scanner.scan_incoming_messages()
+    
+    assert len(calls) == 60
+
+def test_watermark_stays_before_a_page_that_failed_to_classify(app, fake_graph, clean_mail, monkeypatch):
+    from config import Config
+    from models import Message, SyncState
+    from message_scanner import MAIL_SYNC_STATE, message_scanner
+    monkeypatch.setattr(Config, 'MAIL_SYNC_PAGE_SIZE', 50)
+    add_mail(fake_graph, 120)
+    classify = message_scanner.classify
+    def failing_classify(content):
+        if content == 'Routine update 60':
+            raise RuntimeError('classifier crashed')
+        return classify(content)
+    monkeypatch.setattr(message_scanner, 'classify', failing_classify)
+    
+    message_scanner.scan_incoming_messages()
+    
+    # The second page was dropped; the third was stored, but the watermark waits for the second
+    stored_ids = {message.external_id for message in Message.query.filter_by(source='email')}
+    assert stored_ids == {f'AAMk-{index}' for index in list(range(50)) + list(range(100, 120))}
+    assert SyncState.query.filter_by(name=MAIL_SYNC_STATE).one().cursor == received(49 // 2)
+    
+    monkeypatch.setattr(message_scanner, 'classify', classify)
+    message_scanner.scan_incoming_messages()
+    
+    assert Message.query.filter_by(source='email').count() == 120
+    assert SyncState.query.filter_by(name=MAIL_SYNC_STATE).one().cursor == received(119 // 2)
@@ -0,0 +1,140 @@
+"""EXPLAIN QUERY PLAN checks for the hot queries on a seeded SQLite database
+
+The database holds a million messages and proportionate other tables, with
+ANALYZE statistics, so SQLite's planner makes the choices it would in
+production. Every query must be an index SEARCH or an index-ordered SCAN;
+a plain table SCAN fails the test.
+"""
+import random
+import sqlite3
+from datetime import datetime, timedelta
+import pytest
+
+MESSAGES = 1_000_000
+TASKS = 300_000
+EVENTS = 100_000
+REMINDERS = 100_000
+ANNOUNCEMENTS = 50_000
+OUTBOX_EVENTS = 200_000
+STAFF_ASSIGNMENTS = 50_000
+
+def _timestamps(count: int, now: datetime, step_seconds: int = 30):
+    """count timestamps step_seconds apart, ending at now"""
+    return [(now - timedelta(seconds=(count - index) * step_seconds)).isoformat(' ') for index in range(count)]
+
+def seed(path: str):
+    from models import db
+    from sqlalchemy import create_engine
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    engine.dispose()
+    
+    rng = random.Random(17)
+    now = datetime.utcnow()
+    connection = sqlite3.connect(path)
+    connection.executemany(
+        'INSERT INTO message (sender, content, source, priority, processed, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+        ((f'sender{index % 500}', f'content {index}', rng.choice(['text', 'email', 'teams', 'notes']),
+          rng.choice(['High', 'Medium', 'Low', 'Low']), index % 2, created_at)
+         for index, created_at in enumerate(_timestamps(MESSAGES, now)))
+    )
+    connection.executemany(
+        'INSERT INTO task (title, facility, priority, status, created_at, updated_at, message_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ((f'task {index}', f'Facility {index % 20}', 'High',
+          rng.choice(['Completed'] * 8 + ['Not Started', 'In Progress']), created_at, created_at, index * 3)
+         for index, created_at in enumerate(_timestamps(TASKS, now)))
+    )
+    connection.executemany(
+        'INSERT INTO calendar_event (title, start_time, end_time, created_at, message_id) VALUES (?, ?, ?, ?, ?)',
+        ((f'event {index}', (now + timedelta(hours=index - EVENTS + 200)).isoformat(' '),
+          (now + timedelta(hours=index - EVENTS + 201)).isoformat(' '), created_at, index)
+         for index, created_at in enumerate(_timestamps(EVENTS, now)))
+    )
+    connection.executemany(
+        'INSERT INTO reminder (task_id, reminder_text, next_reminder, acknowledged, reminder_count) VALUES (?, ?, ?, ?, 0)',
+        ((index, 'reminder', (now + timedelta(minutes=index - REMINDERS)).isoformat(' '), int(index < REMINDERS - 1000))
+         for index in range(REMINDERS))
+    )
+    connection.executemany(
+        "INSERT INTO announcement (title, content, active, created_at) VALUES ('title', 'content', ?, ?)",
+        ((index % 10 == 0, created_at) for index, created_at in enumerate(_timestamps(ANNOUNCEMENTS, now)))
+    )
+    connection.executemany(
+        "INSERT INTO outbox_event (kind, payload, status, attempts, next_attempt_at, created_at, processed_at)"
+        " VALUES ('sheets_row', '{}', ?, 1, ?, ?, ?)",
+        (('done', created_at, created_at, created_at) if index < OUTBOX_EVENTS - 1000 else ('pending', created_at, created_at, None)
+         for index, created_at in enumerate(_timestamps(OUTBOX_EVENTS, now)))
+    )
+    connection.executemany(
+        "INSERT INTO staff_assignment (staff_id, facility, assignment_date) VALUES (1, 'Clinic A', ?)",
+        ((assigned,) for assigned in _timestamps(STAFF_ASSIGNMENTS, now))
+    )
+    connection.commit()
+    connection.execute('ANALYZE')
+    connection.commit()
+    return connection
+
+def hot_queries():
+    """(name, statement) for every query on a request path or in a frequent job"""
+    from sqlalchemy import func, or_, select
+    from models import Announcement, CalendarEvent, Message, OutboxEvent, Reminder, StaffAssignment, Task, db
+    now = datetime.now()
+    utcnow = datetime.utcnow()
+    lower = utcnow - timedelta(minutes=5)
+    available = or_(OutboxEvent.locked_until.is_(None), OutboxEvent.locked_until < utcnow)
+    
+    queries = {
+        'dashboard messages': Message.query.filter_by(priority='High').order_by(Message.created_at.desc()).limit(5),
+        'dashboard tasks': Task.query.filter(Task.status.in_(['Not Started', 'In Progress'])).order_by(Task.created_at.desc()).limit(10),
+        'dashboard events': CalendarEvent.query.filter(CalendarEvent.start_time >= now).order_by(CalendarEvent.start_time).limit(5),
+        'dashboard announcements': Announcement.query.filter_by(active=True).order_by(Announcement.created_at.desc()).limit(3),
+        'dashboard reminders': Reminder.query.filter_by(acknowledged=False).order_by(Reminder.next_reminder).limit(5),
+        'upcoming event count': db.session.query(func.count()).select_from(CalendarEvent).filter(CalendarEvent.start_time >= now),
+        'etag next event': db.session.query(func.min(CalendarEvent.start_time)).filter(CalendarEvent.start_time >= now),
+        'delta messages': Message.query.filter(Message.priority == 'High', Message.created_at > lower).order_by(Message.created_at.desc()).limit(20),
+        'delta tasks': Task.query.filter(Task.updated_at > lower).order_by(Task.updated_at.desc()).limit(20),
+        'delta events': CalendarEvent.query.filter(CalendarEvent.created_at > lower, CalendarEvent.start_time >= now).order_by(CalendarEvent.start_time).limit(20),
+        'messages page': Message.query.order_by(Message.created_at.desc(), Message.id.desc()).limit(20),
+        'messages by priority': Message.query.filter_by(priority='Medium').order_by(Message.created_at.desc(), Message.id.desc()).limit(20),
+        'messages by source': Message.query.filter_by(source='teams').order_by(Message.created_at.desc(), Message.id.desc()).limit(20),
+        'messages by priority and source': Message.query.filter_by(priority='High', source='teams').order_by(Message.created_at.desc()).limit(20),
+        'tasks by status': Task.query.filter_by(status='In Progress').order_by(Task.created_at.desc(), Task.id.desc()).limit(50),
+        'tasks by facility': Task.query.filter_by(facility='Facility 3').order_by(Task.created_at.desc(), Task.id.desc()).limit(50),
+        'tasks page': Task.query.order_by(Task.created_at.desc(), Task.id.desc()).limit(50),
+        'reminder resync': select(Reminder.id, Reminder.next_reminder).where(
+            Reminder.acknowledged == False, Reminder.next_reminder < now + timedelta(minutes=2)
+        ),
+        'due reminders': select(Reminder.id).where(Reminder.acknowledged == False, Reminder.next_reminder <= now).order_by(Reminder.next_reminder).limit(500),
+        'outbox claim': db.session.query(OutboxEvent.id).filter(
+            OutboxEvent.status == 'pending', OutboxEvent.next_attempt_at <= utcnow, available
+        ).order_by(OutboxEvent.id).limit(50),
+        'outbox re-read': OutboxEvent.query.filter(OutboxEvent.id.in_([1, 2, 3]), OutboxEvent.locked_by == 'token').order_by(OutboxEvent.id),
+        'outbox purge': select(OutboxEvent.id).where(
+            OutboxEvent.status == 'done', OutboxEvent.processed_at < utcnow - timedelta(days=7)
+        ).order_by(OutboxEvent.id).limit(1000),
+        'task by message': Task.query.filter_by(message_id=5).limit(1),
+        'event by message': CalendarEvent.query.filter_by(message_id=5).limit(1),
+        'email dedup': db.session.query(Message.external_id).filter(Message.source == 'email', Message.external_id.in_(['a', 'b'])),
+        'staff assignments': StaffAssignment.query.order_by(StaffAssignment.assignment_date.desc()).limit(10),
+    }
+    return [(name, getattr(query, 'statement', query)) for name, query in queries.items()]
+
+@pytest.fixture(scope='module')
+def seeded(app, tmp_path_factory):
+    connection = seed(str(tmp_path_factory.mktemp('query_plans') / 'seeded.db'))
+    with app.app_context():
+        yield connection, hot_queries()
+    connection.close()
+
+def test_hot_queries_use_indexes(seeded):
+    from sqlalchemy.dialects import sqlite
+    connection, queries = seeded
+    full_scans = {}
+    for name, statement in queries:
+        sql = str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}))
+        plan = [row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {sql}')]
+        scans = [step for step in plan if step.startswith('SCAN') and 'INDEX' not in step]
+        if scans:
+            full_scans[name] = plan
+    
+    assert not full_scans
@@ -0,0 +1,69 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+
+@pytest.fixture
+def timer(app):
+    from reminder_timer import ReminderTimer
+    fired = threading.Event()
+    timer = ReminderTimer()
+    timer.start(fired.set)
+    timer.fired = fired
+    yield timer
+    timer.stop()
+
+def test_load_keeps_reminders_scheduled_after_the_read(timer):
+    later = datetime.now() + timedelta(hours=2)
+    read_at = time.monotonic()
+    # Committed and scheduled while the resync query was running
+    timer.schedule(1, later)
+    
+    timer.load([(1, datetime.now() + timedelta(hours=1))], read_at)
+    
+    assert timer.next_due == later
+
+def test_load_keeps_reminders_cancelled_after_the_read(timer):
+    read_at = time.monotonic()
+    timer.cancel(1)
+    
+    timer.load([(1, datetime.now() + timedelta(hours=1))], read_at)
+    
+    assert timer.next_due is None
+
+def test_load_merges_instead_of_replacing(timer):
+    soon, later = datetime.now() + timedelta(hours=1), datetime.now() + timedelta(hours=2)
+    timer.schedule(1, later)
+    
+    timer.load([(2, soon)], time.monotonic())
+    assert timer.next_due == soon
+    
+    # Rows read after a local change take precedence
+    timer.load([(1, soon - timedelta(minutes=30))], time.monotonic())
+    assert timer.next_due == soon - timedelta(minutes=30)
+
+def test_loaded_reminder_wakes_the_timer(timer):
+    timer.load([(1, datetime.now() + timedelta(milliseconds=50))], time.monotonic())
+    
+    assert timer.fired.wait(timeout=2)
+    assert timer.next_due is None
+
+def test_stopped_timer_records_nothing(app):
+    from reminder_timer import ReminderTimer
+    # As in every worker that doesn't hold the scheduler lease
+    timer = ReminderTimer()
+    
+    timer.schedule(1, datetime.now() + timedelta(hours=1))
+    timer.cancel(2)
+    
+    assert timer.next_due is None
+    assert timer._changed_at == {}
+
+def test_stop_drops_pending_reminders(timer):
+    timer.schedule(1, datetime.now() + timedelta(hours=1))
+    timer.cancel(2)
+    
+    timer.stop()
+    
+    assert timer.next_due is None
+    assert timer._changed_at == {}
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Far enough ahead that the app's own reminder timer never fires these
+FIRE_AT = datetime.now().replace(microsecond=0) + timedelta(days=30)
+
+@pytest.fixture
+def reminders(app_context):
+    from models import Reminder, db
+    Reminder.query.delete()
+    due = [Reminder(reminder_text=f'Due {index}', next_reminder=FIRE_AT - timedelta(minutes=index)) for index in range(5)]
+    db.session.add_all(due + [
+        Reminder(reminder_text='Acknowledged', next_reminder=FIRE_AT - timedelta(hours=1), acknowledged=True),
+        Reminder(reminder_text='Not due yet', next_reminder=FIRE_AT + timedelta(minutes=1)),
+    ])
+    db.session.commit()
+    yield due
+    Reminder.query.delete()
+    db.session.commit()
+
+@pytest.fixture
+def commits(app_context):
+    from models import db
+    # Only this test's session; the app's scheduler threads commit too
+    test_session = db.session()
+    counted = []
+    def count(session):
+        if session is test_session and not session.in_nested_transaction():
+            counted.append(1)
+    event.listen(Session, 'after_commit', count)
+    yield counted
+    event.remove(Session, 'after_commit', count)
+
+def test_due_reminders_fire_in_chunks_with_one_commit_each(app, reminders, commits):
+    from config import Config
+    from models import Reminder, db
+    service = app.scheduler_service
+    
+    chunks = []
+    while True:
+        chunk = service.fire_due_reminders(FIRE_AT, 2)
+        chunks.append(chunk)
+        if len(chunk) < 2:
+            break
+    
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert len(commits) == 3
+    # Most overdue first
+    assert [{reminder['text'] for reminder in chunk} for chunk in chunks] == [{'Due 4', 'Due 3'}, {'Due 2', 'Due 1'}, {'Due 0'}]
+    db.session.expire_all()
+    for reminder in reminders:
+        assert reminder.reminder_count == 1
+        assert reminder.next_reminder == FIRE_AT + timedelta(minutes=Config.REMINDER_INTERVAL_MINUTES)
+    assert Reminder.query.filter_by(reminder_text='Not due yet').one().reminder_count == 0
+    assert Reminder.query.filter_by(reminder_text='Acknowledged').one().reminder_count == 0
+
+def test_reminders_back_off_after_repeated_firing(app, reminders):
+    from config import Config
+    from models import db
+    reminders[0].reminder_count = Config.REMINDER_BACKOFF_AFTER
+    reminders[1].reminder_count = Config.REMINDER_BACKOFF_AFTER - 1
+    db.session.commit()
+    
+    fired = {reminder['id']: reminder for reminder in app.scheduler_service.fire_due_reminders(FIRE_AT, 10)}
+    
+    assert fired[reminders[0].id]['next_reminder'] == (FIRE_AT + timedelta(hours=Config.REMINDER_BACKOFF_HOURS)).isoformat()
+    assert fired[reminders[1].id]['next_reminder'] == (FIRE_AT + timedelta(minutes=Config.REMINDER_INTERVAL_MINUTES)).isoformat()
@@ -0,0 +1,52 @@
+import time
+import pytest
+
+@pytest.fixture
+def service(app, monkeypatch):
+    import scheduler
+    from reminder_timer import ReminderTimer
+    # A lease and timer of its own, so the app's scheduler keeps running alongside
+    monkeypatch.setattr(scheduler, 'SCHEDULER_LEASE', 'test-scheduler')
+    monkeypatch.setattr(scheduler, 'reminder_timer', ReminderTimer())
+    service = scheduler.SchedulerService(app)
+    yield service
+    service.shutdown()
+
+def wait_for_leader(service, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not service.election.is_leader and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return service.election.is_leader
+
+def test_shutdown_releases_the_lease_once(app, service):
+    assert wait_for_leader(service)
+    with app.app_context():
+        assert service.election.current_holder() == service.election.holder
+    
+    service.shutdown()
+    service.shutdown()
+    
+    assert not service.scheduler.running
+    with app.app_context():
+        assert service.election.current_holder() is None
+
+def test_heartbeat_after_shutdown_does_not_renew(app, service):
+    assert wait_for_leader(service)
+    service.shutdown()
+    
+    service.leader_heartbeat_job()
+    
+    assert not service.election.is_leader
+
+def test_ingest_metrics_name_the_leader(app):
+    election = app.scheduler_service.election
+    with app.app_context():
+        leader_holder = election.current_holder()
+    
+    response = app.test_client().get('/api/ingest/metrics')
+    
+    body = response.get_json()
+    assert body['holder'] == election.holder
+    assert body['leader_holder'] == leader_holder
+    assert body['leader'] == (leader_holder == election.holder)
+    assert 'stages' in body
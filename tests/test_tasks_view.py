@@ -0,0 +1,63 @@
+import re
+import pytest
+from sqlalchemy import event
+
+@pytest.fixture
+def open_tasks(app_context):
+    from models import Task, db
+    tasks = [Task(title=f'Streamed task {index}', facility='Stream') for index in range(5)]
+    db.session.add_all(tasks)
+    db.session.commit()
+    yield tasks
+    Task.query.filter_by(facility='Stream').delete()
+    db.session.commit()
+
+@pytest.fixture
+def failing_task_pages(app):
+    from models import db
+    def fail(connection, cursor, statement, parameters, context, executemany):
+        if 'FROM task' in statement and 'LIMIT' in statement:
+            raise RuntimeError('disk I/O error')
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', fail)
+    yield
+    event.remove(engine, 'before_cursor_execute', fail)
+
+def test_tasks_page_streams_the_filtered_tasks(app, open_tasks):
+    response = app.test_client().get('/tasks?facility=Stream&per_page=3')
+    
+    page = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert len(set(re.findall(r'Streamed task \d', page))) == 3
+    assert 'Error loading' not in page
+
+def test_query_errors_are_handled_before_streaming(app, open_tasks, failing_task_pages):
+    response = app.test_client().get('/tasks?facility=Stream')
+    
+    page = response.get_data(as_text=True)
+    assert 'Error loading tasks' in page
+    assert 'Streamed task' not in page
+
+def test_errors_while_streaming_close_off_the_page(app, open_tasks, monkeypatch, caplog):
+    import routes
+    from pagination import KeysetStream
+    def rows():
+        yield open_tasks[0]
+        raise RuntimeError('lost connection')
+    monkeypatch.setattr(routes, 'keyset_stream', lambda *args, **kwargs: KeysetStream(rows(), 3, has_prev=False))
+    
+    response = app.test_client().get('/tasks?facility=Stream')
+    
+    page = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert 'Streamed task 0' in page
+    assert page.rstrip().endswith('Error loading the rest of this page</div>')
+    assert 'Error streaming tasks: lost connection' in caplog.text
+
+def test_invalid_cursor_shows_the_first_page(app, open_tasks):
+    response = app.test_client().get('/tasks?facility=Stream&after=not-a-cursor')
+    
+    page = response.get_data(as_text=True)
+    assert 'Invalid page link' in page
+    assert len(set(re.findall(r'Streamed task \d', page))) == 5